@@ -0,0 +1,31 @@
+"""add adaptive response mode settings and decision
+
+Revision ID: add_adaptive_response_mode
+Revises: add_password_hash_businesses
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_adaptive_response_mode'
+down_revision = 'add_password_hash_businesses'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('adaptive_response_enabled', sa.Boolean(), nullable=True))
+    op.add_column('businesses', sa.Column('video_sla_seconds', sa.Integer(), nullable=True))
+    op.add_column('businesses', sa.Column('voice_sla_seconds', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('response_mode', sa.String(length=20), nullable=True))
+    op.add_column('conversations', sa.Column('response_mode_reason', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'response_mode_reason')
+    op.drop_column('conversations', 'response_mode')
+    op.drop_column('businesses', 'voice_sla_seconds')
+    op.drop_column('businesses', 'video_sla_seconds')
+    op.drop_column('businesses', 'adaptive_response_enabled')
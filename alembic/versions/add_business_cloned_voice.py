@@ -0,0 +1,27 @@
+"""add cloned voice id to businesses
+
+Revision ID: add_business_cloned_voice
+Revises: add_conversation_message_sid
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_business_cloned_voice'
+down_revision = 'add_conversation_message_sid'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('elevenlabs_voice_id', sa.String(length=100), nullable=True))
+    op.add_column('businesses', sa.Column('voice_sample_hash', sa.String(length=64), nullable=True))
+    op.add_column('businesses', sa.Column('voice_clone_status', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('businesses', 'voice_clone_status')
+    op.drop_column('businesses', 'voice_sample_hash')
+    op.drop_column('businesses', 'elevenlabs_voice_id')
@@ -0,0 +1,75 @@
+"""add broadcast campaigns and their recipients
+
+Revision ID: add_campaigns
+Revises: add_delivery_status
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_campaigns'
+down_revision = 'add_delivery_status'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'campaigns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('brief', sa.Text(), nullable=False),
+        sa.Column('greeting_template', sa.String(length=255), nullable=True),
+        sa.Column('caption', sa.String(length=500), nullable=True),
+        sa.Column('segment', sa.Text(), nullable=True),
+        sa.Column('script_text', sa.Text(), nullable=True),
+        sa.Column('base_audio_path', sa.String(length=500), nullable=True),
+        sa.Column('base_video_path', sa.String(length=500), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('run_id', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('total_recipients', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_campaigns_id'), 'campaigns', ['id'], unique=False)
+    op.create_index(op.f('ix_campaigns_business_id'), 'campaigns', ['business_id'], unique=False)
+    op.create_table(
+        'campaign_recipients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('phone_number', sa.String(length=20), nullable=False),
+        sa.Column('greeting', sa.String(length=255), nullable=True),
+        sa.Column('greeting_key', sa.String(length=16), nullable=True),
+        sa.Column('video_path', sa.String(length=500), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('message_sid', sa.String(length=64), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('rendered_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_campaign_recipients_id'), 'campaign_recipients', ['id'], unique=False)
+    op.create_index(op.f('ix_campaign_recipients_campaign_id'), 'campaign_recipients', ['campaign_id'], unique=False)
+    op.create_index(op.f('ix_campaign_recipients_greeting_key'), 'campaign_recipients', ['greeting_key'], unique=False)
+    op.create_index(op.f('ix_campaign_recipients_message_sid'), 'campaign_recipients', ['message_sid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_campaign_recipients_message_sid'), table_name='campaign_recipients')
+    op.drop_index(op.f('ix_campaign_recipients_greeting_key'), table_name='campaign_recipients')
+    op.drop_index(op.f('ix_campaign_recipients_campaign_id'), table_name='campaign_recipients')
+    op.drop_index(op.f('ix_campaign_recipients_id'), table_name='campaign_recipients')
+    op.drop_table('campaign_recipients')
+    op.drop_index(op.f('ix_campaigns_business_id'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_id'), table_name='campaigns')
+    op.drop_table('campaigns')
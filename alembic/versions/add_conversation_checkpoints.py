@@ -0,0 +1,25 @@
+"""add pipeline checkpoint columns to conversations
+
+Revision ID: add_conversation_checkpoints
+Revises: add_adaptive_response_mode
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_conversation_checkpoints'
+down_revision = 'add_adaptive_response_mode'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('audio_path', sa.String(length=500), nullable=True))
+    op.add_column('conversations', sa.Column('prediction_id', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'prediction_id')
+    op.drop_column('conversations', 'audio_path')
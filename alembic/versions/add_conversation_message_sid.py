@@ -0,0 +1,25 @@
+"""add unique inbound message_sid to conversations
+
+Revision ID: add_conversation_message_sid
+Revises: add_conversation_checkpoints
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_conversation_message_sid'
+down_revision = 'add_conversation_checkpoints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('message_sid', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_conversations_message_sid'), 'conversations', ['message_sid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_conversations_message_sid'), table_name='conversations')
+    op.drop_column('conversations', 'message_sid')
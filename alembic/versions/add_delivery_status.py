@@ -0,0 +1,49 @@
+"""add outbound message SIDs and Twilio delivery status tracking
+
+Revision ID: add_delivery_status
+Revises: add_faq_library
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_delivery_status'
+down_revision = 'add_faq_library'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'message_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_sid', sa.String(length=64), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=20), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('status_rank', sa.Integer(), nullable=True),
+        sa.Column('error_code', sa.String(length=20), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('delivered_at', sa.DateTime(), nullable=True),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.Column('failed_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_message_deliveries_id'), 'message_deliveries', ['id'], unique=False)
+    op.create_index(op.f('ix_message_deliveries_message_sid'), 'message_deliveries', ['message_sid'], unique=True)
+    op.create_index(op.f('ix_message_deliveries_conversation_id'), 'message_deliveries', ['conversation_id'], unique=False)
+    op.add_column('conversations', sa.Column('reply_message_sid', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_conversations_reply_message_sid'), 'conversations', ['reply_message_sid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_conversations_reply_message_sid'), table_name='conversations')
+    op.drop_column('conversations', 'reply_message_sid')
+    op.drop_index(op.f('ix_message_deliveries_conversation_id'), table_name='message_deliveries')
+    op.drop_index(op.f('ix_message_deliveries_message_sid'), table_name='message_deliveries')
+    op.drop_index(op.f('ix_message_deliveries_id'), table_name='message_deliveries')
+    op.drop_table('message_deliveries')
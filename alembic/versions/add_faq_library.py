@@ -0,0 +1,50 @@
+"""add pre-rendered FAQ library and FAQ match tracking on conversations
+
+Revision ID: add_faq_library
+Revises: add_media_retention
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_faq_library'
+down_revision = 'add_media_retention'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'faq_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('question', sa.Text(), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('audio_path', sa.String(length=500), nullable=True),
+        sa.Column('video_path', sa.String(length=500), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('rendered_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_faq_entries_id'), 'faq_entries', ['id'], unique=False)
+    op.create_index(op.f('ix_faq_entries_business_id'), 'faq_entries', ['business_id'], unique=False)
+    # Batch mode: SQLite can't ALTER constraints, so the table is recreated there
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.add_column(sa.Column('faq_similarity', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('faq_entry_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_conversations_faq_entry_id', 'faq_entries', ['faq_entry_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversations') as batch_op:
+        batch_op.drop_constraint('fk_conversations_faq_entry_id', type_='foreignkey')
+        batch_op.drop_column('faq_entry_id')
+        batch_op.drop_column('faq_similarity')
+    op.drop_index(op.f('ix_faq_entries_business_id'), table_name='faq_entries')
+    op.drop_index(op.f('ix_faq_entries_id'), table_name='faq_entries')
+    op.drop_table('faq_entries')
@@ -0,0 +1,47 @@
+"""add media file index for retention and per-business media quotas
+
+Revision ID: add_media_retention
+Revises: add_reply_duration_budget
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_retention'
+down_revision = 'add_reply_duration_budget'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('media_quota_mb', sa.Integer(), nullable=True))
+    op.create_table(
+        'media_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('business_id', sa.Integer(), nullable=True),
+        sa.Column('conversation_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('path')
+    )
+    op.create_index(op.f('ix_media_files_id'), 'media_files', ['id'], unique=False)
+    op.create_index(op.f('ix_media_files_business_id'), 'media_files', ['business_id'], unique=False)
+    op.create_index(op.f('ix_media_files_conversation_id'), 'media_files', ['conversation_id'], unique=False)
+    op.create_index(op.f('ix_media_files_expires_at'), 'media_files', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_media_files_expires_at'), table_name='media_files')
+    op.drop_index(op.f('ix_media_files_conversation_id'), table_name='media_files')
+    op.drop_index(op.f('ix_media_files_business_id'), table_name='media_files')
+    op.drop_index(op.f('ix_media_files_id'), table_name='media_files')
+    op.drop_table('media_files')
+    op.drop_column('businesses', 'media_quota_mb')
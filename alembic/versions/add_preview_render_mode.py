@@ -0,0 +1,27 @@
+"""add local preview render mode and checkpoints
+
+Revision ID: add_preview_render_mode
+Revises: add_business_cloned_voice
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_preview_render_mode'
+down_revision = 'add_business_cloned_voice'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('video_render_mode', sa.String(length=30), nullable=True))
+    op.add_column('conversations', sa.Column('preview_video_path', sa.String(length=500), nullable=True))
+    op.add_column('conversations', sa.Column('preview_sent_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'preview_sent_at')
+    op.drop_column('conversations', 'preview_video_path')
+    op.drop_column('businesses', 'video_render_mode')
@@ -0,0 +1,29 @@
+"""add progressive delivery setting and voice note tracking
+
+Revision ID: add_progressive_delivery
+Revises: add_preview_render_mode
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_progressive_delivery'
+down_revision = 'add_preview_render_mode'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('progressive_delivery_enabled', sa.Boolean(), nullable=True))
+    op.add_column('conversations', sa.Column('voice_note_path', sa.String(length=500), nullable=True))
+    op.add_column('conversations', sa.Column('voice_note_sent_at', sa.DateTime(), nullable=True))
+    op.add_column('conversations', sa.Column('first_reply_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'first_reply_at')
+    op.drop_column('conversations', 'voice_note_sent_at')
+    op.drop_column('conversations', 'voice_note_path')
+    op.drop_column('businesses', 'progressive_delivery_enabled')
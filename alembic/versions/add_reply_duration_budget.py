@@ -0,0 +1,27 @@
+"""add target video duration and predicted/actual reply durations
+
+Revision ID: add_reply_duration_budget
+Revises: add_progressive_delivery
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_reply_duration_budget'
+down_revision = 'add_progressive_delivery'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('businesses', sa.Column('target_video_seconds', sa.Integer(), nullable=True))
+    op.add_column('conversations', sa.Column('predicted_duration_seconds', sa.Float(), nullable=True))
+    op.add_column('conversations', sa.Column('audio_duration_seconds', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'audio_duration_seconds')
+    op.drop_column('conversations', 'predicted_duration_seconds')
+    op.drop_column('businesses', 'target_video_seconds')
@@ -8,17 +8,26 @@ import operator
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     next_step: str
+    reply_word_budget: int  # optional; bounds the reply so the video stays short
 
 # 2. Define Nodes
 def call_model(state: AgentState):
     """
-    Invokes the Llama 3 model with the current history.
+    Invokes the routed chat model (Groq Llama 3, failing over to Anthropic/OpenAI) with the current history.
     """
     messages = state["messages"]
-    llm = get_llm()
+    budget = state.get("reply_word_budget")
+    # Hard stop well past the budget; the planner trims at sentence boundaries
+    llm = get_llm(max_tokens=budget * 2 + 40) if budget else get_llm()
     
     # Simple system prompt for now
-    system_prompt = SystemMessage(content="You are VidioAgent, a helpful assistant for Nigerian MSMEs.")
+    prompt = "You are VidioAgent, a helpful assistant for Nigerian MSMEs."
+    if budget:
+        prompt += (
+            f" Your reply will be spoken in a short video, so keep it under {budget} words,"
+            " in plain sentences without lists, markdown or emoji."
+        )
+    system_prompt = SystemMessage(content=prompt)
     
     # Prepend system prompt if not present (simplified logic)
     if not isinstance(messages[0], SystemMessage):
@@ -36,3 +45,17 @@ workflow.add_edge("agent", END)
 
 # 4. Compile
 app_graph = workflow.compile()
+
+async def astream_reply_tokens(messages: List[BaseMessage], reply_word_budget: int | None = None):
+    """
+    Yield the agent's reply token by token as the model generates it.
+    
+    Uses LangGraph's "messages" stream mode, which surfaces the chat model's
+    token stream from inside the agent node.
+    """
+    state = {"messages": messages}
+    if reply_word_budget:
+        state["reply_word_budget"] = reply_word_budget
+    async for chunk, metadata in app_graph.astream(state, stream_mode="messages"):
+        if metadata.get("langgraph_node") == "agent" and chunk.content:
+            yield chunk.content
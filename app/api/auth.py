@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from app.db.base import get_db
 from app.db.models import Business
 from sqlalchemy.orm import Session
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_and_update_password_async, create_access_token
 
 
 router = APIRouter()
@@ -41,8 +41,14 @@ async def login(req: LoginRequest, db: Session = Depends(get_db)):
     if not business:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    if not verify_password(req.password, business.password_hash):
+    valid, new_hash = await verify_and_update_password_async(req.password, business.password_hash)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
+    # Transparently upgrade hashes made with an older bcrypt cost
+    if new_hash:
+        business.password_hash = new_hash
+        db.commit()
+
     token = create_access_token(subject=business.id)
     return LoginResponse(access_token=token)
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import Annotated
+from app.api.deps import current_business, invalidate_business_cache
+from app.core.config import settings
 from app.db.base import get_db
 from app.db.models import Business
+from app.services.business_assets import invalidate_business_assets
+from app.services.media_retention import media_usage_bytes
 from app.services.storage import save_voice_sample, save_avatar, get_public_url
+from app.workers.pipeline import RENDER_MODES
 from pydantic import BaseModel
 import re
 
@@ -43,6 +48,12 @@ async def register_business(
     avatar_image: UploadFile = File(...),
     response_style: Annotated[str, Form()] = "professional",
     password: Annotated[str, Form()] = "",
+    adaptive_response: Annotated[bool, Form()] = False,
+    video_sla_seconds: Annotated[int, Form()] = 300,
+    voice_sla_seconds: Annotated[int, Form()] = 60,
+    video_render_mode: Annotated[str, Form()] = "lipsync",
+    progressive_delivery: Annotated[bool, Form()] = False,
+    target_video_seconds: Annotated[int, Form()] = 30,
     db: Session = Depends(get_db)
 ):
     """
@@ -55,6 +66,12 @@ async def register_business(
     - **voice_sample**: Audio file of owner's voice (for ElevenLabs)
     - **avatar_image**: Photo of owner (for video generation)
     - **response_style**: AI response style (professional, casual, friendly)
+    - **adaptive_response**: Fall back to a voice note or text when a video would miss the SLA
+    - **video_sla_seconds**: Longest acceptable wait for a video reply
+    - **voice_sla_seconds**: Longest acceptable wait for a voice note reply
+    - **video_render_mode**: lipsync, preview_then_lipsync, or preview (fast local render only)
+    - **progressive_delivery**: Send the voice note as soon as it's ready, then the video
+    - **target_video_seconds**: Target length of spoken replies (bounds render time and cost)
     """
     
     # Validate WhatsApp number format
@@ -81,6 +98,12 @@ async def register_business(
     if not avatar_image.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Avatar must be an image file")
     
+    if not 5 <= target_video_seconds <= 180:
+        raise HTTPException(status_code=400, detail="target_video_seconds must be between 5 and 180")
+    
+    if video_render_mode not in RENDER_MODES:
+        raise HTTPException(status_code=400, detail=f"video_render_mode must be one of: {', '.join(RENDER_MODES)}")
+    
     # Validate password: require a strong password (min 8 chars)
     if not password or len(password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
@@ -101,14 +124,21 @@ async def register_business(
         voice_sample_url=voice_path,
         avatar_image_url=avatar_path,
         response_style=response_style,
-        is_active=True
+        voice_clone_status="pending",
+        is_active=True,
+        adaptive_response_enabled=adaptive_response,
+        video_sla_seconds=video_sla_seconds,
+        voice_sla_seconds=voice_sla_seconds,
+        video_render_mode=video_render_mode,
+        progressive_delivery_enabled=progressive_delivery,
+        target_video_seconds=target_video_seconds
     )
 
     # If a password was provided, hash and store it
     try:
-        from app.core.security import hash_password
+        from app.core.security import hash_password_async
         if password:
-            business.password_hash = hash_password(password)
+            business.password_hash = await hash_password_async(password)
     except Exception:
         # If hashing fails, continue but warn in logs
         print("Warning: password hashing failed; password not saved")
@@ -117,6 +147,13 @@ async def register_business(
     db.commit()
     db.refresh(business)
     
+    # Clone the owner's voice in the background so renders can reuse the voice ID
+    from app.workers.celery_app import clone_business_voice
+    try:
+        clone_business_voice.delay(business.id)
+    except Exception as e:
+        print(f"Failed to queue voice cloning for business {business.id}: {e}")
+    
     return BusinessResponse(
         id=business.id,
         name=business.name,
@@ -126,6 +163,14 @@ async def register_business(
         message=f"Business '{name}' registered successfully! You can now receive AI video responses on {formatted_number}"
     )
 
+@router.get("/me")
+async def get_current_business(
+    business: Business = Depends(current_business),
+    db: Session = Depends(get_db)
+):
+    """Details of the business the bearer token belongs to (dashboard)"""
+    return _business_details(db, business)
+
 @router.get("/businesses/{business_id}")
 async def get_business(business_id: int, db: Session = Depends(get_db)):
     """Get business details by ID"""
@@ -133,6 +178,9 @@ async def get_business(business_id: int, db: Session = Depends(get_db)):
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
     
+    return _business_details(db, business)
+
+def _business_details(db: Session, business: Business) -> dict:
     return {
         "id": business.id,
         "name": business.name,
@@ -140,9 +188,48 @@ async def get_business(business_id: int, db: Session = Depends(get_db)):
         "owner_name": business.owner_name,
         "business_type": business.business_type,
         "is_active": business.is_active,
+        "voice_clone_status": business.voice_clone_status,
+        "adaptive_response_enabled": business.adaptive_response_enabled,
+        "video_sla_seconds": business.video_sla_seconds,
+        "voice_sla_seconds": business.voice_sla_seconds,
+        "video_render_mode": business.video_render_mode,
+        "progressive_delivery_enabled": business.progressive_delivery_enabled,
+        "target_video_seconds": business.target_video_seconds,
+        "media_usage_mb": round(media_usage_bytes(db, business.id) / (1024 * 1024), 1),
+        "media_quota_mb": business.media_quota_mb or settings.MEDIA_QUOTA_MB,
         "created_at": business.created_at
     }
 
+@router.post("/me/voice_sample")
+async def replace_voice_sample(
+    voice_sample: UploadFile = File(...),
+    current: Business = Depends(current_business),
+    db: Session = Depends(get_db)
+):
+    """Replace the owner's voice sample and re-clone the voice in the background"""
+    business = db.query(Business).filter(Business.id == current.id).first()
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    
+    if not voice_sample.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="Voice sample must be an audio file")
+    
+    try:
+        voice_path = await save_voice_sample(voice_sample)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save files: {str(e)}")
+    
+    business.voice_sample_url = voice_path
+    business.voice_clone_status = "pending"
+    db.commit()
+    invalidate_business_cache(business.id)
+    invalidate_business_assets(business.id)
+    
+    from app.workers.celery_app import clone_business_voice
+    clone_business_voice.delay(business.id)
+    
+    return {"id": business.id, "voice_clone_status": business.voice_clone_status}
+
 @router.get("/businesses")
 async def list_businesses(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     """List all registered businesses"""
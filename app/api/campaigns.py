@@ -0,0 +1,162 @@
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.api.deps import current_business
+from app.db.base import get_db
+from app.db.models import Business, Campaign, CampaignRecipient
+from app.services.campaigns import (
+    CAMPAIGN_DRAFT, CAMPAIGN_PREPARING, CAMPAIGN_PAUSED, CAMPAIGN_CANCELLED, CAMPAIGN_FAILED, ACTIVE_STATUSES,
+    parse_segment, segment_customers, resume_status, campaign_progress, delete_campaign_media
+)
+
+router = APIRouter()
+
+MAX_BRIEF_CHARS = 2000
+
+class CampaignCreateRequest(BaseModel):
+    name: str
+    brief: str  # what the shared video should say
+    greeting_template: str | None = "Hi {name}!"  # spoken before the shared video; None for no personalization
+    caption: str | None = None
+    segment: dict | None = None  # see services/campaigns.py SEGMENT_FIELDS
+
+def _campaign_details(db: Session, campaign: Campaign, progress: bool = False) -> dict:
+    details = {
+        "id": campaign.id,
+        "name": campaign.name,
+        "brief": campaign.brief,
+        "greeting_template": campaign.greeting_template,
+        "caption": campaign.caption,
+        "segment": json.loads(campaign.segment or "{}"),
+        "status": campaign.status,
+        "script_text": campaign.script_text,
+        "error_message": campaign.error_message,
+        "created_at": campaign.created_at,
+        "started_at": campaign.started_at,
+        "completed_at": campaign.completed_at
+    }
+    if progress:
+        details["progress"] = campaign_progress(db, campaign)
+    return details
+
+def _get_campaign(db: Session, business: Business, campaign_id: int) -> Campaign:
+    campaign = db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.business_id == business.id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+def _queue_run(db: Session, campaign: Campaign) -> None:
+    """Start a new run (earlier runs' tasks stop at their next batch) at the campaign's next stage"""
+    from app.workers.celery_app import prepare_campaign, render_campaign_greetings, send_campaign_messages
+
+    campaign.run_id = (campaign.run_id or 0) + 1
+    campaign.status = resume_status(campaign)
+    campaign.error_message = None
+    db.commit()
+    if campaign.status == CAMPAIGN_PREPARING:
+        prepare_campaign.delay(campaign.id, campaign.run_id)
+    else:
+        render_campaign_greetings.delay(campaign.id, campaign.run_id)
+        send_campaign_messages.delay(campaign.id, campaign.run_id)
+
+@router.get("")
+async def list_campaigns(business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """List the business's campaigns"""
+    campaigns = db.query(Campaign).filter(Campaign.business_id == business.id).order_by(Campaign.id.desc()).all()
+    return [_campaign_details(db, campaign) for campaign in campaigns]
+
+@router.post("")
+async def create_campaign(
+    request: CampaignCreateRequest,
+    business: Business = Depends(current_business),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a draft campaign and report how many customers its segment matches.
+
+    Nothing is generated or sent until the campaign is started.
+    """
+    if not request.name.strip() or not request.brief.strip():
+        raise HTTPException(status_code=400, detail="Name and brief must not be empty")
+    if len(request.brief) > MAX_BRIEF_CHARS:
+        raise HTTPException(status_code=400, detail=f"The brief must be at most {MAX_BRIEF_CHARS} characters")
+    if request.greeting_template and "{name}" not in request.greeting_template:
+        raise HTTPException(status_code=400, detail="greeting_template must contain {name}")
+    try:
+        segment = parse_segment(request.segment)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    campaign = Campaign(
+        business_id=business.id,
+        name=request.name.strip(),
+        brief=request.brief.strip(),
+        greeting_template=request.greeting_template or None,
+        caption=request.caption,
+        segment=json.dumps(segment),
+        status=CAMPAIGN_DRAFT
+    )
+    db.add(campaign)
+    db.commit()
+    details = _campaign_details(db, campaign)
+    details["matching_customers"] = segment_customers(db, business.id, segment).count()
+    return details
+
+@router.get("/{campaign_id}")
+async def get_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Campaign details with progress, send throughput and delivery outcomes"""
+    return _campaign_details(db, _get_campaign(db, business, campaign_id), progress=True)
+
+@router.post("/{campaign_id}/start")
+async def start_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Generate the shared video, render the greetings and start sending"""
+    campaign = _get_campaign(db, business, campaign_id)
+    if campaign.status != CAMPAIGN_DRAFT:
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    campaign.started_at = datetime.utcnow()
+    _queue_run(db, campaign)
+    return _campaign_details(db, campaign)
+
+@router.post("/{campaign_id}/pause")
+async def pause_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Stop rendering and sending after the current batch; resume continues where it stopped"""
+    campaign = _get_campaign(db, business, campaign_id)
+    if campaign.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    campaign.status = CAMPAIGN_PAUSED
+    db.commit()
+    return _campaign_details(db, campaign)
+
+@router.post("/{campaign_id}/resume")
+async def resume_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Continue a paused (or failed) campaign from its checkpoints"""
+    campaign = _get_campaign(db, business, campaign_id)
+    if campaign.status not in (CAMPAIGN_PAUSED, CAMPAIGN_FAILED):
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    _queue_run(db, campaign)
+    return _campaign_details(db, campaign)
+
+@router.post("/{campaign_id}/cancel")
+async def cancel_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Stop the campaign for good; recipients not yet reached are not sent to"""
+    campaign = _get_campaign(db, business, campaign_id)
+    if campaign.status == CAMPAIGN_CANCELLED or campaign.completed_at:
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    campaign.status = CAMPAIGN_CANCELLED
+    db.commit()
+    return _campaign_details(db, campaign)
+
+@router.delete("/{campaign_id}")
+async def delete_campaign(campaign_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Delete a campaign that isn't running, with its recipients and rendered media"""
+    campaign = _get_campaign(db, business, campaign_id)
+    if campaign.status in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="Pause or cancel the campaign first")
+    db.query(CampaignRecipient).filter(CampaignRecipient.campaign_id == campaign.id).delete(synchronize_session=False)
+    db.delete(campaign)
+    db.commit()
+    delete_campaign_media(campaign_id)
+    return {"id": campaign_id, "deleted": True}
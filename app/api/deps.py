@@ -0,0 +1,90 @@
+"""Shared dependencies for authenticated dashboard routes"""
+import time
+from collections import OrderedDict
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.db.base import get_db
+from app.db.models import Business
+
+MAX_CACHED_TOKENS = 1024
+MAX_CACHED_BUSINESSES = 1024
+
+_bearer = HTTPBearer(auto_error=False)
+
+# token -> (business id, token exp). A dashboard page fires several requests
+# with the same token; decoding it once saves the HMAC check and JSON parse.
+_tokens: OrderedDict[str, tuple[int, float]] = OrderedDict()
+# business id -> (fetched at, detached Business)
+_businesses: OrderedDict[int, tuple[float, Business]] = OrderedDict()
+
+def _lru_put(cache: OrderedDict, key, value, max_size: int) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+def _business_id_from_token(token: str) -> int:
+    now = time.time()
+    cached = _tokens.get(token)
+    if cached and cached[1] > now:
+        _tokens.move_to_end(token)
+        return cached[0]
+    _tokens.pop(token, None)
+
+    try:
+        claims = decode_access_token(token)
+        business_id = int(claims["sub"])
+    except (jwt.InvalidTokenError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    _lru_put(_tokens, token, (business_id, float(claims["exp"])), MAX_CACHED_TOKENS)
+    return business_id
+
+def _load_business(db: Session, business_id: int) -> Business | None:
+    cached = _businesses.get(business_id)
+    if cached and time.monotonic() - cached[0] < settings.AUTH_CACHE_SECONDS:
+        _businesses.move_to_end(business_id)
+        return cached[1]
+
+    business = db.query(Business).filter(Business.id == business_id).first()
+    if business is None:
+        _businesses.pop(business_id, None)
+        return None
+    # Detach with its loaded columns so it outlives this request's session
+    db.expunge(business)
+    _lru_put(_businesses, business_id, (time.monotonic(), business), MAX_CACHED_BUSINESSES)
+    return business
+
+def invalidate_business_cache(business_id: int) -> None:
+    """Drop a cached business row after it changes, so the next request sees the update"""
+    _businesses.pop(business_id, None)
+
+async def current_business(
+    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer),
+    db: Session = Depends(get_db)
+) -> Business:
+    """
+    The business the request's bearer token was issued to.
+
+    Decoded tokens and business rows are cached for up to AUTH_CACHE_SECONDS,
+    so a dashboard load doesn't re-verify the JWT and re-read the business on
+    every call. The returned Business is a detached, read-only snapshot: to
+    change it, query the row through `db`, commit, then call
+    invalidate_business_cache.
+
+    Raises:
+        HTTPException: 401 without a valid token, 403 if the business is
+            missing or deactivated
+    """
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+    business = _load_business(db, _business_id_from_token(credentials.credentials))
+    if business is None or not business.is_active:
+        raise HTTPException(status_code=403, detail="Business not found or inactive")
+    return business
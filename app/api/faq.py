@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.api.deps import current_business
+from app.db.base import get_db
+from app.db.models import Business, Conversation, FaqEntry
+from app.services.faq_library import FAQ_PENDING, FAQ_READY, FAQ_FAILED, FAQ_RENDERING, unindex_faq, delete_faq_media
+
+router = APIRouter()
+
+MAX_ANSWER_CHARS = 1000
+
+class FaqItem(BaseModel):
+    question: str
+    answer: str
+
+class FaqCreateRequest(BaseModel):
+    items: list[FaqItem]
+
+def _faq_details(entry: FaqEntry) -> dict:
+    return {
+        "id": entry.id,
+        "question": entry.question,
+        "answer": entry.answer,
+        "status": entry.status,
+        "error_message": entry.error_message,
+        "rendered_at": entry.rendered_at,
+        "created_at": entry.created_at
+    }
+
+def _queue_render(business_id: int) -> None:
+    from app.workers.celery_app import render_faq_library
+    try:
+        render_faq_library.delay(business_id)
+    except Exception as e:
+        print(f"Failed to queue FAQ rendering for business {business_id}: {e}")
+
+@router.get("")
+async def list_faqs(business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """List the business's FAQ entries and their render status"""
+    entries = db.query(FaqEntry).filter(FaqEntry.business_id == business.id).order_by(FaqEntry.id).all()
+    return [_faq_details(entry) for entry in entries]
+
+@router.post("")
+async def add_faqs(
+    request: FaqCreateRequest,
+    business: Business = Depends(current_business),
+    db: Session = Depends(get_db)
+):
+    """
+    Add FAQ question/answer pairs.
+
+    Answers are rendered to videos offline in one batch; matching customer
+    questions are answered with them once their status is "ready".
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one FAQ is required")
+    for item in request.items:
+        if not item.question.strip() or not item.answer.strip():
+            raise HTTPException(status_code=400, detail="Questions and answers must not be empty")
+        if len(item.answer) > MAX_ANSWER_CHARS:
+            raise HTTPException(status_code=400, detail=f"Answers must be at most {MAX_ANSWER_CHARS} characters")
+
+    entries = [
+        FaqEntry(business_id=business.id, question=item.question.strip(), answer=item.answer.strip(), status=FAQ_PENDING)
+        for item in request.items
+    ]
+    db.add_all(entries)
+    db.commit()
+    _queue_render(business.id)
+    return [_faq_details(entry) for entry in entries]
+
+@router.post("/render")
+async def rerender_faqs(
+    all_entries: bool = False,
+    business: Business = Depends(current_business),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue failed (or, with all_entries, every) FAQ entry for rendering again.
+
+    Use all_entries after changing the voice or avatar. Re-queued entries
+    stop matching until their new video is ready.
+    """
+    statuses = [FAQ_FAILED, FAQ_RENDERING] + ([FAQ_READY] if all_entries else [])
+    queued = db.query(FaqEntry).filter(
+        FaqEntry.business_id == business.id,
+        FaqEntry.status.in_(statuses)
+    ).update({FaqEntry.status: FAQ_PENDING}, synchronize_session=False)
+    db.commit()
+    if queued:
+        _queue_render(business.id)
+    return {"queued": queued}
+
+@router.delete("/{faq_id}")
+async def delete_faq(faq_id: int, business: Business = Depends(current_business), db: Session = Depends(get_db)):
+    """Delete an FAQ entry, its index entry and its rendered media"""
+    entry = db.query(FaqEntry).filter(FaqEntry.id == faq_id, FaqEntry.business_id == business.id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="FAQ not found")
+
+    try:
+        unindex_faq(business.id, entry.id)
+    except Exception as e:
+        print(f"Failed to remove FAQ {entry.id} from the index: {e}")
+    delete_faq_media(entry)
+    # Past conversations keep their FAQ reply mode and similarity for the stats
+    db.query(Conversation).filter(Conversation.faq_entry_id == entry.id).update(
+        {Conversation.faq_entry_id: None}, synchronize_session=False
+    )
+    db.delete(entry)
+    db.commit()
+    return {"id": faq_id, "deleted": True}
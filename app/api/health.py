@@ -1,5 +1,8 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.services.capacity import probe_results
+from app.services.circuit_breaker import STATE_CLOSED
 
 router = APIRouter()
 
@@ -11,10 +14,41 @@ async def health():
 
 @router.get("/ready")
 async def ready():
-    # Basic readiness: check minimal required settings
-    ok = True
+    """
+    Readiness: required settings, the database and the Redis broker (503 when not ready).
+
+    Probe results are cached (see services/capacity.py), so this never waits on
+    the DB or broker itself. Open breakers and unreachable providers degrade
+    replies but don't make the API unready.
+    """
     missing = []
     if not settings.SECRET_KEY or settings.SECRET_KEY in ("change-me", "development_secret"):
         missing.append("SECRET_KEY")
-        ok = False
-    return {"ready": ok, "missing": missing}
+    
+    probes = await probe_results("database", "broker", "providers", "circuit_breakers")
+    ok = not missing and probes["database"]["ok"] is True and probes["broker"]["ok"] is True
+    breakers = probes["circuit_breakers"].get("breakers", {})
+    providers = probes["providers"].get("providers", {})
+    degraded = sorted(
+        {provider for provider, info in breakers.items() if info["state"] != STATE_CLOSED}
+        | {provider for provider, info in providers.items() if not info["reachable"]}
+    )
+    body = {
+        "ready": ok,
+        "missing": missing,
+        "checks": {"database": probes["database"], "broker": probes["broker"]},
+        "degraded": degraded,
+        "providers": providers,
+        "circuit_breakers": breakers,
+    }
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+
+@router.get("/capacity")
+async def capacity():
+    """
+    Autoscaling signal: waiting jobs and oldest job age per queue, live workers and desired_workers.
+
+    Cached for CAPACITY_CACHE_SECONDS; point the autoscaler at desired_workers.
+    """
+    return (await probe_results("capacity"))["capacity"]
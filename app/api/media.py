@@ -0,0 +1,68 @@
+"""Serving of local /storage media (avatars, TTS audio, voice notes, preview videos)"""
+import mimetypes
+import os
+import time
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app.core.config import settings
+from app.services.storage import STORAGE_DIR, verify_media_signature
+
+router = APIRouter()
+
+# Stored files get uuid-derived names and are never rewritten, so a URL always
+# maps to the same bytes
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+def _resolve(file_path: str):
+    root = STORAGE_DIR.resolve()
+    full_path = (root / file_path).resolve()
+    if not full_path.is_relative_to(root) or not full_path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    return root, full_path
+
+def _etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_media(file_path: str, request: Request):
+    """
+    Serve a stored media file.
+
+    Responses carry a strong ETag and long-lived immutable Cache-Control (capped
+    at the signature's remaining lifetime for signed URLs), answer
+    If-None-Match with 304, and support byte Range requests for video seeking.
+    With MEDIA_OFFLOAD set, the transfer itself is handed to the fronting
+    proxy via X-Accel-Redirect or X-Sendfile, so uvicorn only checks the
+    request and never streams the bytes.
+    """
+    max_age = IMMUTABLE_MAX_AGE
+    if settings.MEDIA_URL_SIGNING:
+        expires = request.query_params.get("expires")
+        if not verify_media_signature(request.url.path, expires, request.query_params.get("md5")):
+            raise HTTPException(status_code=403, detail="Invalid or expired media link")
+        max_age = max(0, int(expires) - int(time.time()))
+
+    root, full_path = _resolve(file_path)
+    stat = full_path.stat()
+    headers = {
+        "ETag": _etag(stat),
+        "Cache-Control": f"public, max-age={max_age}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+    relative_path = full_path.relative_to(root).as_posix()
+    if settings.MEDIA_OFFLOAD == "x-accel":
+        headers["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_PREFIX.rstrip('/')}/{relative_path}"
+        return Response(headers=headers, media_type=media_type)
+    if settings.MEDIA_OFFLOAD == "x-sendfile":
+        headers["X-Sendfile"] = str(full_path)
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(full_path, stat_result=stat, headers=headers, media_type=media_type)
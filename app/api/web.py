@@ -1,7 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from app.agent.graph import app_graph
-from langchain_core.messages import HumanMessage
+from app.services.rate_limiter import check_rate_limits, analyze_limits
 
 router = APIRouter()
 
@@ -14,10 +13,25 @@ class AnalyzeResponse(BaseModel):
     analysis: str
 
 @router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_text(request: AnalyzeRequest):
+async def analyze_text(request: AnalyzeRequest, http_request: Request):
     """
     Analyze text using the LangGraph agent for the web frontend.
     """
+    # Every call is a paid Groq request; limit per client address
+    client = http_request.client.host if http_request.client else "unknown"
+    decision = check_rate_limits(analyze_limits(client))
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(max(1, round(decision.retry_after)))}
+        )
+    
+    # Imported on first use: langchain/langgraph and the graph compile are the
+    # slowest part of API startup
+    from app.agent.graph import app_graph
+    from langchain_core.messages import HumanMessage
+    
     try:
         # Prepare the state for the agent
         # We could inject user profile info into the state if the graph supports it
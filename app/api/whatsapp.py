@@ -1,18 +1,27 @@
-from fastapi import APIRouter, Form, HTTPException, Request, Depends
+from fastapi import APIRouter, Form, HTTPException, Request, Response, Depends
 from typing import Annotated
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from app.core.config import settings
+from app.core.tracing import span, tag_trace
 from app.db.base import get_db
-from app.workers.celery_app import generate_and_send_video
-from app.db.models import Business, Customer, Conversation
-from app.services.twilio_service import send_whatsapp_message
+from app.db.models import Business, Customer, Conversation, MessageDelivery
+from app.services.twilio_service import send_whatsapp_message, is_valid_twilio_request
+from app.services.webhook_dedupe import claim_message_sid, release_message_sid, record_duplicate, duplicate_count
+from app.services.rate_limiter import check_rate_limits, webhook_limits, claim_limit_notice, limited_count
+from app.services.response_policy import MODE_FAQ
+from app.services.delivery_status import status_event, buffer_event, apply_events, pending_event_count, status_callback_url, FAILED_STATUSES
 
 router = APIRouter()
 
-#def trigger_task(...):
-    #from app.workers.celery_app import generate_and_send_video
-    #generate_and_send_video.delay(...)
-    
+EMPTY_TWIML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Response></Response>'''
+
+RATE_LIMITED_TWIML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Message>You're sending messages faster than we can record video replies. Please wait a minute and send your question again.</Message>
+</Response>'''
+
 def get_or_create_customer(phone_number: str, business_id: int, db: Session) -> Customer:
     """Get existing customer or create new one"""
     customer = db.query(Customer).filter(
@@ -36,20 +45,40 @@ async def whatsapp_webhook(
     From: Annotated[str, Form()],
     To: Annotated[str, Form()],
     Body: Annotated[str, Form()],
+    MessageSid: Annotated[str | None, Form()] = None,
     db: Session = Depends(get_db)
 ):
     """
     Handle incoming WhatsApp messages from Twilio.
     
     Multi-tenant flow:
+    0. Drop Twilio retries of a MessageSid we've already accepted
     1. Look up which business owns the 'To' WhatsApp number
     2. Create/get customer record
     3. Create conversation record
-    4. Send immediate acknowledgment
-    5. Trigger async video generation
+    4. Trigger async video generation
+    5. Send immediate acknowledgment
     """
     print(f"Received message from {From} to {To}: {Body}")
     
+    with span("whatsapp.webhook", message_sid=MessageSid) as current:
+        # 0. Twilio retries timed-out webhooks with the same MessageSid
+        if MessageSid and not claim_message_sid(MessageSid):
+            print(f"Duplicate webhook for {MessageSid}, skipping")
+            record_duplicate()
+            current.set_attribute("duplicate", True)
+            return EMPTY_TWIML
+        
+        try:
+            return _ingest_message(From, To, Body, MessageSid, db)
+        except Exception:
+            # Let Twilio's retry through if we failed before accepting the message
+            if MessageSid:
+                release_message_sid(MessageSid)
+            raise
+
+def _ingest_message(From: str, To: str, Body: str, MessageSid: str | None, db: Session):
+    """Steps 1-5 of the webhook flow for a message that passed the Redis dedupe"""
     # Extract WhatsApp number from 'To' field
     # Twilio sends in format: whatsapp:+1234567890
     business_number = To.replace("whatsapp:", "")
@@ -72,22 +101,93 @@ async def whatsapp_webhook(
     <Message>This business account is currently inactive.</Message>
 </Response>'''
     
-    # 2. Get or create customer
     customer_phone = From.replace("whatsapp:", "")
+    tag_trace(business_id=business.id)
+    
+    # Over-limit senders get a text notice (at most once a minute) instead of a render
+    decision = check_rate_limits(webhook_limits(business.id, customer_phone))
+    if not decision.allowed:
+        print(f"Rate limited {customer_phone} -> business {business.id} ({decision.limited_by}, retry in {decision.retry_after:.0f}s)")
+        return RATE_LIMITED_TWIML if claim_limit_notice(business.id, customer_phone) else EMPTY_TWIML
+    
+    # 2. Get or create customer
     customer = get_or_create_customer(customer_phone, business.id, db)
     
     # 3. Create conversation record
+    existing = db.query(Conversation).filter(Conversation.message_sid == MessageSid).first() if MessageSid else None
+    if existing:
+        record_duplicate()
+        if existing.status == "pending":
+            # Accepted by an earlier delivery whose job never reached the broker
+            print(f"Conversation {existing.id} was never queued, queueing it on Twilio's retry")
+            _start_reply(db, business, existing, From)
+        return EMPTY_TWIML
+    
     conversation = Conversation(
         business_id=business.id,
         customer_id=customer.id,
+        message_sid=MessageSid,
         message_from_customer=Body,
         status="pending"
     )
     db.add(conversation)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent delivery of the same MessageSid won the race
+        db.rollback()
+        record_duplicate()
+        return EMPTY_TWIML
     db.refresh(conversation)
+    tag_trace(conversation_id=conversation.id)
+    
+    # 4-5. Queue the reply and acknowledge
+    try:
+        _start_reply(db, business, conversation, From)
+    except Exception:
+        # Not queued: drop the conversation so Twilio's retry of this MessageSid starts over
+        db.rollback()
+        try:
+            db.delete(conversation)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to remove unqueued conversation {conversation.id}, Twilio's retry will queue it: {e}")
+        raise
+    
+    # Return empty response (we already sent acknowledgment via Twilio API)
+    return EMPTY_TWIML
+
+def _start_reply(db: Session, business: Business, conversation: Conversation, From: str) -> None:
+    """
+    Queue the reply job, mark the conversation queued, then acknowledge the customer.
+    
+    A conversation still "pending" never had its job queued, which is how a
+    Twilio retry of the same MessageSid knows to queue it.
+    
+    Raises:
+        Exception: the job could not be queued (nothing was sent)
+    """
+    # (Celery is imported on first message rather than at API startup)
+    from app.workers.celery_app import generate_and_send_video
+    generate_and_send_video.delay(
+        conversation_id=conversation.id,
+        business_id=business.id,
+        customer_phone=From,
+        message_text=conversation.message_from_customer
+    )
+    
+    # The job is out, so a failure from here on must not bring Twilio's retry back
+    try:
+        db.query(Conversation).filter(
+            Conversation.id == conversation.id,
+            Conversation.status == "pending"
+        ).update({Conversation.status: "queued"}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to mark conversation {conversation.id} queued: {e}")
     
-    # 4. Send immediate acknowledgment
     try:
         send_whatsapp_message(
             From,
@@ -95,15 +195,113 @@ async def whatsapp_webhook(
         )
     except Exception as e:
         print(f"Failed to send acknowledgment: {e}")
+
+@router.post("/status")
+async def whatsapp_status_callback(
+    request: Request,
+    MessageSid: Annotated[str, Form()],
+    MessageStatus: Annotated[str, Form()],
+    ErrorCode: Annotated[str | None, Form()] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Twilio delivery status callback (queued, sent, delivered, read, undelivered, failed).
     
-    # 5. Trigger async video generation
-    generate_and_send_video.delay(
-        conversation_id=conversation.id,
-        business_id=business.id,
-        customer_phone=From,
-        message_text=Body
-    )
+    Only requests signed by Twilio for status_callback_url() are accepted.
+    Events are buffered and written in batches by flush_delivery_events; the
+    first event of a window schedules the flush.
+    """
+    url = status_callback_url()
+    params = dict(await request.form())
+    if not url or not is_valid_twilio_request(url, params, request.headers.get("X-Twilio-Signature")):
+        raise HTTPException(status_code=403, detail="Invalid Twilio signature")
     
-    # Return empty response (we already sent acknowledgment via Twilio API)
-    return f'''<?xml version="1.0" encoding="UTF-8"?>
-<Response></Response>'''
+    event = status_event(MessageSid, MessageStatus, ErrorCode)
+    try:
+        if buffer_event(event):
+            from app.workers.celery_app import flush_delivery_events
+            flush_delivery_events.apply_async(countdown=settings.DELIVERY_FLUSH_SECONDS)
+    except Exception as e:
+        # No buffer without Redis: write this event on its own
+        print(f"Delivery event buffer unavailable, writing {MessageSid} directly: {e}")
+        apply_events(db, [event])
+    return Response(status_code=204)
+
+def _percentile(values: list[float], pct: float, digits: int = 1) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct))], digits)
+
+@router.get("/stats")
+async def webhook_stats(db: Session = Depends(get_db)):
+    """Webhook ingestion counters and reply latency over recent conversations"""
+    recent = db.query(Conversation.created_at, Conversation.first_reply_at, Conversation.sent_at).filter(
+        Conversation.sent_at.isnot(None)
+    ).order_by(Conversation.id.desc()).limit(500).all()
+    
+    first_reply = [(r.first_reply_at - r.created_at).total_seconds() for r in recent if r.first_reply_at]
+    full_reply = [(r.sent_at - r.created_at).total_seconds() for r in recent]
+    
+    durations = db.query(Conversation.predicted_duration_seconds, Conversation.audio_duration_seconds).filter(
+        Conversation.audio_duration_seconds.isnot(None),
+        Conversation.predicted_duration_seconds.isnot(None)
+    ).order_by(Conversation.id.desc()).limit(500).all()
+    errors = [abs(d.predicted_duration_seconds - d.audio_duration_seconds) for d in durations]
+    
+    # Conversations of businesses with an FAQ library (faq_similarity is set on every lookup)
+    lookups = db.query(
+        Conversation.response_mode, Conversation.faq_similarity, Conversation.created_at, Conversation.sent_at
+    ).filter(Conversation.faq_similarity.isnot(None)).order_by(Conversation.id.desc()).limit(500).all()
+    faq_hits = [r for r in lookups if r.response_mode == MODE_FAQ]
+    faq_reply = [(r.sent_at - r.created_at).total_seconds() for r in faq_hits if r.sent_at]
+    generated_reply = [(r.sent_at - r.created_at).total_seconds() for r in lookups if r.sent_at and r.response_mode != MODE_FAQ]
+    
+    # Final replies with their Twilio delivery state
+    deliveries = db.query(
+        MessageDelivery.status, MessageDelivery.sent_at, MessageDelivery.delivered_at, MessageDelivery.read_at,
+        Conversation.created_at
+    ).join(Conversation, Conversation.reply_message_sid == MessageDelivery.message_sid).order_by(
+        MessageDelivery.id.desc()
+    ).limit(500).all()
+    delivered = [d for d in deliveries if d.delivered_at]
+    send_to_delivered = [(d.delivered_at - d.sent_at).total_seconds() for d in delivered if d.sent_at]
+    message_to_delivered = [(d.delivered_at - d.created_at).total_seconds() for d in delivered]
+    delivered_to_read = [(d.read_at - d.delivered_at).total_seconds() for d in delivered if d.read_at]
+    status_counts = {}
+    for d in deliveries:
+        status_counts[d.status] = status_counts.get(d.status, 0) + 1
+    
+    return {
+        # Each rejected duplicate would otherwise have triggered a full render
+        "duplicate_webhooks_rejected": duplicate_count(),
+        "rate_limited_requests": limited_count(),
+        "time_to_first_reply_seconds": {"p50": _percentile(first_reply, 0.5), "p95": _percentile(first_reply, 0.95)},
+        "time_to_full_reply_seconds": {"p50": _percentile(full_reply, 0.5), "p95": _percentile(full_reply, 0.95)},
+        "sample_size": len(recent),
+        "reply_duration": {
+            "predicted_avg_seconds": round(sum(d.predicted_duration_seconds for d in durations) / len(durations), 1) if durations else None,
+            "actual_avg_seconds": round(sum(d.audio_duration_seconds for d in durations) / len(durations), 1) if durations else None,
+            "abs_error_p50_seconds": _percentile(errors, 0.5),
+            "abs_error_p95_seconds": _percentile(errors, 0.95),
+            "sample_size": len(durations)
+        },
+        "faq_library": {
+            "match_rate": round(len(faq_hits) / len(lookups), 3) if lookups else None,
+            "matched_similarity_p50": _percentile([r.faq_similarity for r in faq_hits], 0.5, digits=3),
+            "missed_similarity_p50": _percentile([r.faq_similarity for r in lookups if r.response_mode != MODE_FAQ], 0.5, digits=3),
+            "faq_reply_seconds": {"p50": _percentile(faq_reply, 0.5), "p95": _percentile(faq_reply, 0.95)},
+            "generated_reply_seconds": {"p50": _percentile(generated_reply, 0.5), "p95": _percentile(generated_reply, 0.95)},
+            "sample_size": len(lookups)
+        },
+        "delivery": {
+            "statuses": status_counts,
+            "failure_rate": round(sum(1 for d in deliveries if d.status in FAILED_STATUSES) / len(deliveries), 3) if deliveries else None,
+            "read_rate": round(sum(1 for d in deliveries if d.read_at) / len(deliveries), 3) if deliveries else None,
+            "send_to_delivered_seconds": {"p50": _percentile(send_to_delivered, 0.5), "p95": _percentile(send_to_delivered, 0.95)},
+            "message_to_delivered_seconds": {"p50": _percentile(message_to_delivered, 0.5), "p95": _percentile(message_to_delivered, 0.95)},
+            "delivered_to_read_seconds": {"p50": _percentile(delivered_to_read, 0.5), "p95": _percentile(delivered_to_read, 0.95)},
+            "pending_status_events": pending_event_count(),
+            "sample_size": len(deliveries)
+        }
+    }
@@ -5,11 +5,40 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "VidioAgent"
     SECRET_KEY: str = "development_secret"
     
+    # Auth: bcrypt cost (older hashes are upgraded on the next login), threads
+    # hashing off the event loop, and how long decoded tokens/business rows are cached
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    AUTH_CACHE_SECONDS: int = 30
+    
     # AI Providers
     GROQ_API_KEY: str | None = None
     OPENAI_API_KEY: str | None = None
     ELEVENLABS_API_KEY: str | None = None
     REPLICATE_API_TOKEN: str | None = None
+    ANTHROPIC_API_KEY: str | None = None
+    
+    # LLM provider router: preference order, model per provider, rolling stats window,
+    # hedging (a second provider is raced once the first passes its p95 time to first
+    # token) and the error rate above which a provider is tried last
+    LLM_PROVIDERS: str = "groq,anthropic,openai"
+    GROQ_MODEL: str = "llama-3.3-70b-versatile"
+    ANTHROPIC_MODEL: str = "claude-3-5-haiku-latest"
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    LLM_STATS_WINDOW_SECONDS: int = 300
+    LLM_MIN_SAMPLES: int = 20
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_DEFAULT_SECONDS: float = 3.0
+    LLM_HEDGE_MIN_SECONDS: float = 0.5
+    LLM_MAX_ERROR_RATE: float = 0.5
+    
+    # Provider API base URLs (overridden to point workers at local fakes in load tests)
+    GROQ_API_BASE: str | None = None
+    ANTHROPIC_API_BASE: str = "https://api.anthropic.com"
+    OPENAI_API_BASE: str | None = None
+    ELEVENLABS_API_BASE: str = "https://api.elevenlabs.io"
+    REPLICATE_API_BASE: str = "https://api.replicate.com"
+    TWILIO_API_BASE: str | None = None
     
     # Twilio
     TWILIO_ACCOUNT_SID: str | None = None
@@ -20,6 +49,136 @@ class Settings(BaseSettings):
     DATABASE_URL: str | None = None
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    # Worker profile: "io" (thread pool, many in-flight network-bound jobs) or "prefork"
+    CELERY_WORKER_PROFILE: str = "io"
+    # In-flight jobs per worker process under the "io" profile
+    CELERY_IO_CONCURRENCY: int = 32
+    # SQLAlchemy pool per process; the "io" profile holds one connection per in-flight job
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 40
+    # Number of renders that can run in parallel (used to project backlog wait)
+    RENDER_CONCURRENCY: int = 4
+    # Collect renders for the same avatar for this long and flush them together (0 disables)
+    RENDER_BATCH_WINDOW_SECONDS: float = 2.0
+    # Concurrent ElevenLabs requests per worker process (account limit / worker processes)
+    ELEVENLABS_MAX_CONCURRENCY: int = 3
+    # Stream LLM tokens into sentence-level TTS instead of waiting for the full reply
+    STREAMING_TTS_ENABLED: bool = True
+    
+    # ffmpeg executable used for local media processing (preview renders, transcodes)
+    FFMPEG_BINARY: str = "ffmpeg"
+    
+    # Generated media retention: default per-business quota, files deleted per GC pass, pass interval
+    MEDIA_QUOTA_MB: int = 500
+    MEDIA_GC_BATCH_SIZE: int = 200
+    MEDIA_GC_INTERVAL_SECONDS: int = 600
+    # Sentence-level TTS cache on each worker's disk, outside the public storage tree; each
+    # worker drops sentences unused for TTS_CACHE_DAYS (cached by day of last use)
+    TTS_CACHE_DIR: str = "./cache/tts"
+    TTS_CACHE_DAYS: int = 30
+    
+    # Pre-rendered FAQ library: cosine similarity needed to answer from it, embedding
+    # model ("default" = chromadb's local MiniLM, "openai"), concurrent offline renders,
+    # and the vector store (local directory, or a chroma server when CHROMA_HOST is set)
+    FAQ_MATCH_THRESHOLD: float = 0.85
+    FAQ_EMBEDDING_PROVIDER: str = "default"
+    FAQ_RENDER_CONCURRENCY: int = 4
+    CHROMA_PERSIST_DIR: str = "./chroma"  # outside ./storage, which is served publicly
+    CHROMA_HOST: str | None = None
+    CHROMA_PORT: int = 8000
+    
+    # Circuit breakers for Replicate/ElevenLabs/Twilio (shared via Redis): open when a window has at
+    # least BREAKER_MIN_FAILURES failures making up BREAKER_FAILURE_RATIO of calls, then let
+    # one probe through after the cooldown. Jobs park for at most BREAKER_MAX_PARKS cooldowns.
+    BREAKER_WINDOW_SECONDS: int = 60
+    BREAKER_MIN_FAILURES: int = 5
+    BREAKER_FAILURE_RATIO: float = 0.5
+    BREAKER_COOLDOWN_SECONDS: int = 30
+    BREAKER_PROBE_TIMEOUT_SECONDS: int = 600
+    BREAKER_MAX_PARKS: int = 20
+    # Bulkheads: jobs per worker process allowed inside each provider's calls at once
+    BULKHEAD_REPLICATE: int = 16
+    BULKHEAD_ELEVENLABS: int = 16
+    BULKHEAD_TWILIO: int = 16
+    BULKHEAD_WAIT_SECONDS: float = 2.0
+    BULKHEAD_RETRY_SECONDS: int = 10
+    
+    # Twilio delivery status callbacks (need BASE_URL): events are buffered in Redis and written
+    # in one batched upsert per DELIVERY_FLUSH_SECONDS window, at most DELIVERY_FLUSH_BATCH per statement
+    DELIVERY_CALLBACKS_ENABLED: bool = True
+    DELIVERY_FLUSH_SECONDS: int = 2
+    DELIVERY_FLUSH_BATCH: int = 500
+    
+    # Broadcast campaigns: distinct greetings rendered per batch and at once, recipients sent per
+    # task, the shared Twilio sender bucket (burst, sustained rate), the longest in-task wait for a
+    # send token, and how often delivery re-checks while greetings are still rendering
+    CAMPAIGN_MAX_RECIPIENTS: int = 10000
+    CAMPAIGN_RENDER_BATCH: int = 20
+    CAMPAIGN_RENDER_CONCURRENCY: int = 4
+    CAMPAIGN_SEND_BATCH: int = 50
+    CAMPAIGN_SEND_BURST: int = 20
+    CAMPAIGN_SENDS_PER_MINUTE: float = 600
+    CAMPAIGN_MAX_PACING_SECONDS: float = 2.0
+    CAMPAIGN_POLL_SECONDS: int = 5
+    
+    # Tenant-affinity routing of replies: each business hashes to one of AFFINITY_SHARDS reply
+    # queues, and live workers split the shards on a consistent-hash ring (AFFINITY_VNODES points
+    # each, membership renewed every AFFINITY_HEARTBEAT_SECONDS). A shard with AFFINITY_SPILLOVER_DEPTH
+    # jobs waiting, or no live owner, spills to the shared replies queue. Workers keep up to
+    # BUSINESS_CACHE_SIZE businesses' assets for BUSINESS_CACHE_SECONDS
+    AFFINITY_ROUTING_ENABLED: bool = False
+    AFFINITY_SHARDS: int = 64
+    AFFINITY_VNODES: int = 64
+    AFFINITY_HEARTBEAT_SECONDS: int = 10
+    AFFINITY_SPILLOVER_DEPTH: int = 20
+    BUSINESS_CACHE_SIZE: int = 512
+    BUSINESS_CACHE_SECONDS: int = 300
+    
+    # Readiness and capacity (/ready, /capacity): dependency probes are cached for
+    # CAPACITY_PROBE_SECONDS (queue and worker figures for CAPACITY_CACHE_SECONDS) and refreshed
+    # in the background, each bounded by CAPACITY_PROBE_TIMEOUT_SECONDS. Workers report their
+    # slots every WORKER_HEARTBEAT_SECONDS. desired_workers keeps busy + waiting jobs at
+    # AUTOSCALE_TARGET_UTILIZATION of the slots, adds a worker while the oldest job has waited
+    # over AUTOSCALE_MAX_QUEUE_AGE_SECONDS, and stays within AUTOSCALE_MIN/MAX_WORKERS
+    CAPACITY_PROBE_SECONDS: int = 15
+    CAPACITY_CACHE_SECONDS: int = 5
+    CAPACITY_PROBE_TIMEOUT_SECONDS: float = 2.0
+    CAPACITY_PROVIDER_PROBES: bool = True
+    WORKER_HEARTBEAT_SECONDS: int = 10
+    AUTOSCALE_MIN_WORKERS: int = 1
+    AUTOSCALE_MAX_WORKERS: int = 20
+    AUTOSCALE_TARGET_UTILIZATION: float = 0.75
+    AUTOSCALE_MAX_QUEUE_AGE_SECONDS: int = 30
+    
+    # OpenTelemetry tracing: exporter "otlp" (gRPC collector), "file" (JSON lines) or "console".
+    # OTEL_SAMPLE_RATIO is the share of new traces recorded; OTEL_MAX_QUEUE_SIZE bounds the
+    # spans buffered for export (extra spans are dropped rather than blocking requests)
+    OTEL_ENABLED: bool = False
+    OTEL_EXPORTER: str = "otlp"
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://localhost:4317"
+    OTEL_FILE_PATH: str = "./traces.jsonl"
+    OTEL_SAMPLE_RATIO: float = 0.1
+    OTEL_MAX_QUEUE_SIZE: int = 2048
+    
+    # Token-bucket rate limits (burst size and sustained rate per minute) shared via Redis
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CUSTOMER_BURST: int = 5
+    RATE_LIMIT_CUSTOMER_PER_MINUTE: float = 3
+    RATE_LIMIT_BUSINESS_BURST: int = 60
+    RATE_LIMIT_BUSINESS_PER_MINUTE: float = 60
+    RATE_LIMIT_ANALYZE_BURST: int = 10
+    RATE_LIMIT_ANALYZE_PER_MINUTE: float = 20
+    
+    # /storage serving: require signed expiring URLs, their lifetime, and optional proxy
+    # offload ("x-accel" for nginx X-Accel-Redirect, "x-sendfile" for Apache/lighttpd)
+    MEDIA_URL_SIGNING: bool = False
+    MEDIA_URL_TTL_SECONDS: int = 24 * 60 * 60
+    MEDIA_OFFLOAD: str | None = None
+    MEDIA_ACCEL_PREFIX: str = "/protected-storage/"
+    
+    # Import heavy SDKs in the background once the API/worker is up
+    PRELOAD_HEAVY_MODULES: bool = True
+    
     # Optional base URL for building absolute links (used for CORS and media URLs)
     BASE_URL: str | None = None
 
@@ -0,0 +1,22 @@
+"""Shared Redis connection used for live counters, latency samples and dedupe sets"""
+from app.core.config import settings
+
+_client = None
+
+def get_redis() -> "redis.Redis":
+    """
+    Return a process-wide Redis client bound to the Celery broker.
+
+    The redis package is imported and the connection created on first use, so
+    importing this module costs nothing at startup and never touches the
+    network.
+    """
+    global _client
+    if _client is None:
+        import redis
+
+        kwargs = {"decode_responses": True, "socket_timeout": 2}
+        if settings.CELERY_BROKER_URL.startswith("rediss://"):
+            kwargs["ssl_cert_reqs"] = "required"
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL, **kwargs)
+    return _client
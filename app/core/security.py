@@ -1,9 +1,27 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
 import jwt
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes at any other cost report needs_update, so raising (or lowering)
+# BCRYPT_ROUNDS upgrades each account on its next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt is deliberately slow CPU work (~250ms at cost 12). Running it on a
+# small dedicated pool keeps the event loop free for webhooks, and bounds how
+# many cores a burst of logins can take.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 
 def hash_password(plain_password: str) -> str:
     return pwd_context.hash(plain_password)
@@ -13,6 +31,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify a password, returning a replacement hash when the stored one uses outdated parameters"""
+    if not hashed_password:
+        return False, None
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(plain_password: str) -> str:
+    """hash_password on the password-hash pool"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, hash_password, plain_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """verify_and_update_password on the password-hash pool"""
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_executor, verify_and_update_password, plain_password, hashed_password
+    )
+
 def create_access_token(subject: str | int, expires_delta: int = 60*60*24) -> str:
     """Create a JWT access token.
 
@@ -22,3 +56,7 @@ def create_access_token(subject: str | int, expires_delta: int = 60*60*24) -> st
     to_encode = {"sub": str(subject), "exp": expire}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
+
+def decode_access_token(token: str) -> dict:
+    """Decode and validate a JWT access token (raises jwt.InvalidTokenError)"""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"], options={"require": ["sub", "exp"]})
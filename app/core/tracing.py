@@ -0,0 +1,151 @@
+"""OpenTelemetry tracing for the API and workers.
+
+One trace covers a message end to end: the webhook span's context rides in
+the Celery message headers, so the worker's task span (and its retries and
+re-dispatches) continue the same trace, with child spans around the LLM, TTS,
+render, storage writes and Twilio sends. Every span carries the business_id
+and conversation_id tagged on the current context.
+
+Tracing is off unless OTEL_ENABLED is set; the API calls are then no-ops.
+Overhead is bounded by head sampling (OTEL_SAMPLE_RATIO, honouring the
+parent's decision so a trace is all-or-nothing) and by a bounded batch queue
+exported from a background thread, which drops spans rather than block when
+the collector falls behind.
+"""
+import contextvars
+import json
+from contextlib import contextmanager
+
+from opentelemetry import context, propagate, trace
+
+from app.core.config import settings
+
+TRACER_NAME = "vidioagent"
+
+# business_id / conversation_id added to every span started in this context
+_trace_tags: contextvars.ContextVar[dict] = contextvars.ContextVar("trace_tags", default={})
+
+_initialized = False
+
+class JsonLinesSpanExporter:
+    """Writes finished spans as one JSON object per line (OTEL_EXPORTER=file)"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        for span in spans:
+            self._file.write(json.dumps({
+                "name": span.name,
+                "trace_id": format(span.context.trace_id, "032x"),
+                "span_id": format(span.context.span_id, "016x"),
+                "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+                "start": span.start_time,
+                "end": span.end_time,
+                "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+                "status": span.status.status_code.name,
+                "service": span.resource.attributes.get("service.name"),
+                "attributes": dict(span.attributes),
+            }) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        self._file.close()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self._file.flush()
+        return True
+
+def init_tracing(service_name: str) -> bool:
+    """
+    Install the tracer provider for this process (once; no-op unless OTEL_ENABLED).
+
+    Args:
+        service_name: service.name resource attribute ("vidioagent-api", "vidioagent-worker")
+
+    Returns:
+        True if spans will be recorded and exported
+    """
+    global _initialized
+    if _initialized or not settings.OTEL_ENABLED:
+        return _initialized
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if settings.OTEL_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT, insecure=True)
+    elif settings.OTEL_EXPORTER == "file":
+        exporter = JsonLinesSpanExporter(settings.OTEL_FILE_PATH)
+    else:
+        exporter = ConsoleSpanExporter()
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.OTEL_SAMPLE_RATIO))
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter, max_queue_size=settings.OTEL_MAX_QUEUE_SIZE))
+    trace.set_tracer_provider(provider)
+    _initialized = True
+    return True
+
+def shutdown_tracing() -> None:
+    """Flush buffered spans (call before the process exits)"""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+def tag_trace(**tags) -> None:
+    """
+    Tag the current span, and every span started after it in this context, e.g. business_id.
+
+    The tags follow the context into asyncio.run and asyncio.to_thread, so
+    spans in the service layer pick them up without being passed the IDs.
+    """
+    tags = {key: value for key, value in tags.items() if value is not None}
+    _trace_tags.set({**_trace_tags.get(), **tags})
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(tags)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Start a child span of the current one, with the context's tags and the given attributes"""
+    attributes = {**_trace_tags.get(), **{key: value for key, value in attributes.items() if value is not None}}
+    with trace.get_tracer(TRACER_NAME).start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+def inject_headers(headers: dict) -> None:
+    """Write the current trace context (W3C traceparent/baggage) into a carrier dict"""
+    propagate.inject(headers)
+
+def start_remote_span(name: str, carrier, getter=None, **attributes):
+    """
+    Start and activate a span continuing the trace found in a carrier (e.g. a Celery request).
+
+    Clears the context's tags first: pool threads run one task after another
+    in the same context, and the previous task's IDs must not carry over.
+
+    Returns:
+        (span, context token) for end_remote_span
+    """
+    _trace_tags.set({})
+    parent = propagate.extract(carrier, getter=getter) if getter else propagate.extract(carrier)
+    current = trace.get_tracer(TRACER_NAME).start_span(
+        name, context=parent, kind=trace.SpanKind.CONSUMER, attributes=attributes
+    )
+    token = context.attach(trace.set_span_in_context(current, parent))
+    return current, token
+
+def end_remote_span(current, token, error: BaseException | None = None) -> None:
+    """End a span from start_remote_span and restore the previous context"""
+    if error is not None:
+        current.record_exception(error)
+        current.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+    current.end()
+    context.detach(token)
@@ -0,0 +1,26 @@
+"""Deferred loading of heavy SDKs after the process is already serving"""
+import importlib
+import time
+
+# Imported lazily by the code that uses them; preloading moves the cost off
+# the first request/job without putting it back on the startup path
+HEAVY_MODULES = [
+    "app.agent.graph",  # langchain, langgraph, langchain_groq + graph compile
+    "app.services.video",
+    "replicate",
+    "twilio.rest",
+    "redis",
+]
+
+def preload_heavy_modules() -> dict:
+    """Import HEAVY_MODULES, returning {module: seconds} (failures are logged, not raised)"""
+    timings = {}
+    for name in HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warmup import of {name} failed: {e}")
+            continue
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
@@ -3,7 +3,14 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
 # Use SQLite for development if DATABASE_URL not set
-if settings.DATABASE_URL:
+if settings.DATABASE_URL and not settings.DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
+elif settings.DATABASE_URL:
     engine = create_engine(settings.DATABASE_URL)
 else:
     # SQLite fallback for local development
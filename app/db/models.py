@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Float
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -18,10 +18,32 @@ class Business(Base):
     avatar_image_url = Column(String(500))  # Avatar image for video
     password_hash = Column(String(255))
     
+    # Cloned ElevenLabs voice, reused for every render
+    elevenlabs_voice_id = Column(String(100))
+    voice_sample_hash = Column(String(64))  # sha256 of the sample the voice was cloned from
+    voice_clone_status = Column(String(20))  # pending, ready, failed
+    
     # Settings
     response_style = Column(String(50), default="professional")  # professional, casual, friendly
     is_active = Column(Boolean, default=True)
     
+    # Load-adaptive replies: fall back to voice note / text when a video would miss the SLA
+    adaptive_response_enabled = Column(Boolean, default=False)
+    video_sla_seconds = Column(Integer, default=300)
+    voice_sla_seconds = Column(Integer, default=60)
+    
+    # Progressive delivery: send the voice note as soon as TTS finishes, then the video
+    progressive_delivery_enabled = Column(Boolean, default=False)
+    
+    # Reply length planner: spoken replies are budgeted to about this many seconds
+    target_video_seconds = Column(Integer, default=30)
+    
+    # Video engine: lipsync (SadTalker only), preview_then_lipsync, or preview (local render only)
+    video_render_mode = Column(String(30), default="lipsync")
+    
+    # Generated media quota (MB); None uses settings.MEDIA_QUOTA_MB
+    media_quota_mb = Column(Integer)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -54,19 +76,157 @@ class Conversation(Base):
     business_id = Column(Integer, ForeignKey('businesses.id'), nullable=False)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
     
+    # Twilio MessageSid of the inbound message (dedupes webhook retries)
+    message_sid = Column(String(64), unique=True, index=True)
+    # Twilio MessageSid of the final reply; its delivery is tracked in message_deliveries
+    reply_message_sid = Column(String(64), index=True)
+    
     # Message content
     message_from_customer = Column(Text, nullable=False)
     ai_response_text = Column(Text)
     video_url = Column(String(500))
     
+    # Pipeline checkpoints so retries resume from the first incomplete stage
+    audio_path = Column(String(500))
+    prediction_id = Column(String(100))
+    preview_video_path = Column(String(500))
+    preview_sent_at = Column(DateTime)
+    voice_note_path = Column(String(500))
+    voice_note_sent_at = Column(DateTime)
+    
+    # Duration planner: estimate from the text vs measured TTS audio
+    predicted_duration_seconds = Column(Float)
+    audio_duration_seconds = Column(Float)
+    
+    # Reply format chosen by the adaptive policy
+    response_mode = Column(String(20))  # video, audio, text, faq
+    response_mode_reason = Column(String(255))
+    
+    # FAQ library lookup: best similarity found (set whenever a lookup ran) and the matched entry
+    faq_similarity = Column(Float)
+    faq_entry_id = Column(Integer, ForeignKey('faq_entries.id'))
+    
     # Status tracking
-    status = Column(String(20), default="pending")  # pending, processing, sent, failed
+    status = Column(String(20), default="pending")  # pending, queued, processing, retrying, parked, sent, failed
     error_message = Column(Text)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
+    first_reply_at = Column(DateTime)  # first useful delivery (voice note, preview or final reply)
     sent_at = Column(DateTime)
     
     # Relationships
     business = relationship("Business", back_populates="conversations")
     customer = relationship("Customer", back_populates="conversations")
+
+class MediaFile(Base):
+    """Generated media file in local storage, tracked for retention and quota GC"""
+    __tablename__ = "media_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(500), unique=True, nullable=False)
+    kind = Column(String(20), nullable=False)  # audio, voice_note, preview, orphan
+    size_bytes = Column(Integer, default=0)
+    
+    # Owner; both are empty for orphaned files found by the backfill
+    business_id = Column(Integer, ForeignKey('businesses.id'), index=True)
+    conversation_id = Column(Integer, ForeignKey('conversations.id'), index=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # earliest time the GC may delete it
+
+class FaqEntry(Base):
+    """Question/answer pair with a pre-rendered reply video, matched against inbound messages"""
+    __tablename__ = "faq_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey('businesses.id'), nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    
+    # Offline render output; the entry is only matched once it is ready
+    status = Column(String(20), default="pending")  # pending, rendering, ready, failed
+    audio_path = Column(String(500))
+    video_path = Column(String(500))
+    error_message = Column(Text)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    rendered_at = Column(DateTime)
+
+class MessageDelivery(Base):
+    """Delivery state of one outbound WhatsApp message, merged from Twilio status callbacks"""
+    __tablename__ = "message_deliveries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    message_sid = Column(String(64), unique=True, nullable=False, index=True)
+    
+    # Empty until the worker records the send (a callback can arrive first)
+    conversation_id = Column(Integer, ForeignKey('conversations.id'), index=True)
+    kind = Column(String(20))  # voice_note, preview, reply
+    
+    # Furthest status reached; callbacks arriving out of order never move it back
+    status = Column(String(20))  # queued, sent, delivered, read, undelivered, failed
+    status_rank = Column(Integer, default=0)
+    error_code = Column(String(20))
+    
+    # Timestamps
+    sent_at = Column(DateTime)  # Twilio accepted the send request
+    delivered_at = Column(DateTime)
+    read_at = Column(DateTime)
+    failed_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+class Campaign(Base):
+    """Promo video broadcast to a segment of a business's customers, personalized per recipient"""
+    __tablename__ = "campaigns"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey('businesses.id'), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    
+    # Template: what the shared script should say, the spoken per-customer opener and the caption
+    brief = Column(Text, nullable=False)
+    greeting_template = Column(String(255))  # e.g. "Hi {name}!"; empty sends the shared video to everyone
+    caption = Column(String(500))
+    segment = Column(Text)  # JSON filter over customers (see services/campaigns.py)
+    
+    # Shared components, generated once per campaign
+    script_text = Column(Text)
+    base_audio_path = Column(String(500))
+    base_video_path = Column(String(500))  # normalized so greetings are joined without re-encoding it
+    
+    # Status tracking
+    status = Column(String(20), default="draft")  # draft, preparing, running, paused, completed, cancelled, failed
+    run_id = Column(Integer, default=0)  # bumped on start/resume; tasks from an earlier run stop
+    error_message = Column(Text)
+    total_recipients = Column(Integer, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+class CampaignRecipient(Base):
+    """One customer of a campaign and the personalized video sent to them"""
+    __tablename__ = "campaign_recipients"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id'), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
+    phone_number = Column(String(20), nullable=False)
+    
+    # Spoken opener; recipients with the same greeting share one rendered video
+    greeting = Column(String(255))
+    greeting_key = Column(String(16), index=True)
+    video_path = Column(String(500))
+    
+    # Status tracking
+    status = Column(String(20), default="pending")  # pending, rendered, sent, failed
+    message_sid = Column(String(64), index=True)
+    error_message = Column(Text)
+    
+    # Timestamps
+    rendered_at = Column(DateTime)
+    sent_at = Column(DateTime)
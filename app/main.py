@@ -1,16 +1,11 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.api import whatsapp, web, business, auth
+from app.api import whatsapp, web, business, auth, media, faq, campaigns
 from app.core.config import settings
-import os
+import asyncio
 
 app = FastAPI(title="VidioAgent API", version="0.1.0")
 
-# Mount storage directory for serving uploaded files
-if os.path.exists("./storage"):
-    app.mount("/storage", StaticFiles(directory="storage"), name="storage")
-
 # Configure CORS for frontend access using BASE_URL if provided
 allowed = [settings.BASE_URL] if settings.BASE_URL else ["*"]
 app.add_middleware(
@@ -41,6 +36,22 @@ async def startup_checks():
         print("WARNING: SECRET_KEY is not set or uses the default value. Set a strong SECRET_KEY in .env before production.")
     if not settings.ELEVENLABS_API_KEY and not settings.REPLICATE_API_TOKEN and not settings.OPENAI_API_KEY and not settings.GROQ_API_KEY:
         print("INFO: No AI provider keys set. Some features may be disabled until you provide API keys.")
+    
+    # Heavy SDKs are imported on first use; warm them in a thread so startup
+    # stays fast and the first /api/analyze or webhook doesn't pay for them
+    if settings.PRELOAD_HEAVY_MODULES:
+        from app.core.warmup import preload_heavy_modules
+        asyncio.get_running_loop().run_in_executor(None, preload_heavy_modules)
+    
+    from app.core.tracing import init_tracing
+    if init_tracing("vidioagent-api"):
+        print(f"Tracing enabled: {settings.OTEL_EXPORTER} exporter, sampling {settings.OTEL_SAMPLE_RATIO:.0%} of traces")
+
+
+@app.on_event("shutdown")
+async def flush_traces():
+    from app.core.tracing import shutdown_tracing
+    shutdown_tracing()
 
 
 @app.get("/")
@@ -53,22 +64,17 @@ async def health():
     return {"status": "ok"}
 
 
-#@app.get('/ready')
-#async def ready():
-    # Basic readiness check: DB connectivity
-   # try:
-       # from app.db.base import engine
-       # with engine.connect() as conn:
-           # conn.execute("SELECT 1")
-   # except Exception:
-       # raise RuntimeError("db-unavailable")
-    #return {"status": "ready"}
+# Readiness (/ready, with cached DB and broker probes) and /capacity live in app/api/health.py
 
 
 app.include_router(whatsapp.router, prefix="/whatsapp", tags=["whatsapp"])
 app.include_router(web.router, prefix="/api", tags=["web"])
 app.include_router(business.router, prefix="/api/business", tags=["business"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+app.include_router(faq.router, prefix="/api/faqs", tags=["faq"])
+app.include_router(campaigns.router, prefix="/api/campaigns", tags=["campaigns"])
+# Uploaded and generated media (ETag/Range/signed URLs, optional proxy offload)
+app.include_router(media.router, prefix="/storage", tags=["media"])
 from app.api import health
 
 app.include_router(health.router, tags=["health"])
@@ -0,0 +1,103 @@
+"""Worker-local cache of the business data every reply job starts from.
+
+Each reply job loads its business row (voice id, avatar, reply settings) and
+the downscaled avatar it renders from before any provider call. With
+tenant-affinity routing a business's jobs keep landing on the same worker, so
+this process-local cache serves them after the first job; the worker's
+sentence-level TTS disk cache warms up the same way.
+
+Entries are detached Business snapshots, read-only like the API's
+current_business, kept for up to BUSINESS_CACHE_SECONDS. Changing a business
+bumps its version in Redis (invalidate_business_assets) and every worker
+reloads it on its next job; without Redis, entries simply expire.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.models import Business
+
+VERSION_KEY = "vidioagent:business_version:{business_id}"
+
+@dataclass
+class BusinessAssets:
+    business: Business  # detached snapshot; query the row to change it
+    render_source: str | None  # prepared avatar (prepare_render_source), None without an avatar
+    version: str | None  # VERSION_KEY value when loaded
+    loaded_at: float
+
+_entries: OrderedDict[int, BusinessAssets] = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def _version(business_id: int) -> str | None:
+    try:
+        return get_redis().get(VERSION_KEY.format(business_id=business_id))
+    except Exception:
+        return None
+
+def _prepare_source(avatar_path: str | None) -> str | None:
+    from app.services.video import prepare_render_source
+
+    if not avatar_path or not os.path.exists(avatar_path):
+        return None
+    return prepare_render_source(avatar_path)
+
+def load_business_assets(db, business_id: int) -> BusinessAssets | None:
+    """The business's cached assets, loaded through db on a miss (None if the business doesn't exist)"""
+    version = _version(business_id)
+    with _lock:
+        entry = _entries.get(business_id)
+        if entry and entry.version == version and time.monotonic() - entry.loaded_at < settings.BUSINESS_CACHE_SECONDS:
+            _entries.move_to_end(business_id)
+            _stats["hits"] += 1
+            return entry
+        _stats["misses"] += 1
+
+    business = db.query(Business).filter(Business.id == business_id).first()
+    if business is None:
+        with _lock:
+            _entries.pop(business_id, None)
+        return None
+    # Detach with its loaded columns so it outlives this job's session
+    db.expunge(business)
+    entry = BusinessAssets(business, _prepare_source(business.avatar_image_url), version, time.monotonic())
+    with _lock:
+        _entries[business_id] = entry
+        _entries.move_to_end(business_id)
+        while len(_entries) > settings.BUSINESS_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return entry
+
+def render_source_for(business) -> str:
+    """The business's prepared avatar, from the cache when the entry is for the same avatar"""
+    from app.services.video import prepare_render_source
+
+    entry = _entries.get(business.id)
+    if entry and entry.render_source and entry.business.avatar_image_url == business.avatar_image_url:
+        return entry.render_source
+    return prepare_render_source(business.avatar_image_url)
+
+def invalidate_business_assets(business_id: int) -> None:
+    """Make every worker reload a business after it changes"""
+    with _lock:
+        _entries.pop(business_id, None)
+    try:
+        get_redis().incr(VERSION_KEY.format(business_id=business_id))
+    except Exception as e:
+        print(f"Failed to invalidate cached assets of business {business_id}: {e}")
+
+def cache_stats() -> dict:
+    """This process's hits, misses and hit rate since start"""
+    with _lock:
+        hits, misses, size = _stats["hits"], _stats["misses"], len(_entries)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "cached_businesses": size,
+    }
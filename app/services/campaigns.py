@@ -0,0 +1,433 @@
+"""Broadcast campaigns: one promo video, personalized per customer, sent to a segment.
+
+Everything the recipients share is generated once per campaign: the LLM
+script, its TTS audio and its video, which is re-encoded to a fixed format.
+Only the spoken greeting ("Hi Ada!") differs per recipient, and recipients
+with the same greeting share one render. Each distinct greeting is rendered
+as a short clip in the same format and joined in front of the base video by
+stream copy, so personalizing never re-encodes the shared part.
+Recipients without a greeting get the base video as is.
+
+Greeting clips render in throttled batches (CAMPAIGN_RENDER_CONCURRENCY at
+once, behind Replicate's circuit breaker). Delivery runs alongside rendering
+and takes tokens from a shared Twilio sender bucket. Both loops stop at
+their next batch once the campaign is paused or a newer run has started.
+
+WhatsApp only accepts free-form messages within 24 hours of the customer's
+last message. Sends outside that window come back as undelivered through
+the delivery status callbacks.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.db.models import Campaign, CampaignRecipient, Conversation, Customer, MessageDelivery
+
+CAMPAIGN_DRAFT = "draft"
+CAMPAIGN_PREPARING = "preparing"
+CAMPAIGN_RUNNING = "running"
+CAMPAIGN_PAUSED = "paused"
+CAMPAIGN_COMPLETED = "completed"
+CAMPAIGN_CANCELLED = "cancelled"
+CAMPAIGN_FAILED = "failed"
+ACTIVE_STATUSES = (CAMPAIGN_PREPARING, CAMPAIGN_RUNNING)
+
+RECIPIENT_PENDING = "pending"  # waiting for its greeting render
+RECIPIENT_RENDERED = "rendered"  # video ready, waiting to be sent
+RECIPIENT_SENT = "sent"
+RECIPIENT_FAILED = "failed"
+
+# Segment filters over the business's customers (all optional, combined with AND)
+SEGMENT_FIELDS = {
+    "customer_ids": list,  # only these customers
+    "active_within_days": int,  # messaged the business within this many days
+    "min_conversations": int,  # at least this many conversations
+    "named_only": bool,  # skip customers without a name
+}
+
+# Pause after Twilio answers 429 (its per-sender queue is full)
+TWILIO_BACKOFF_SECONDS = 30
+
+# Every video is encoded like this so the clips can be joined by stream copy
+VIDEO_FORMAT = {
+    "vcodec": "libx264",
+    "pix_fmt": "yuv420p",
+    "r": 25,
+    "vf": "scale=512:-2,setsar=1",
+    "acodec": "aac",
+    "ar": 44100,
+    "ac": 2,
+    "video_track_timescale": 12800,
+}
+
+def campaign_dir(campaign_id: int) -> Path:
+    from app.services.storage import CAMPAIGNS_DIR
+
+    directory = CAMPAIGNS_DIR / str(campaign_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+def parse_segment(segment: dict | None) -> dict:
+    """
+    Validate a segment filter.
+
+    Raises:
+        ValueError: unknown field or wrong type
+    """
+    segment = dict(segment or {})
+    for name, value in segment.items():
+        if name not in SEGMENT_FIELDS:
+            raise ValueError(f"Unknown segment field: {name}")
+        if value is not None and not isinstance(value, SEGMENT_FIELDS[name]):
+            raise ValueError(f"Segment field {name} must be a {SEGMENT_FIELDS[name].__name__}")
+    return {name: value for name, value in segment.items() if value is not None}
+
+def segment_customers(db, business_id: int, segment: dict):
+    """Query of the business's customers matching a parsed segment"""
+    query = db.query(Customer).filter(Customer.business_id == business_id)
+    if "customer_ids" in segment:
+        query = query.filter(Customer.id.in_(segment["customer_ids"]))
+    if segment.get("named_only"):
+        query = query.filter(Customer.name.isnot(None), Customer.name != "")
+    if "active_within_days" in segment or "min_conversations" in segment:
+        activity = db.query(
+            Conversation.customer_id,
+            func.count(Conversation.id).label("conversations"),
+            func.max(Conversation.created_at).label("last_message_at")
+        ).filter(Conversation.business_id == business_id).group_by(Conversation.customer_id).subquery()
+        query = query.join(activity, activity.c.customer_id == Customer.id)
+        if "active_within_days" in segment:
+            query = query.filter(activity.c.last_message_at >= datetime.utcnow() - timedelta(days=segment["active_within_days"]))
+        if "min_conversations" in segment:
+            query = query.filter(activity.c.conversations >= segment["min_conversations"])
+    return query
+
+def greeting_for(template: str | None, customer_name: str | None) -> str | None:
+    """The spoken opener for one customer, or None to send the shared video unchanged"""
+    first_name = (customer_name or "").strip().split(" ")[0]
+    if not template or not first_name:
+        return None
+    return template.replace("{name}", first_name.title())
+
+def greeting_key(greeting: str) -> str:
+    """Recipients whose greetings sound the same share one render"""
+    return hashlib.sha1(greeting.strip().lower().encode()).hexdigest()[:16]
+
+def add_recipients(db, campaign) -> int:
+    """
+    Snapshot the campaign's segment into recipient rows (committed).
+
+    Recipients without a greeting point at the base video right away.
+    """
+    segment = parse_segment(json.loads(campaign.segment or "{}"))
+    customers = segment_customers(db, campaign.business_id, segment).order_by(Customer.id).limit(
+        settings.CAMPAIGN_MAX_RECIPIENTS
+    ).all()
+    now = datetime.utcnow()
+    rows = []
+    for customer in customers:
+        greeting = greeting_for(campaign.greeting_template, customer.name)
+        rows.append({
+            "campaign_id": campaign.id,
+            "customer_id": customer.id,
+            "phone_number": customer.phone_number,
+            "greeting": greeting,
+            "greeting_key": greeting_key(greeting) if greeting else None,
+            "video_path": None if greeting else campaign.base_video_path,
+            "status": RECIPIENT_PENDING if greeting else RECIPIENT_RENDERED,
+            "rendered_at": None if greeting else now,
+        })
+    if rows:
+        db.execute(CampaignRecipient.__table__.insert(), rows)
+    campaign.total_recipients = len(rows)
+    db.commit()
+    return len(rows)
+
+def write_script(business, campaign) -> str:
+    """Generate the shared promo script from the brief, within the business's video length budget"""
+    from app.agent.graph import app_graph
+    from app.services.reply_budget import enforce_budget, word_budget
+    from langchain_core.messages import HumanMessage
+
+    budget = word_budget(business.target_video_seconds or 30, business.elevenlabs_voice_id)
+    prompt = (
+        f"Write the words {business.name} will say in a short promotional video sent to its customers on WhatsApp. "
+        f"Speak as the business, in a {business.response_style or 'professional'} tone. "
+        "Don't greet the customer; a personal greeting is added before your text. "
+        f"The promotion: {campaign.brief}"
+    )
+    result = app_graph.invoke({"messages": [HumanMessage(content=prompt)], "reply_word_budget": budget})
+    return enforce_budget(result["messages"][-1].content, budget)
+
+def normalize_video(source: str, target: str) -> str:
+    """Re-encode a rendered video to VIDEO_FORMAT"""
+    import ffmpeg
+
+    (
+        ffmpeg.input(source)
+        .output(target, **VIDEO_FORMAT)
+        .overwrite_output()
+        .run(cmd=settings.FFMPEG_BINARY, capture_stdout=True, capture_stderr=True)
+    )
+    return target
+
+def join_videos(parts: list[str], target: str) -> str:
+    """Join VIDEO_FORMAT videos end to end by stream copy (no re-encode)"""
+    import ffmpeg
+
+    playlist = Path(target).with_suffix(".txt")
+    playlist.write_text("".join(f"file '{Path(part).resolve()}'\n" for part in parts))
+    try:
+        (
+            ffmpeg.input(str(playlist), f="concat", safe=0)
+            .output(target, c="copy", movflags="+faststart")
+            .overwrite_output()
+            .run(cmd=settings.FFMPEG_BINARY, capture_stdout=True, capture_stderr=True)
+        )
+    finally:
+        playlist.unlink(missing_ok=True)
+    return target
+
+async def _render_clip(business, text: str, directory: Path, name: str) -> tuple[str, str]:
+    """TTS + render one piece of speech, normalized; returns (audio path, video path) in directory"""
+    from app.services.faq_library import render_faq_video
+
+    audio_path, raw_video = await render_faq_video(business, text, directory=directory)
+    video_path = str(directory / f"{name}.mp4")
+    await asyncio.to_thread(normalize_video, raw_video, video_path)
+    os.remove(raw_video)
+    return audio_path, video_path
+
+def prepare_campaign_media(db, business, campaign) -> None:
+    """
+    Generate the shared components and the recipient list (checkpoints: script_text, base_video_path, recipients).
+
+    Raises:
+        ProviderUnavailableError: Replicate's breaker is open; try again later
+    """
+    from app.services.circuit_breaker import PROVIDER_REPLICATE, CircuitOpenError, allow_request, record_result
+
+    if not campaign.script_text:
+        campaign.script_text = write_script(business, campaign)
+        db.commit()
+
+    if not campaign.base_video_path:
+        allowed, retry_after = allow_request(PROVIDER_REPLICATE)
+        if not allowed:
+            raise CircuitOpenError(PROVIDER_REPLICATE, "circuit open", retry_after)
+        try:
+            audio_path, video_path = asyncio.run(
+                _render_clip(business, campaign.script_text, campaign_dir(campaign.id), "base")
+            )
+        except Exception:
+            record_result(PROVIDER_REPLICATE, False)
+            raise
+        record_result(PROVIDER_REPLICATE, True)
+        campaign.base_audio_path, campaign.base_video_path = audio_path, video_path
+        db.commit()
+
+    if not db.query(CampaignRecipient.id).filter(CampaignRecipient.campaign_id == campaign.id).first():
+        add_recipients(db, campaign)
+
+async def render_greeting_video(business, campaign, greeting: str) -> str:
+    """Render one greeting and join it in front of the base video; returns the personalized video path"""
+    directory = campaign_dir(campaign.id)
+    key = greeting_key(greeting)
+    audio_path, clip_path = await _render_clip(business, greeting, directory, f"greeting_{key}")
+    target = str(directory / f"{key}.mp4")
+    try:
+        await asyncio.to_thread(join_videos, [clip_path, campaign.base_video_path], target)
+    finally:
+        for path in (audio_path, clip_path):
+            Path(path).unlink(missing_ok=True)
+    return target
+
+async def render_greetings(business, campaign, greetings: dict[str, str]) -> dict:
+    """
+    Render several greetings concurrently (at most CAMPAIGN_RENDER_CONCURRENCY at once).
+
+    Returns:
+        {greeting_key: video path or the exception that stopped it}
+    """
+    slots = asyncio.Semaphore(settings.CAMPAIGN_RENDER_CONCURRENCY)
+
+    async def run(key, greeting):
+        async with slots:
+            try:
+                return key, await render_greeting_video(business, campaign, greeting)
+            except Exception as e:
+                return key, e
+
+    return dict(await asyncio.gather(*(run(key, greeting) for key, greeting in greetings.items())))
+
+def render_next_greetings(db, business, campaign) -> dict:
+    """
+    Render the next CAMPAIGN_RENDER_BATCH distinct pending greetings and mark their recipients rendered.
+
+    A failed greeting falls back to the shared video, so its recipients still
+    get the promo, just without their name.
+
+    Returns:
+        Counts of rendered and failed greetings, greetings still pending, and
+        retry_after (seconds) when Replicate's breaker refused the batch
+    """
+    from app.services.circuit_breaker import PROVIDER_REPLICATE, allow_request, record_result
+
+    pending = db.query(CampaignRecipient.greeting_key, func.min(CampaignRecipient.greeting)).filter(
+        CampaignRecipient.campaign_id == campaign.id,
+        CampaignRecipient.status == RECIPIENT_PENDING
+    ).group_by(CampaignRecipient.greeting_key).limit(settings.CAMPAIGN_RENDER_BATCH).all()
+    if not pending:
+        return {"rendered": 0, "failed": 0, "remaining": 0, "retry_after": 0}
+
+    allowed, retry_after = allow_request(PROVIDER_REPLICATE)
+    if not allowed:
+        return {"rendered": 0, "failed": 0, "remaining": len(pending), "retry_after": retry_after}
+
+    results = asyncio.run(render_greetings(business, campaign, dict(pending)))
+    now = datetime.utcnow()
+    failed = 0
+    for key, result in results.items():
+        record_result(PROVIDER_REPLICATE, not isinstance(result, Exception))
+        update = {
+            CampaignRecipient.status: RECIPIENT_RENDERED,
+            CampaignRecipient.video_path: result,
+            CampaignRecipient.rendered_at: now,
+        }
+        if isinstance(result, Exception):
+            failed += 1
+            update[CampaignRecipient.video_path] = campaign.base_video_path
+            update[CampaignRecipient.error_message] = f"greeting render failed, sent without it: {result}"
+        db.query(CampaignRecipient).filter(
+            CampaignRecipient.campaign_id == campaign.id,
+            CampaignRecipient.greeting_key == key,
+            CampaignRecipient.status == RECIPIENT_PENDING
+        ).update(update, synchronize_session=False)
+    db.commit()
+
+    remaining = db.query(func.count(func.distinct(CampaignRecipient.greeting_key))).filter(
+        CampaignRecipient.campaign_id == campaign.id,
+        CampaignRecipient.status == RECIPIENT_PENDING
+    ).scalar()
+    return {"rendered": len(results) - failed, "failed": failed, "remaining": remaining, "retry_after": 0}
+
+def send_next_batch(db, campaign) -> dict:
+    """
+    Send up to CAMPAIGN_SEND_BATCH rendered recipients, paced by the Twilio sender bucket.
+
+    Each send is committed on its own, so a crashed batch doesn't resend the
+    recipients it already reached.
+
+    Returns:
+        Counts of sent and failed recipients, and retry_after (seconds) when
+        the bucket or Twilio asked to slow down
+    """
+    from app.services.circuit_breaker import ProviderUnavailableError
+    from app.services.delivery_status import KIND_CAMPAIGN, record_sent
+    from app.services.rate_limiter import check_rate_limits, campaign_send_limits
+    from app.services.storage import get_public_url
+    from app.services.twilio_service import send_whatsapp_media
+    from app.workers.pipeline import absolute_url
+
+    recipients = db.query(CampaignRecipient).filter(
+        CampaignRecipient.campaign_id == campaign.id,
+        CampaignRecipient.status == RECIPIENT_RENDERED
+    ).order_by(CampaignRecipient.id).limit(settings.CAMPAIGN_SEND_BATCH).all()
+
+    stats = {"sent": 0, "failed": 0, "retry_after": 0}
+    urls = {}
+    for recipient in recipients:
+        decision = check_rate_limits(campaign_send_limits())
+        while not decision.allowed:
+            if decision.retry_after > settings.CAMPAIGN_MAX_PACING_SECONDS:
+                stats["retry_after"] = decision.retry_after
+                return stats
+            time.sleep(decision.retry_after)
+            decision = check_rate_limits(campaign_send_limits())
+
+        if recipient.video_path not in urls:
+            urls[recipient.video_path] = absolute_url(get_public_url(recipient.video_path))
+        try:
+            sid = send_whatsapp_media(recipient.phone_number, urls[recipient.video_path], caption=campaign.caption or "")
+        except ProviderUnavailableError as e:
+            # Twilio's breaker or bulkhead refused the send: keep the recipient for later
+            stats["retry_after"] = max(1, e.retry_after)
+            return stats
+        except Exception as e:
+            if getattr(e, "status", None) == 429:
+                # Twilio's own queue is full: back off and keep the recipient
+                stats["retry_after"] = TWILIO_BACKOFF_SECONDS
+                return stats
+            recipient.status = RECIPIENT_FAILED
+            recipient.error_message = str(e)
+            stats["failed"] += 1
+        else:
+            recipient.status = RECIPIENT_SENT
+            recipient.message_sid = sid
+            recipient.sent_at = datetime.utcnow()
+            record_sent(db, None, sid, KIND_CAMPAIGN)
+            stats["sent"] += 1
+        db.commit()
+    return stats
+
+def current_run(db, campaign_id: int, run_id: int):
+    """The campaign if this run is still the live one, else None (the task should stop)"""
+    campaign = db.query(Campaign).filter(Campaign.id == campaign_id).first()
+    if not campaign or campaign.run_id != run_id:
+        return None
+    return campaign
+
+def resume_status(campaign) -> str:
+    """Stage a paused or failed campaign picks up at"""
+    if not campaign.base_video_path or not campaign.total_recipients:
+        return CAMPAIGN_PREPARING
+    return CAMPAIGN_RUNNING
+
+def campaign_progress(db, campaign) -> dict:
+    """Recipient counts, personalization reuse, send throughput and delivery outcomes"""
+    counts = dict(db.query(CampaignRecipient.status, func.count(CampaignRecipient.id)).filter(
+        CampaignRecipient.campaign_id == campaign.id
+    ).group_by(CampaignRecipient.status).all())
+    greetings = db.query(func.count(func.distinct(CampaignRecipient.greeting_key))).filter(
+        CampaignRecipient.campaign_id == campaign.id
+    ).scalar() or 0
+    personalized = db.query(func.count(CampaignRecipient.id)).filter(
+        CampaignRecipient.campaign_id == campaign.id,
+        CampaignRecipient.greeting_key.isnot(None)
+    ).scalar() or 0
+    first_sent, last_sent = db.query(func.min(CampaignRecipient.sent_at), func.max(CampaignRecipient.sent_at)).filter(
+        CampaignRecipient.campaign_id == campaign.id
+    ).one()
+    deliveries = dict(db.query(MessageDelivery.status, func.count(MessageDelivery.id)).join(
+        CampaignRecipient, CampaignRecipient.message_sid == MessageDelivery.message_sid
+    ).filter(CampaignRecipient.campaign_id == campaign.id).group_by(MessageDelivery.status).all())
+
+    sent = counts.get(RECIPIENT_SENT, 0)
+    remaining = counts.get(RECIPIENT_PENDING, 0) + counts.get(RECIPIENT_RENDERED, 0)
+    sending_minutes = (last_sent - first_sent).total_seconds() / 60 if first_sent and last_sent else 0
+    per_minute = round(sent / sending_minutes, 1) if sending_minutes > 0 else None
+    return {
+        "recipients": campaign.total_recipients,
+        "statuses": counts,
+        "percent_done": round(100 * (campaign.total_recipients - remaining) / campaign.total_recipients, 1) if campaign.total_recipients else None,
+        # One render per distinct greeting instead of one per personalized recipient
+        "greeting_renders": greetings,
+        "personalized_recipients": personalized,
+        "sends_per_minute": per_minute,
+        "eta_minutes": round(remaining / per_minute, 1) if per_minute and campaign.status == CAMPAIGN_RUNNING else None,
+        "deliveries": deliveries,
+    }
+
+def delete_campaign_media(campaign_id: int) -> None:
+    """Remove every rendered file of a campaign"""
+    from app.services.storage import CAMPAIGNS_DIR
+
+    shutil.rmtree(CAMPAIGNS_DIR / str(campaign_id), ignore_errors=True)
@@ -0,0 +1,287 @@
+"""Readiness probes and the autoscaling signal behind /ready and /capacity.
+
+Every figure is cached in the API process and refreshed in the background
+once stale: a request is answered from memory and at most starts one refresh
+per probe, so health checks at any rate cost the DB, broker and providers one
+probe per CAPACITY_PROBE_SECONDS (queue and worker figures: one Redis round
+trip per CAPACITY_CACHE_SECONDS). Only a process's first request waits, for
+at most CAPACITY_PROBE_TIMEOUT_SECONDS.
+
+Queue depth is the length of each queue's list on the Redis broker. Job age
+comes from the published_at header stamped on every task at publish time,
+read off the oldest message in the list. Workers report their slots and
+running jobs with a heartbeat (WorkerPresence).
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.workers.queues import ALL_QUEUES, REPLY_QUEUE, reply_shard_queue
+
+WORKERS_KEY = "vidioagent:workers"
+# kombu's Redis transport keeps messages delivered to workers but not yet acked here
+UNACKED_KEY = "unacked"
+SHARDS_QUEUE = f"{REPLY_QUEUE}.shards"  # all reply shards, reported as one queue
+
+PROVIDER_URLS = {
+    "groq": "https://api.groq.com",
+    "anthropic": "https://api.anthropic.com",
+    "openai": "https://api.openai.com",
+    "elevenlabs": "https://api.elevenlabs.io",
+    "replicate": "https://api.replicate.com",
+    "twilio": "https://api.twilio.com",
+}
+
+class CachedProbe:
+    """
+    The last result of an async check, refreshed in the background once older than ttl.
+
+    Concurrent callers share one refresh. Results are dicts; a check that
+    raises or times out gives {"ok": False, "error": ...}.
+    """
+
+    def __init__(self, check, ttl):
+        self.check = check
+        self.ttl = ttl  # callable, so settings changes apply
+        self.value = None
+        self.checked_at = 0.0
+        self._refresh = None
+
+    async def get(self) -> dict:
+        stale = time.monotonic() - self.checked_at >= self.ttl()
+        running = self._refresh is not None and not self._refresh.done() and self._refresh.get_loop() is asyncio.get_running_loop()
+        if stale and not running:
+            self._refresh = asyncio.create_task(self._run())
+        if self.value is None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._refresh), settings.CAPACITY_PROBE_TIMEOUT_SECONDS + 0.5)
+            except asyncio.TimeoutError:
+                return {"ok": None, "error": "first probe still running"}
+        return self.value
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.check(), settings.CAPACITY_PROBE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            result = {"ok": False, "error": f"timed out after {settings.CAPACITY_PROBE_TIMEOUT_SECONDS}s"}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checked_at"] = datetime.utcnow().isoformat()
+        self.value, self.checked_at = result, time.monotonic()
+
+def _probe_ttl() -> float:
+    return settings.CAPACITY_PROBE_SECONDS
+
+def _cache_ttl() -> float:
+    return settings.CAPACITY_CACHE_SECONDS
+
+def _ping_database() -> None:
+    from sqlalchemy import text
+    from app.db.base import engine
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def check_database() -> dict:
+    await asyncio.to_thread(_ping_database)
+    return {"ok": True}
+
+async def check_broker() -> dict:
+    await asyncio.to_thread(get_redis().ping)
+    return {"ok": True}
+
+def configured_providers() -> dict[str, str]:
+    """Providers with credentials set, and the URL probed for each"""
+    keys = {
+        "groq": settings.GROQ_API_KEY,
+        "anthropic": settings.ANTHROPIC_API_KEY,
+        "openai": settings.OPENAI_API_KEY,
+        "elevenlabs": settings.ELEVENLABS_API_KEY,
+        "replicate": settings.REPLICATE_API_TOKEN,
+        "twilio": settings.TWILIO_ACCOUNT_SID,
+    }
+    urls = PROVIDER_URLS | ({"twilio": settings.TWILIO_API_BASE} if settings.TWILIO_API_BASE else {})
+    return {name: urls[name] for name, key in keys.items() if key}
+
+async def check_providers() -> dict:
+    """
+    Network reachability of each configured provider (any HTTP answer below 500 counts).
+
+    Unauthenticated HEAD requests: they neither spend quota nor prove the
+    credentials work; the circuit breakers cover failing calls.
+    """
+    import httpx
+
+    providers = configured_providers()
+    if not settings.CAPACITY_PROVIDER_PROBES or not providers:
+        return {"ok": True, "providers": {}}
+
+    async with httpx.AsyncClient(timeout=settings.CAPACITY_PROBE_TIMEOUT_SECONDS * 0.9) as client:
+        async def probe(name, url):
+            started = time.perf_counter()
+            try:
+                response = await client.head(url)
+                reachable, detail = response.status_code < 500, response.status_code
+            except httpx.HTTPError as e:
+                reachable, detail = False, type(e).__name__
+            return name, {"reachable": reachable, "status": detail, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+        results = dict(await asyncio.gather(*(probe(name, url) for name, url in providers.items())))
+    return {"ok": all(result["reachable"] for result in results.values()), "providers": results}
+
+async def check_breakers() -> dict:
+    from app.services.circuit_breaker import PROVIDERS, breaker_state
+
+    breakers = await asyncio.to_thread(lambda: {provider: breaker_state(provider) for provider in PROVIDERS})
+    return {"ok": True, "breakers": breakers}
+
+def _oldest_age(raw: str | None, now: float) -> float | None:
+    if not raw:
+        return None
+    try:
+        published_at = json.loads(raw)["headers"].get("published_at")
+    except (ValueError, KeyError, TypeError):
+        return None
+    return round(max(0.0, now - float(published_at)), 1) if published_at else None
+
+def queue_stats() -> dict:
+    """
+    Waiting jobs and the age of the oldest one, per queue, in one broker round trip.
+
+    Reply shards are summed into "replies.shards" when affinity routing is on.
+    Jobs a worker has reserved (running, or held for a retry countdown) are
+    not waiting; they are counted once, as "reserved".
+    """
+    queues = list(ALL_QUEUES)
+    shards = [reply_shard_queue(shard) for shard in range(settings.AFFINITY_SHARDS)] if settings.AFFINITY_ROUTING_ENABLED else []
+    shard_names = set(shards)
+    pipe = get_redis().pipeline()
+    for queue in queues + shards:
+        pipe.llen(queue)
+        pipe.lindex(queue, -1)  # messages are pushed on the left, consumed from the right
+    pipe.hlen(UNACKED_KEY)
+    results = pipe.execute()
+    now = time.time()
+
+    stats = {}
+    for index, queue in enumerate(queues + shards):
+        depth, oldest = results[2 * index], _oldest_age(results[2 * index + 1], now)
+        name = SHARDS_QUEUE if queue in shard_names else queue
+        entry = stats.setdefault(name, {"waiting": 0, "oldest_job_age_seconds": None})
+        entry["waiting"] += int(depth)
+        if oldest is not None:
+            entry["oldest_job_age_seconds"] = max(oldest, entry["oldest_job_age_seconds"] or 0.0)
+    return {"queues": stats, "reserved": int(results[-1])}
+
+def live_workers() -> dict[str, dict]:
+    """Workers whose heartbeat is current, with the slots and running jobs they reported"""
+    cutoff = time.time() - 3 * settings.WORKER_HEARTBEAT_SECONDS
+    workers = {}
+    for hostname, raw in get_redis().hgetall(WORKERS_KEY).items():
+        info = json.loads(raw)
+        if info.get("seen", 0) >= cutoff:
+            workers[hostname] = info
+    return workers
+
+def desired_workers(busy: int, waiting: int, oldest_age: float | None, slots_per_worker: int, current: int) -> tuple[int, str]:
+    """
+    Worker count for the autoscaler, and why.
+
+    Sized so busy + waiting jobs fill AUTOSCALE_TARGET_UTILIZATION of the
+    slots; while the oldest job has waited past AUTOSCALE_MAX_QUEUE_AGE_SECONDS
+    the pool is short right now, so ask for at least one worker more than runs.
+    """
+    slots = max(1, slots_per_worker) * settings.AUTOSCALE_TARGET_UTILIZATION
+    desired = math.ceil((busy + waiting) / slots)
+    reason = f"{busy} running + {waiting} waiting jobs at {settings.AUTOSCALE_TARGET_UTILIZATION:.0%} of {slots_per_worker} slots per worker"
+    if oldest_age is not None and oldest_age > settings.AUTOSCALE_MAX_QUEUE_AGE_SECONDS and desired <= current:
+        desired = current + 1
+        reason = f"oldest job waited {oldest_age:.0f}s (over {settings.AUTOSCALE_MAX_QUEUE_AGE_SECONDS}s)"
+    clamped = min(settings.AUTOSCALE_MAX_WORKERS, max(settings.AUTOSCALE_MIN_WORKERS, desired))
+    if clamped != desired:
+        reason += f"; clamped from {desired}"
+    return clamped, reason
+
+async def check_capacity() -> dict:
+    queues = await asyncio.to_thread(queue_stats)
+    workers = await asyncio.to_thread(live_workers)
+    busy = sum(info.get("active", 0) for info in workers.values())
+    slots = sum(info.get("slots", 0) for info in workers.values())
+    waiting = sum(queue["waiting"] for queue in queues["queues"].values())
+    ages = [queue["oldest_job_age_seconds"] for queue in queues["queues"].values() if queue["oldest_job_age_seconds"] is not None]
+    slots_per_worker = round(slots / len(workers)) if workers else settings.CELERY_IO_CONCURRENCY
+    desired, reason = desired_workers(busy, waiting, max(ages) if ages else None, slots_per_worker, len(workers))
+    return {
+        "ok": True,
+        **queues,
+        "workers": {
+            "active": len(workers),
+            "slots": slots,
+            "busy_slots": busy,
+            "utilization": round(busy / slots, 3) if slots else None,
+            "by_worker": workers,
+        },
+        "desired_workers": desired,
+        "desired_workers_reason": reason,
+    }
+
+PROBES = {
+    "database": CachedProbe(check_database, _probe_ttl),
+    "broker": CachedProbe(check_broker, _probe_ttl),
+    "providers": CachedProbe(check_providers, _probe_ttl),
+    "circuit_breakers": CachedProbe(check_breakers, _cache_ttl),
+    "capacity": CachedProbe(check_capacity, _cache_ttl),
+}
+
+async def probe_results(*names: str) -> dict:
+    """Cached results of the named probes"""
+    results = await asyncio.gather(*(PROBES[name].get() for name in names))
+    return dict(zip(names, results))
+
+class WorkerPresence:
+    """Reports a worker's queues, slots and running jobs every WORKER_HEARTBEAT_SECONDS"""
+
+    def __init__(self, hostname: str, queues: list[str], slots: int, active_jobs):
+        self.hostname = hostname
+        self.queues = queues
+        self.slots = slots
+        self.active_jobs = active_jobs  # callable: jobs running right now
+        self._stop = threading.Event()
+
+    def beat(self) -> None:
+        info = {"queues": self.queues, "slots": self.slots, "active": self.active_jobs(), "seen": time.time()}
+        get_redis().hset(WORKERS_KEY, self.hostname, json.dumps(info))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.beat()
+            except Exception as e:
+                print(f"Worker heartbeat failed for {self.hostname}: {e}")
+            if self._stop.wait(settings.WORKER_HEARTBEAT_SECONDS):
+                return
+
+    def start(self) -> None:
+        try:
+            # Drop workers that went away without saying so (pod names change per deploy)
+            cutoff = time.time() - 3 * settings.WORKER_HEARTBEAT_SECONDS
+            stale = [hostname for hostname, raw in get_redis().hgetall(WORKERS_KEY).items() if json.loads(raw).get("seen", 0) < cutoff]
+            if stale:
+                get_redis().hdel(WORKERS_KEY, *stale)
+        except Exception as e:
+            print(f"Failed to prune worker heartbeats: {e}")
+        threading.Thread(target=self._run, name="worker-heartbeat", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            get_redis().hdel(WORKERS_KEY, self.hostname)
+        except Exception as e:
+            print(f"Failed to remove worker heartbeat for {self.hostname}: {e}")
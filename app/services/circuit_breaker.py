@@ -0,0 +1,224 @@
+"""Per-provider circuit breakers (shared through Redis) and bulkheads.
+
+A breaker counts calls and failures to one provider in a fixed window shared
+by every worker. Once failures pass both BREAKER_MIN_FAILURES and
+BREAKER_FAILURE_RATIO it opens: jobs stop calling the provider and are parked
+or downgraded straight away instead of each waiting out a timeout. After
+BREAKER_COOLDOWN_SECONDS one worker at a time is let through as a half-open
+probe; its success closes the breaker, its failure re-opens it.
+
+Bulkheads cap how many jobs in one worker process may be inside a provider
+call at once, so a slow provider can't take every worker slot.
+"""
+import threading
+from contextlib import contextmanager
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+PROVIDER_REPLICATE = "replicate"
+PROVIDER_ELEVENLABS = "elevenlabs"
+PROVIDER_TWILIO = "twilio"
+PROVIDERS = (PROVIDER_REPLICATE, PROVIDER_ELEVENLABS, PROVIDER_TWILIO)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+BREAKER_KEY = "vidioagent:breaker:{provider}"
+
+# KEYS: breaker hash. ARGV: cooldown, probe timeout.
+# Returns {allowed (0/1), seconds until a call may be allowed}.
+ALLOW_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {1, '0'}
+end
+local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at')) or now
+local reopen_at = opened_at + tonumber(ARGV[1])
+if now < reopen_at then
+    return {0, tostring(reopen_at - now)}
+end
+local probe_until = tonumber(redis.call('HGET', KEYS[1], 'probe_until')) or 0
+if now < probe_until then
+    return {0, tostring(probe_until - now)}
+end
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_until', now + tonumber(ARGV[2]))
+return {1, '0'}
+"""
+
+# KEYS: breaker hash. ARGV: ok (1/0), window, min failures, failure ratio.
+# Returns the state after recording.
+RECORD_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local ok = ARGV[1] == '1'
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'half_open' then
+    if ok then
+        redis.call('DEL', KEYS[1])
+        return 'closed'
+    end
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', now)
+    redis.call('HDEL', KEYS[1], 'probe_until')
+    return 'open'
+end
+if state == 'open' then
+    -- stragglers that started before the breaker opened don't decide anything
+    return 'open'
+end
+local window_start = tonumber(redis.call('HGET', KEYS[1], 'window_start'))
+if not window_start or now - window_start > tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], 'window_start', now, 'calls', 0, 'failures', 0)
+end
+local calls = redis.call('HINCRBY', KEYS[1], 'calls', 1)
+local failures = tonumber(redis.call('HGET', KEYS[1], 'failures')) or 0
+if not ok then
+    failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+end
+if failures >= tonumber(ARGV[3]) and failures / calls >= tonumber(ARGV[4]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', now)
+    return 'open'
+end
+return 'closed'
+"""
+
+_allow_script = None
+_record_script = None
+_bulkheads: dict[str, threading.BoundedSemaphore] = {}
+_bulkheads_lock = threading.Lock()
+
+class ProviderUnavailableError(Exception):
+    """A provider call was refused before it was made; the job should park or downgrade"""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class CircuitOpenError(ProviderUnavailableError):
+    """The provider's breaker is open (or another worker holds the half-open probe)"""
+
+class BulkheadFullError(ProviderUnavailableError):
+    """Every bulkhead slot for the provider in this worker process is busy"""
+
+def _scripts():
+    global _allow_script, _record_script
+    if _allow_script is None:
+        redis = get_redis()
+        _allow_script = redis.register_script(ALLOW_LUA)
+        _record_script = redis.register_script(RECORD_LUA)
+    return _allow_script, _record_script
+
+def allow_request(provider: str) -> tuple[bool, float]:
+    """
+    Ask the provider's breaker for permission to make one call.
+
+    In the half-open state this claims the single probe slot. Fails open
+    when Redis is unreachable.
+
+    Returns:
+        (allowed, seconds until a call might be allowed when refused)
+    """
+    try:
+        allowed, retry_after = _scripts()[0](
+            keys=[BREAKER_KEY.format(provider=provider)],
+            args=[settings.BREAKER_COOLDOWN_SECONDS, settings.BREAKER_PROBE_TIMEOUT_SECONDS]
+        )
+    except Exception as e:
+        print(f"Circuit breaker unavailable, allowing {provider} call: {e}")
+        return True, 0.0
+    return bool(int(allowed)), float(retry_after)
+
+def record_result(provider: str, ok: bool) -> str:
+    """Record the outcome of a provider call; returns the breaker state afterwards"""
+    try:
+        state = _scripts()[1](
+            keys=[BREAKER_KEY.format(provider=provider)],
+            args=[1 if ok else 0, settings.BREAKER_WINDOW_SECONDS, settings.BREAKER_MIN_FAILURES, settings.BREAKER_FAILURE_RATIO]
+        )
+    except Exception:
+        return STATE_CLOSED
+    if state == STATE_OPEN and not ok:
+        print(f"Circuit breaker for {provider} is open")
+    return state
+
+def breaker_state(provider: str) -> dict:
+    """Current breaker state without claiming a probe (readiness endpoint, pipeline pre-checks)"""
+    try:
+        redis = get_redis()
+        fields = redis.hgetall(BREAKER_KEY.format(provider=provider))
+        seconds, microseconds = redis.time()
+    except Exception as e:
+        return {"state": "unknown", "error": str(e)}
+
+    now = seconds + microseconds / 1_000_000
+    state = fields.get("state", STATE_CLOSED)
+    info = {"state": state, "calls": int(fields.get("calls", 0)), "failures": int(fields.get("failures", 0))}
+    if state != STATE_CLOSED:
+        reopen_at = float(fields.get("opened_at", now)) + settings.BREAKER_COOLDOWN_SECONDS
+        probe_until = float(fields.get("probe_until", 0))
+        info["retry_after"] = round(max(0.0, reopen_at - now, probe_until - now), 1)
+    return info
+
+def circuit_open(provider: str) -> tuple[bool, float]:
+    """
+    True while calls to the provider would be refused (open, or a probe already in flight).
+
+    Returns:
+        (refused, seconds until a call might be allowed)
+    """
+    info = breaker_state(provider)
+    if info["state"] in (STATE_CLOSED, "unknown"):
+        return False, 0.0
+    retry_after = info.get("retry_after", 0.0)
+    return retry_after > 0, retry_after
+
+def _bulkhead(provider: str) -> threading.BoundedSemaphore:
+    with _bulkheads_lock:
+        if provider not in _bulkheads:
+            limits = {
+                PROVIDER_REPLICATE: settings.BULKHEAD_REPLICATE,
+                PROVIDER_ELEVENLABS: settings.BULKHEAD_ELEVENLABS,
+                PROVIDER_TWILIO: settings.BULKHEAD_TWILIO,
+            }
+            _bulkheads[provider] = threading.BoundedSemaphore(limits.get(provider, settings.CELERY_IO_CONCURRENCY))
+        return _bulkheads[provider]
+
+@contextmanager
+def provider_call(provider: str, is_failure=None):
+    """
+    Guard a block of calls to one provider with its breaker and bulkhead.
+
+    Args:
+        provider: Breaker and bulkhead to use
+        is_failure: optional (exception) -> bool; exceptions it rejects (say,
+            the provider refusing a bad request) don't count against the provider
+
+    Raises:
+        CircuitOpenError: the breaker refused the call
+        BulkheadFullError: no bulkhead slot freed up within BULKHEAD_WAIT_SECONDS
+
+    By default any exception raised inside the block counts as a provider failure.
+    """
+    bulkhead = _bulkhead(provider)
+    if not bulkhead.acquire(timeout=settings.BULKHEAD_WAIT_SECONDS):
+        raise BulkheadFullError(provider, "bulkhead full", settings.BULKHEAD_RETRY_SECONDS)
+
+    # Asked only once a slot is held, so a claimed half-open probe always runs
+    allowed, retry_after = allow_request(provider)
+    if not allowed:
+        bulkhead.release()
+        raise CircuitOpenError(provider, "circuit open", retry_after)
+    try:
+        yield
+    except Exception as e:
+        provider_failed = is_failure(e) if is_failure else True
+        record_result(provider, not provider_failed)
+        raise
+    else:
+        record_result(provider, True)
+    finally:
+        bulkhead.release()
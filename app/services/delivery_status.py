@@ -0,0 +1,197 @@
+"""Twilio delivery status tracking with batched write-behind.
+
+Twilio posts several status callbacks per outbound message (sent, delivered,
+read, or failed). The callback endpoint only appends the event to a Redis list;
+the first event of a window schedules flush_delivery_events, which drains the
+list, collapses the events per message and writes them in one multi-row
+upsert. At peak that is one transaction per flush instead of one per callback.
+
+Rows are keyed by MessageSid and merged, never overwritten: the furthest
+status wins, whichever order callbacks (and the worker's own record of the
+send) arrive in, and each timestamp keeps its first value.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import case, func
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.models import MessageDelivery
+
+KIND_VOICE_NOTE = "voice_note"
+KIND_PREVIEW = "preview"
+KIND_REPLY = "reply"
+KIND_CAMPAIGN = "campaign"
+
+# Callbacks can arrive out of order; a status never replaces a later one
+STATUS_RANKS = {
+    "accepted": 0,
+    "queued": 1,
+    "sending": 2,
+    "sent": 3,
+    "delivered": 4,
+    "read": 5,
+    "undelivered": 6,
+    "failed": 6,
+}
+FAILED_STATUSES = ("undelivered", "failed")
+
+# Status that stamps each timestamp column when first seen
+STATUS_TIMESTAMPS = {
+    "delivered": "delivered_at",
+    "read": "read_at",
+    "undelivered": "failed_at",
+    "failed": "failed_at",
+}
+
+EVENTS_KEY = "vidioagent:delivery_events"
+# Drop buffered events if flushing has been down this long
+EVENTS_TTL_SECONDS = 24 * 60 * 60
+
+_COLUMNS = (
+    "message_sid", "conversation_id", "kind", "status", "status_rank", "error_code",
+    "sent_at", "delivered_at", "read_at", "failed_at", "updated_at",
+)
+
+def status_callback_url() -> str | None:
+    """URL Twilio should post status callbacks to, when callbacks are enabled and BASE_URL is known"""
+    if not settings.DELIVERY_CALLBACKS_ENABLED or not settings.BASE_URL:
+        return None
+    return f"{settings.BASE_URL.rstrip('/')}/whatsapp/status"
+
+def status_event(message_sid: str, status: str, error_code: str | None = None) -> dict:
+    """A status callback as buffered, stamped with the time it was received"""
+    return {
+        "message_sid": message_sid,
+        "status": status.lower(),
+        "error_code": error_code,
+        "at": datetime.utcnow().isoformat(),
+    }
+
+def buffer_event(event: dict) -> bool:
+    """
+    Append a status event to the pending buffer.
+
+    Returns:
+        True if this event opened the buffer, i.e. the caller must schedule the flush
+
+    Raises:
+        redis.RedisError: when Redis is unreachable (the caller writes the event directly)
+    """
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.rpush(EVENTS_KEY, json.dumps(event))
+    pipe.expire(EVENTS_KEY, EVENTS_TTL_SECONDS)
+    length, _ = pipe.execute()
+    return length == 1
+
+def drain_events(max_events: int) -> list[dict]:
+    """Atomically take up to max_events buffered events"""
+    r = get_redis()
+    pipe = r.pipeline()
+    pipe.lrange(EVENTS_KEY, 0, max_events - 1)
+    pipe.ltrim(EVENTS_KEY, max_events, -1)
+    raw, _ = pipe.execute()
+    return [json.loads(item) for item in raw]
+
+def requeue_events(events: list[dict]) -> None:
+    """Put drained events back after a failed write (order doesn't matter when merging)"""
+    if events:
+        get_redis().rpush(EVENTS_KEY, *(json.dumps(event) for event in events))
+
+def pending_event_count() -> int:
+    """Status events waiting to be written"""
+    try:
+        return int(get_redis().llen(EVENTS_KEY))
+    except Exception:
+        return 0
+
+def _empty_row(message_sid: str) -> dict:
+    return {column: None for column in _COLUMNS} | {"message_sid": message_sid, "status_rank": -1}
+
+def collapse_events(events: list[dict]) -> list[dict]:
+    """
+    Merge buffered events into one upsert row per message.
+
+    The furthest status wins and each timestamp keeps its earliest value, so
+    a message that went sent -> delivered -> read within one flush is written once.
+    """
+    rows = {}
+    for event in events:
+        row = rows.setdefault(event["message_sid"], _empty_row(event["message_sid"]))
+        rank = STATUS_RANKS.get(event["status"], 0)
+        if rank > row["status_rank"]:
+            row["status"], row["status_rank"] = event["status"], rank
+        row["error_code"] = event.get("error_code") or row["error_code"]
+        column = STATUS_TIMESTAMPS.get(event["status"])
+        if column:
+            at = datetime.fromisoformat(event["at"])
+            row[column] = min(row[column], at) if row[column] else at
+        row["updated_at"] = datetime.utcnow()
+    return list(rows.values())
+
+def _insert(db):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def upsert_deliveries(db, rows: list[dict]) -> None:
+    """
+    Merge rows into message_deliveries in one INSERT ... ON CONFLICT statement (not committed).
+
+    Rows must have every column and at most one row per message_sid.
+    """
+    if not rows:
+        return
+    table = MessageDelivery.__table__
+    stmt = _insert(db)(table).values(rows)
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.message_sid],
+        set_={
+            "status": case((new.status_rank > table.c.status_rank, new.status), else_=table.c.status),
+            "status_rank": case((new.status_rank > table.c.status_rank, new.status_rank), else_=table.c.status_rank),
+            "error_code": func.coalesce(new.error_code, table.c.error_code),
+            "conversation_id": func.coalesce(table.c.conversation_id, new.conversation_id),
+            "kind": func.coalesce(table.c.kind, new.kind),
+            "sent_at": func.coalesce(table.c.sent_at, new.sent_at),
+            "delivered_at": func.coalesce(table.c.delivered_at, new.delivered_at),
+            "read_at": func.coalesce(table.c.read_at, new.read_at),
+            "failed_at": func.coalesce(table.c.failed_at, new.failed_at),
+            "updated_at": new.updated_at,
+        }
+    )
+    db.execute(stmt)
+
+def apply_events(db, events: list[dict]) -> int:
+    """
+    Write a batch of status events in one transaction.
+
+    Returns:
+        Number of messages updated
+    """
+    rows = collapse_events(events)
+    for start in range(0, len(rows), settings.DELIVERY_FLUSH_BATCH):
+        upsert_deliveries(db, rows[start:start + settings.DELIVERY_FLUSH_BATCH])
+    db.commit()
+    return len(rows)
+
+def record_sent(db, conversation_id: int | None, message_sid: str, kind: str) -> None:
+    """
+    Record an outbound message the worker just sent (committed with the caller's checkpoint).
+
+    Merges with any callback for the same SID that was written first.
+    """
+    now = datetime.utcnow()
+    row = _empty_row(message_sid) | {
+        "conversation_id": conversation_id,
+        "kind": kind,
+        "status": "queued",
+        "status_rank": STATUS_RANKS["queued"],
+        "sent_at": now,
+        "updated_at": now,
+    }
+    upsert_deliveries(db, [row])
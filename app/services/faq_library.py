@@ -0,0 +1,205 @@
+"""Pre-rendered FAQ video library.
+
+Businesses register question/answer pairs. Each answer is rendered offline,
+in batch, through the same TTS and video services as live replies, and its
+question is embedded into a per-business chromadb collection. An inbound
+message whose nearest FAQ question is similar enough is answered with the
+stored video straight away: no LLM, TTS or render call.
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from app.core.config import settings
+
+FAQ_PENDING = "pending"
+FAQ_RENDERING = "rendering"
+FAQ_READY = "ready"
+FAQ_FAILED = "failed"
+
+COLLECTION_NAME = "faq_business_{business_id}"
+
+_client = None
+_embedding_function = None
+
+@dataclass
+class FaqMatch:
+    faq_id: int | None  # None when the best candidate is below the threshold
+    similarity: float  # cosine similarity of the best candidate (0 with an empty library)
+    seconds: float  # embedding + nearest-neighbour lookup time
+
+def _chroma():
+    global _client
+    if _client is None:
+        import chromadb
+        if settings.CHROMA_HOST:
+            _client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        else:
+            _client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    return _client
+
+def _embeddings():
+    global _embedding_function
+    if _embedding_function is None:
+        from chromadb.utils import embedding_functions
+        if settings.FAQ_EMBEDDING_PROVIDER == "openai":
+            _embedding_function = embedding_functions.OpenAIEmbeddingFunction(
+                api_key=settings.OPENAI_API_KEY,
+                model_name="text-embedding-3-small"
+            )
+        else:
+            _embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    return _embedding_function
+
+def faq_collection(business_id: int):
+    """The business's FAQ collection (created on first use, cosine distance)"""
+    return _chroma().get_or_create_collection(
+        COLLECTION_NAME.format(business_id=business_id),
+        embedding_function=_embeddings(),
+        metadata={"hnsw:space": "cosine"}
+    )
+
+def index_faqs(business_id: int, entries: list) -> None:
+    """Add or refresh rendered FAQ entries in the business's collection"""
+    if not entries:
+        return
+    faq_collection(business_id).upsert(
+        ids=[str(entry.id) for entry in entries],
+        documents=[entry.question for entry in entries],
+        metadatas=[{"faq_id": entry.id} for entry in entries]
+    )
+
+def unindex_faq(business_id: int, faq_id: int) -> None:
+    """Remove an entry so it can no longer be matched"""
+    faq_collection(business_id).delete(ids=[str(faq_id)])
+
+def match_faq(business_id: int, message_text: str, threshold: float | None = None) -> FaqMatch:
+    """
+    Find the FAQ question closest to an inbound message.
+
+    Args:
+        business_id: Business whose library is searched
+        message_text: The customer's message
+        threshold: Minimum cosine similarity (defaults to FAQ_MATCH_THRESHOLD)
+
+    Returns:
+        FaqMatch with faq_id set only when the best candidate clears the threshold
+    """
+    threshold = settings.FAQ_MATCH_THRESHOLD if threshold is None else threshold
+    started = time.perf_counter()
+    collection = faq_collection(business_id)
+    if not message_text.strip() or collection.count() == 0:
+        return FaqMatch(None, 0.0, time.perf_counter() - started)
+
+    result = collection.query(query_texts=[message_text], n_results=1)
+    similarity = 1.0 - float(result["distances"][0][0])
+    faq_id = int(result["metadatas"][0][0]["faq_id"]) if similarity >= threshold else None
+    return FaqMatch(faq_id, similarity, time.perf_counter() - started)
+
+async def render_faq_video(business, answer: str, directory: Path | None = None) -> tuple[str, str]:
+    """
+    Render one FAQ answer with the business's voice and avatar.
+
+    Uses the fast local preview render for businesses in preview mode and the
+    SadTalker lip-sync render otherwise. The result is downloaded into
+    storage/faq (or the given directory), since Replicate output URLs expire.
+    Campaigns render their shared video and greetings the same way.
+
+    Returns:
+        (audio path, video path), both in the target directory
+    """
+    from app.services.voice import generate_voice_from_text, DEFAULT_VOICE_ID
+    from app.services.storage import FAQ_DIR, save_audio, save_video, get_public_url
+    from app.workers.pipeline import RENDER_PREVIEW, absolute_url
+
+    directory = directory or FAQ_DIR
+    voice_id = business.elevenlabs_voice_id or DEFAULT_VOICE_ID
+    audio_bytes = await generate_voice_from_text(answer, voice_id=voice_id)
+    audio_path = _move_to(await save_audio(audio_bytes), directory)
+
+    if business.video_render_mode == RENDER_PREVIEW:
+        from app.services.preview import render_preview_video
+        video_path = str(directory / f"{Path(audio_path).stem}.mp4")
+        await asyncio.to_thread(render_preview_video, audio_path, business.avatar_image_url, answer, video_path)
+        return audio_path, video_path
+
+    from app.services.video import start_talking_head_prediction, wait_for_prediction, prepare_render_source
+    avatar_url = absolute_url(get_public_url(prepare_render_source(business.avatar_image_url)))
+    prediction_id = await start_talking_head_prediction(absolute_url(get_public_url(audio_path)), avatar_url)
+    video_url = await wait_for_prediction(prediction_id)
+    return audio_path, _move_to(await save_video(video_url), directory)
+
+async def render_faq_batch(business, entries: list) -> dict:
+    """
+    Render a group of FAQ entries concurrently (at most FAQ_RENDER_CONCURRENCY at once).
+
+    Returns:
+        {faq_id: (audio path, video path) or the exception that stopped it}
+    """
+    slots = asyncio.Semaphore(settings.FAQ_RENDER_CONCURRENCY)
+
+    async def run(entry):
+        async with slots:
+            try:
+                return entry.id, await render_faq_video(business, entry.answer)
+            except Exception as e:
+                return entry.id, e
+
+    return dict(await asyncio.gather(*(run(entry) for entry in entries)))
+
+def build_faq_library(db, business) -> dict:
+    """
+    Render every pending FAQ entry of a business and index the ones that succeed.
+
+    Returns:
+        Counts of rendered and failed entries
+    """
+    from app.db.models import FaqEntry
+
+    entries = db.query(FaqEntry).filter(
+        FaqEntry.business_id == business.id,
+        FaqEntry.status == FAQ_PENDING
+    ).all()
+    if not entries:
+        return {"rendered": 0, "failed": 0}
+
+    for entry in entries:
+        entry.status = FAQ_RENDERING
+    db.commit()
+
+    results = asyncio.run(render_faq_batch(business, entries))
+    ready = []
+    for entry in entries:
+        result = results[entry.id]
+        if isinstance(result, Exception):
+            entry.status = FAQ_FAILED
+            entry.error_message = str(result)
+            continue
+        delete_faq_media(entry)  # previous render, when re-rendering
+        entry.audio_path, entry.video_path = result
+        entry.status = FAQ_READY
+        entry.error_message = None
+        entry.rendered_at = datetime.utcnow()
+        ready.append(entry)
+    db.commit()
+
+    # Only indexed once the video exists, so a match always has something to send
+    index_faqs(business.id, ready)
+    return {"rendered": len(ready), "failed": len(entries) - len(ready)}
+
+def delete_faq_media(entry) -> None:
+    """Remove an entry's rendered files"""
+    for path in (entry.audio_path, entry.video_path):
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _move_to(path: str, directory: Path) -> str:
+    target = directory / Path(path).name
+    os.replace(path, target)
+    return str(target)
@@ -1,15 +1,75 @@
-from langchain_groq import ChatGroq
+from dataclasses import dataclass
+from typing import Callable
+
 from app.core.config import settings
 
-def get_llm(temperature: float = 0.7):
-    """
-    Returns a configured ChatGroq instance (Llama 3).
-    """
-    if not settings.GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY is not set in environment variables.")
-    
+@dataclass
+class LLMProvider:
+    """One chat model the router can send a request to"""
+    name: str
+    model: str
+    api_key: str | None
+    factory: Callable  # (temperature, max_tokens) -> LangChain chat model
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+def _groq(temperature: float, max_tokens: int | None):
+    from langchain_groq import ChatGroq
+
     return ChatGroq(
         api_key=settings.GROQ_API_KEY,
-        model_name="llama-3.3-70b-versatile",  # Updated model (Dec 2024)
-        temperature=temperature
+        model_name=settings.GROQ_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        base_url=settings.GROQ_API_BASE
     )
+
+def _anthropic(temperature: float, max_tokens: int | None):
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        api_key=settings.ANTHROPIC_API_KEY,
+        model=settings.ANTHROPIC_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens or 1024,  # required by the Messages API
+        base_url=settings.ANTHROPIC_API_BASE
+    )
+
+def _openai(temperature: float, max_tokens: int | None):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        model=settings.OPENAI_MODEL,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        base_url=settings.OPENAI_API_BASE
+    )
+
+def configured_providers() -> list[LLMProvider]:
+    """Providers in LLM_PROVIDERS preference order that have an API key"""
+    known = {
+        "groq": LLMProvider("groq", settings.GROQ_MODEL, settings.GROQ_API_KEY, _groq),
+        "anthropic": LLMProvider("anthropic", settings.ANTHROPIC_MODEL, settings.ANTHROPIC_API_KEY, _anthropic),
+        "openai": LLMProvider("openai", settings.OPENAI_MODEL, settings.OPENAI_API_KEY, _openai),
+    }
+    names = [name.strip() for name in settings.LLM_PROVIDERS.split(",") if name.strip()]
+    return [known[name] for name in names if name in known and known[name].api_key]
+
+def get_llm(temperature: float = 0.7, max_tokens: int | None = None, providers: list[LLMProvider] | None = None):
+    """
+    Returns a chat model that routes each request across the configured providers.
+
+    Groq (Llama 3.3) is preferred; Anthropic and OpenAI take over when it is
+    failing or slow (see app.services.llm_router). max_tokens caps the reply
+    length when a word budget applies.
+    """
+    from app.services.llm_router import RoutedChatModel
+
+    providers = configured_providers() if providers is None else providers
+    if not providers:
+        raise ValueError("No LLM provider configured: set GROQ_API_KEY, ANTHROPIC_API_KEY or OPENAI_API_KEY.")
+
+    return RoutedChatModel(providers=providers, temperature=temperature, max_tokens=max_tokens)
@@ -0,0 +1,231 @@
+"""Latency- and error-aware routing of chat requests across LLM providers.
+
+Every request goes to the healthiest provider first, in LLM_PROVIDERS
+preference order. If it hasn't produced its first token by its own rolling
+p95, the next provider is raced against it (a hedged request) and whichever
+starts answering first wins; the loser is abandoned. A provider that errors
+before answering (429, 5xx, timeout) is failed over to the next one at once.
+
+Stats are per provider and model, kept in memory per worker process over a
+rolling time window. Providers failing more than LLM_MAX_ERROR_RATE are tried
+last, apart from a trickle of probe requests that lets them earn their place
+back once they recover.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Iterator
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from app.core.config import settings
+
+class ProviderStats:
+    """Rolling time to first token and outcomes for one provider/model"""
+
+    def __init__(self):
+        self._samples = deque()  # (recorded at, seconds to first token or None, ok)
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        horizon = now - settings.LLM_STATS_WINDOW_SECONDS
+        while self._samples and self._samples[0][0] < horizon:
+            self._samples.popleft()
+
+    def record(self, seconds: float | None, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, seconds, ok))
+            self._prune(now)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            samples = list(self._samples)
+        latencies = sorted(s[1] for s in samples if s[1] is not None)
+        errors = sum(1 for s in samples if not s[2])
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        return {
+            "requests": len(samples),
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "p50_seconds": pct(0.5),
+            "p95_seconds": pct(0.95),
+            "hedge_after_seconds": pct(settings.LLM_HEDGE_PERCENTILE) if len(latencies) >= settings.LLM_MIN_SAMPLES else None,
+        }
+
+_stats: dict[str, ProviderStats] = {}
+_stats_lock = threading.Lock()
+_counters = {"requests": 0, "hedged": 0, "failed_over": 0, "hedge_wins": 0}
+
+def provider_stats(key: str) -> ProviderStats:
+    with _stats_lock:
+        if key not in _stats:
+            _stats[key] = ProviderStats()
+        return _stats[key]
+
+def router_stats() -> dict:
+    """Router counters plus the rolling stats of every provider seen by this process"""
+    with _stats_lock:
+        keys = list(_stats)
+    return {**_counters, "providers": {key: provider_stats(key).snapshot() for key in keys}}
+
+def reset_router_stats() -> None:
+    """Forget all provider history (benchmarks)"""
+    with _stats_lock:
+        _stats.clear()
+    for name in _counters:
+        _counters[name] = 0
+
+def rank_providers(providers: list) -> list:
+    """
+    Providers under LLM_MAX_ERROR_RATE first, each group in preference order.
+
+    Every LLM_MIN_SAMPLES-th request keeps plain preference order, so a
+    demoted provider still sees a trickle of traffic and is promoted again
+    as soon as it recovers, rather than only once its failures age out.
+    """
+    if _counters["requests"] % settings.LLM_MIN_SAMPLES == 0:
+        return list(providers)
+
+    def demoted(provider):
+        snapshot = provider_stats(provider.key).snapshot()
+        return snapshot["requests"] >= settings.LLM_MIN_SAMPLES and snapshot["error_rate"] > settings.LLM_MAX_ERROR_RATE
+
+    return sorted(providers, key=demoted)  # stable: keeps preference order within each group
+
+def hedge_delay(provider) -> float:
+    """Seconds to wait for a provider's first token before racing the next provider"""
+    observed = provider_stats(provider.key).snapshot()["hedge_after_seconds"]
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_SECONDS
+    return max(settings.LLM_HEDGE_MIN_SECONDS, observed)
+
+def _run_attempt(index, model, messages, stop, events: queue.Queue, cancelled: threading.Event) -> None:
+    """Stream one provider's reply into the shared event queue (runs in its own thread)"""
+    try:
+        for chunk in model.stream(messages, stop=stop):
+            if cancelled.is_set():
+                return
+            events.put((index, "chunk", ChatGenerationChunk(message=chunk)))
+        events.put((index, "done", None))
+    except Exception as e:
+        events.put((index, "error", e))
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model that hedges and fails over across providers (see module docstring).
+
+    Drop-in for a single provider's chat model: invoke, stream and LangGraph's
+    token streaming all go through _stream, and only the winning provider's
+    tokens are emitted. Failover only happens before the first token; an error
+    mid-reply is raised like any other provider error.
+    """
+
+    providers: list
+    temperature: float = 0.7
+    max_tokens: int | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        _counters["requests"] += 1
+        candidates = rank_providers(self.providers)
+        events = queue.Queue()
+        attempts = []  # (provider, started, cancelled)
+        running = set()
+
+        def launch():
+            provider = candidates[len(attempts)]
+            cancelled = threading.Event()
+            attempts.append((provider, time.monotonic(), cancelled))
+            running.add(len(attempts) - 1)
+            try:
+                model = provider.factory(self.temperature, self.max_tokens)
+            except Exception as e:
+                events.put((len(attempts) - 1, "error", e))
+                return time.monotonic()
+            threading.Thread(
+                target=_run_attempt,
+                args=(len(attempts) - 1, model, messages, stop, events, cancelled),
+                daemon=True,
+                name=f"llm-{provider.name}"
+            ).start()
+            return time.monotonic() + hedge_delay(provider)
+
+        hedge_at = launch()
+        winner = None
+        last_error = None
+
+        while True:
+            timeout = None
+            if winner is None and running and len(attempts) < len(candidates):
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                index, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # Slower than this provider's usual p95: race the next one
+                _counters["hedged"] += 1
+                hedge_at = launch()
+                continue
+
+            provider, started, cancelled = attempts[index]
+            elapsed = time.monotonic() - started
+
+            if winner is None and kind in ("chunk", "done"):
+                winner = index
+                provider_stats(provider.key).record(elapsed, True)
+                if index > 0 and any(i < index for i in running):
+                    _counters["hedge_wins"] += 1
+                for other in running - {index}:
+                    # Lower bound for the abandoned request, so its p95 doesn't look better than it is
+                    other_provider, other_started, other_cancelled = attempts[other]
+                    other_cancelled.set()
+                    provider_stats(other_provider.key).record(time.monotonic() - other_started, True)
+                running.intersection_update({index})
+
+            if index != winner and winner is not None:
+                continue
+
+            if kind == "chunk":
+                if run_manager:
+                    run_manager.on_llm_new_token(payload.text, chunk=payload)
+                yield payload
+            elif kind == "done":
+                return
+            else:
+                running.discard(index)
+                provider_stats(provider.key).record(None, False)
+                if winner is not None:
+                    raise payload
+                print(f"LLM provider {provider.key} failed after {elapsed:.1f}s: {payload}")
+                last_error = payload
+                if running:
+                    continue  # a hedge is still in flight
+                if len(attempts) >= len(candidates):
+                    raise last_error
+                _counters["failed_over"] += 1
+                hedge_at = launch()
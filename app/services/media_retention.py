@@ -0,0 +1,196 @@
+"""Retention, per-business quotas and incremental garbage collection for generated media"""
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.db.models import Business, Conversation, MediaFile
+
+KIND_AUDIO = "audio"
+KIND_VOICE_NOTE = "voice_note"
+KIND_PREVIEW = "preview"
+KIND_ORPHAN = "orphan"
+
+# Age tiers: how long after creation a file may be deleted. Files of
+# conversations still in flight are never deleted; their expiry is pushed back.
+RETENTION_TIERS = {
+    KIND_AUDIO: timedelta(days=1),  # TTS MP3, only needed by the render and voice note
+    KIND_VOICE_NOTE: timedelta(days=7),
+    KIND_PREVIEW: timedelta(days=14),  # the reply video itself in preview-only mode
+    KIND_ORPHAN: timedelta(hours=1),
+}
+IN_FLIGHT_GRACE = timedelta(hours=1)
+FINISHED_STATUSES = ("sent", "failed")
+
+# Conversation checkpoint that points at each kind of file
+CONVERSATION_COLUMNS = {
+    KIND_AUDIO: "audio_path",
+    KIND_VOICE_NOTE: "voice_note_path",
+    KIND_PREVIEW: "preview_video_path",
+}
+
+def track_media(db, conversation, path: str, kind: str) -> None:
+    """
+    Register a newly written media file for retention (committed with the caller's checkpoint).
+
+    Args:
+        db: Session the caller commits
+        conversation: Conversation the file belongs to
+        path: Local path of the file
+        kind: KIND_AUDIO, KIND_VOICE_NOTE or KIND_PREVIEW
+    """
+    if db.query(MediaFile.id).filter(MediaFile.path == path).first():
+        return
+    now = datetime.utcnow()
+    db.add(MediaFile(
+        path=path,
+        kind=kind,
+        size_bytes=_file_size(path),
+        business_id=conversation.business_id,
+        conversation_id=conversation.id,
+        created_at=now,
+        expires_at=now + RETENTION_TIERS[kind]
+    ))
+
+def media_usage_bytes(db, business_id: int) -> int:
+    """Bytes of generated media currently stored for a business"""
+    total = db.query(func.sum(MediaFile.size_bytes)).filter(MediaFile.business_id == business_id).scalar()
+    return int(total or 0)
+
+def collect_garbage(db, batch_size: int | None = None) -> dict:
+    """
+    Run one bounded GC pass over the media index.
+
+    Only rows due for expiry (by the indexed expires_at) and, for businesses
+    over quota, their oldest files are looked at, so a pass never walks the
+    storage directory and costs at most batch_size deletions.
+
+    Returns:
+        Counts of expired/quota deletions, postponed files and bytes freed
+    """
+    batch_size = batch_size or settings.MEDIA_GC_BATCH_SIZE
+    now = datetime.utcnow()
+    stats = {"expired": 0, "quota": 0, "postponed": 0, "freed_bytes": 0}
+
+    due = (
+        db.query(MediaFile)
+        .filter(MediaFile.expires_at <= now)
+        .order_by(MediaFile.expires_at)
+        .limit(batch_size)
+        .all()
+    )
+    for media in due:
+        conversation = _conversation(db, media)
+        if conversation and conversation.status not in FINISHED_STATUSES:
+            media.expires_at = now + IN_FLIGHT_GRACE
+            stats["postponed"] += 1
+            continue
+        stats["freed_bytes"] += _delete_media(db, media, conversation)
+        stats["expired"] += 1
+    db.commit()
+
+    remaining = batch_size - stats["expired"]
+    for business_id, used, quota in _over_quota(db):
+        if remaining <= 0:
+            break
+        oldest = (
+            db.query(MediaFile)
+            .join(Conversation, MediaFile.conversation_id == Conversation.id)
+            .filter(MediaFile.business_id == business_id, Conversation.status.in_(FINISHED_STATUSES))
+            .order_by(MediaFile.created_at)
+            .limit(remaining)
+            .all()
+        )
+        for media in oldest:
+            if used <= quota:
+                break
+            size = _delete_media(db, media, _conversation(db, media))
+            used -= size
+            stats["freed_bytes"] += size
+            stats["quota"] += 1
+            remaining -= 1
+        db.commit()
+
+    return stats
+
+def index_untracked_media(db, directories: list[Path], limit: int | None = None) -> dict:
+    """
+    One-off backfill for files written before retention tracking existed.
+
+    Files still referenced by a conversation are registered under it; anything
+    else is registered as an orphan, which the GC removes after a short grace.
+    """
+    referenced = {}
+    for kind, column in CONVERSATION_COLUMNS.items():
+        rows = db.query(Conversation.id, Conversation.business_id, getattr(Conversation, column)).filter(
+            getattr(Conversation, column).isnot(None)
+        )
+        for conversation_id, business_id, path in rows:
+            referenced[os.path.normpath(path)] = (kind, business_id, conversation_id)
+
+    tracked = {os.path.normpath(path) for (path,) in db.query(MediaFile.path)}
+    now = datetime.utcnow()
+    stats = {"referenced": 0, "orphans": 0}
+    for directory in directories:
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+            path = os.path.normpath(entry.path)
+            if path in tracked:
+                continue
+            kind, business_id, conversation_id = referenced.get(path, (KIND_ORPHAN, None, None))
+            db.add(MediaFile(
+                path=entry.path,
+                kind=kind,
+                size_bytes=entry.stat().st_size,
+                business_id=business_id,
+                conversation_id=conversation_id,
+                created_at=now,
+                expires_at=now + RETENTION_TIERS[kind]
+            ))
+            stats["orphans" if kind == KIND_ORPHAN else "referenced"] += 1
+            if limit and sum(stats.values()) >= limit:
+                db.commit()
+                return stats
+    db.commit()
+    return stats
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _conversation(db, media):
+    if not media.conversation_id:
+        return None
+    return db.query(Conversation).filter(Conversation.id == media.conversation_id).first()
+
+def _over_quota(db) -> list[tuple[int, int, int]]:
+    """(business_id, bytes used, quota bytes) for businesses above quota, largest overrun first"""
+    usage = (
+        db.query(MediaFile.business_id, func.sum(MediaFile.size_bytes), Business.media_quota_mb)
+        .join(Business, MediaFile.business_id == Business.id)
+        .group_by(MediaFile.business_id, Business.media_quota_mb)
+        .all()
+    )
+    over = []
+    for business_id, used, quota_mb in usage:
+        quota = (quota_mb or settings.MEDIA_QUOTA_MB) * 1024 * 1024
+        if used > quota:
+            over.append((business_id, int(used), quota))
+    return sorted(over, key=lambda row: row[1] - row[2], reverse=True)
+
+def _delete_media(db, media, conversation) -> int:
+    """Remove the file and its index row, and clear the conversation checkpoint pointing at it"""
+    try:
+        os.remove(media.path)
+    except FileNotFoundError:
+        pass
+    column = CONVERSATION_COLUMNS.get(media.kind)
+    if conversation and column and getattr(conversation, column) == media.path:
+        setattr(conversation, column, None)
+    db.delete(media)
+    return media.size_bytes or 0
@@ -0,0 +1,148 @@
+"""Token-bucket rate limiting shared across API replicas through Redis"""
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+CUSTOMER_KEY = "vidioagent:ratelimit:business:{business_id}:customer:{customer}"
+BUSINESS_KEY = "vidioagent:ratelimit:business:{business_id}"
+ANALYZE_CLIENT_KEY = "vidioagent:ratelimit:analyze:{client}"
+SENDER_KEY = "vidioagent:ratelimit:sender:{number}"
+NOTICE_KEY = "vidioagent:ratelimit:notice:{business_id}:{customer}"
+LIMITED_KEY = "vidioagent:stats:rate_limited"
+
+# Checks every bucket, then takes a token from all of them only if each has
+# one, so a sender stuck on their own limit doesn't drain the business bucket.
+# Uses the Redis clock, so replicas with skewed clocks share one timeline.
+# KEYS: bucket keys. ARGV: cost, then capacity and refill/second per key.
+# Returns {index of the first limiting key (0 = allowed), retry-after seconds}.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+local limited_by = 0
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        local wait = (cost - tokens) / rate
+        if wait > retry_after then
+            retry_after = wait
+            limited_by = i
+        end
+    end
+end
+if limited_by == 0 then
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[2 * i])
+        local rate = tonumber(ARGV[2 * i + 1])
+        redis.call('HSET', key, 'tokens', levels[i] - cost, 'ts', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+end
+return {limited_by, tostring(retry_after)}
+"""
+
+_script = None
+
+@dataclass
+class RateLimit:
+    key: str
+    burst: int  # bucket capacity
+    per_minute: float  # sustained refill rate
+
+@dataclass
+class RateDecision:
+    allowed: bool
+    retry_after: float = 0.0
+    limited_by: str | None = None  # key of the bucket that ran out
+
+def _token_bucket():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(TOKEN_BUCKET_LUA)
+    return _script
+
+def check_rate_limits(limits: list[RateLimit], cost: int = 1) -> RateDecision:
+    """
+    Take `cost` tokens from every bucket in one atomic Redis round trip.
+
+    Fails open when Redis is unreachable, like the webhook dedupe: a Redis
+    outage should not stop replies.
+    """
+    if not settings.RATE_LIMIT_ENABLED or not limits:
+        return RateDecision(True)
+
+    args = [cost]
+    for limit in limits:
+        args += [limit.burst, limit.per_minute / 60.0]
+    try:
+        limited_by, retry_after = _token_bucket()(keys=[limit.key for limit in limits], args=args)
+    except Exception as e:
+        print(f"Rate limiter unavailable, allowing request: {e}")
+        return RateDecision(True)
+
+    limited_by = int(limited_by)
+    if not limited_by:
+        return RateDecision(True)
+    try:
+        get_redis().incr(LIMITED_KEY)
+    except Exception:
+        pass
+    return RateDecision(False, float(retry_after), limits[limited_by - 1].key)
+
+def webhook_limits(business_id: int, customer: str) -> list[RateLimit]:
+    """Per-(business, customer) and per-business buckets for inbound WhatsApp messages"""
+    return [
+        RateLimit(
+            CUSTOMER_KEY.format(business_id=business_id, customer=customer),
+            settings.RATE_LIMIT_CUSTOMER_BURST,
+            settings.RATE_LIMIT_CUSTOMER_PER_MINUTE
+        ),
+        RateLimit(
+            BUSINESS_KEY.format(business_id=business_id),
+            settings.RATE_LIMIT_BUSINESS_BURST,
+            settings.RATE_LIMIT_BUSINESS_PER_MINUTE
+        ),
+    ]
+
+def analyze_limits(client: str) -> list[RateLimit]:
+    """Per-client bucket for the unauthenticated /api/analyze endpoint"""
+    return [
+        RateLimit(
+            ANALYZE_CLIENT_KEY.format(client=client),
+            settings.RATE_LIMIT_ANALYZE_BURST,
+            settings.RATE_LIMIT_ANALYZE_PER_MINUTE
+        ),
+    ]
+
+def campaign_send_limits() -> list[RateLimit]:
+    """Outbound campaign messages from the shared Twilio WhatsApp sender, across all campaigns and workers"""
+    return [
+        RateLimit(
+            SENDER_KEY.format(number=settings.TWILIO_WHATSAPP_NUMBER),
+            settings.CAMPAIGN_SEND_BURST,
+            settings.CAMPAIGN_SENDS_PER_MINUTE
+        ),
+    ]
+
+def claim_limit_notice(business_id: int, customer: str, ttl_seconds: int = 60) -> bool:
+    """True at most once per ttl per sender, so the "slow down" reply isn't itself spammable"""
+    try:
+        return bool(get_redis().set(NOTICE_KEY.format(business_id=business_id, customer=customer), 1, nx=True, ex=ttl_seconds))
+    except Exception:
+        return False
+
+def limited_count() -> int:
+    """Number of requests rejected by the rate limiter so far"""
+    try:
+        return int(get_redis().get(LIMITED_KEY) or 0)
+    except Exception:
+        return 0
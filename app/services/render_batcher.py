@@ -0,0 +1,130 @@
+"""Per-avatar render batching.
+
+Renders for the same avatar that arrive within a short window are collected in
+Redis and flushed together by one worker: the predictions share a single
+prepared source image, are submitted back to back and awaited concurrently, so
+one worker slot covers the whole group instead of one slot per render. Results
+are fanned back out to their conversations by the flush task.
+
+A flush moves the jobs it takes into its own processing list (keyed by the
+flush task's id) and removes each one only once its result is written back,
+so a flush redelivered after a worker crash resumes the same jobs.
+"""
+import asyncio
+import hashlib
+import json
+import time
+
+from app.core.redis_client import get_redis
+
+BATCH_KEY = "vidioagent:render_batch:{avatar_key}"
+PROCESSING_KEY = "vidioagent:render_batch:{avatar_key}:processing:{flush_id}"
+BATCH_TTL_SECONDS = 60 * 60
+
+# KEYS: pending batch, flush's processing list. ARGV: max jobs, TTL.
+# Returns the flush's unfinished jobs, or moves up to max jobs from the batch
+# into its processing list in one step, so a job is always in one of the two.
+DRAIN_LUA = """
+local unfinished = redis.call('LRANGE', KEYS[2], 0, -1)
+if #unfinished > 0 then
+    return unfinished
+end
+local jobs = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #jobs > 0 then
+    redis.call('LTRIM', KEYS[1], #jobs, -1)
+    redis.call('RPUSH', KEYS[2], unpack(jobs))
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return jobs
+"""
+
+_drain_script = None
+
+def avatar_key(avatar_path: str) -> str:
+    """Stable short key for grouping renders by avatar"""
+    return hashlib.sha1(avatar_path.encode()).hexdigest()[:16]
+
+def enqueue_render(key: str, job: dict) -> bool:
+    """
+    Add a render job to its avatar's pending batch.
+    
+    Args:
+        key: avatar_key() of the avatar being rendered
+        job: JSON-serializable job (conversation_id, audio_url, task kwargs)
+        
+    Returns:
+        True if this job opened the batch, i.e. the caller must schedule the flush
+    """
+    r = get_redis()
+    batch = BATCH_KEY.format(avatar_key=key)
+    pipe = r.pipeline()
+    pipe.rpush(batch, json.dumps(job))
+    pipe.expire(batch, BATCH_TTL_SECONDS)
+    length, _ = pipe.execute()
+    return length == 1
+
+def drain_batch(key: str, flush_id: str, max_jobs: int = 50) -> list[dict]:
+    """
+    Take up to max_jobs pending jobs for an avatar into this flush's processing list.
+    
+    A redelivered flush (same flush_id) gets back the jobs it had not
+    finished instead of draining new ones.
+    """
+    global _drain_script
+    if _drain_script is None:
+        _drain_script = get_redis().register_script(DRAIN_LUA)
+    raw = _drain_script(
+        keys=[BATCH_KEY.format(avatar_key=key), PROCESSING_KEY.format(avatar_key=key, flush_id=flush_id)],
+        args=[max_jobs, BATCH_TTL_SECONDS]
+    )
+    return [json.loads(item) for item in raw]
+
+def finish_job(key: str, flush_id: str, job: dict) -> None:
+    """Drop a job from the flush's processing list once its result is written back"""
+    get_redis().lrem(PROCESSING_KEY.format(avatar_key=key, flush_id=flush_id), 1, json.dumps(job))
+
+def pending_count(key: str) -> int:
+    """Jobs still waiting in an avatar's batch"""
+    return int(get_redis().llen(BATCH_KEY.format(avatar_key=key)))
+
+async def render_batch(jobs: list[dict], image_url: str, submit=None, wait=None, on_submitted=None) -> dict:
+    """
+    Render a group of jobs that share one source image.
+    
+    Jobs that already carry a prediction_id are awaited, not resubmitted.
+    
+    Args:
+        jobs: Jobs from drain_batch (each needs conversation_id and audio_url)
+        image_url: Public URL of the prepared avatar shared by every job
+        submit: async (audio_url, image_url) -> prediction_id; defaults to Replicate
+        wait: async (prediction_id) -> video_url; defaults to Replicate polling
+        on_submitted: optional (conversation_id, prediction_id) callback, run in a
+            thread right after each submit so the prediction can be checkpointed
+        
+    Returns:
+        {conversation_id: {"prediction_id", "video_url", "seconds"}}; a failed
+        job has "error" and "exception" instead of video_url, and keeps the
+        prediction_id it was submitted as (None if the submit failed)
+    """
+    if submit is None or wait is None:
+        from app.services.video import start_talking_head_prediction, wait_for_prediction
+        submit = submit or start_talking_head_prediction
+        wait = wait or wait_for_prediction
+    
+    async def run(job):
+        started = time.monotonic()
+        result = {"prediction_id": job.get("prediction_id")}
+        try:
+            if not result["prediction_id"]:
+                result["prediction_id"] = await submit(job["audio_url"], image_url)
+                if on_submitted:
+                    await asyncio.to_thread(on_submitted, job["conversation_id"], result["prediction_id"])
+            result["video_url"] = await wait(result["prediction_id"])
+            result["seconds"] = time.monotonic() - started
+        except Exception as e:
+            result["error"] = str(e)
+            result["exception"] = e
+        return job["conversation_id"], result
+    
+    results = await asyncio.gather(*(run(job) for job in jobs))
+    return dict(results)
@@ -0,0 +1,118 @@
+"""Reply length planning against a per-business target video duration"""
+import io
+import re
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+DEFAULT_WORDS_PER_SECOND = 2.5  # ~150 wpm, typical for ElevenLabs multilingual voices
+SENTENCE_PAUSE_SECONDS = 0.18  # matches the gap stitch_audio inserts between sentences
+BUDGET_TOLERANCE = 1.1  # accept replies up to 10% over before trimming
+
+RATE_KEY = "vidioagent:speech_rate:{voice_id}"
+RATE_SMOOTHING = 0.2
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def words_per_second(voice_id: str | None = None) -> float:
+    """Calibrated speaking rate for a voice (falls back to the default rate)"""
+    if voice_id:
+        try:
+            rate = get_redis().get(RATE_KEY.format(voice_id=voice_id))
+            if rate:
+                return float(rate)
+        except Exception:
+            pass
+    return DEFAULT_WORDS_PER_SECOND
+
+def record_speech_rate(voice_id: str, words: int, audio_seconds: float) -> None:
+    """Fold a measured words/second sample into the voice's moving average"""
+    if not voice_id or words < 5 or audio_seconds <= 0:
+        return
+    try:
+        sample = words / audio_seconds
+        current = words_per_second(voice_id)
+        updated = current + RATE_SMOOTHING * (sample - current)
+        get_redis().set(RATE_KEY.format(voice_id=voice_id), round(updated, 3))
+    except Exception as e:
+        print(f"Failed to record speech rate for {voice_id}: {e}")
+
+def word_budget(target_seconds: float, voice_id: str | None = None) -> int:
+    """Convert a target spoken duration into a word budget for the LLM prompt"""
+    return max(10, int(target_seconds * words_per_second(voice_id)))
+
+def estimate_spoken_seconds(text: str, voice_id: str | None = None) -> float:
+    """Predict the TTS duration of a reply before synthesizing it"""
+    from app.services.voice import split_sentences
+
+    sentences = split_sentences(text) or [text]
+    pauses = SENTENCE_PAUSE_SECONDS * max(0, len(sentences) - 1)
+    return round(count_words(text) / words_per_second(voice_id) + pauses, 2)
+
+def trim_to_budget(text: str, max_words: int) -> str:
+    """
+    Keep whole sentences up to the word budget.
+
+    A first sentence that is already over budget is cut at the budget and
+    closed with a full stop so TTS still ends naturally.
+    """
+    from app.services.voice import split_sentences
+
+    kept = []
+    words = 0
+    for sentence in split_sentences(text) or [text]:
+        sentence_words = count_words(sentence)
+        if kept and words + sentence_words > max_words:
+            break
+        if not kept and sentence_words > max_words:
+            cut = " ".join(sentence.split()[:max_words])
+            return re.sub(r"[,;:\-\s]+$", "", cut) + "."
+        kept.append(sentence)
+        words += sentence_words
+    return " ".join(kept)
+
+def compress_reply(text: str, max_words: int) -> str:
+    """Ask the LLM to rewrite an over-long reply within the word budget"""
+    from app.services.llm import get_llm
+    from langchain_core.messages import SystemMessage, HumanMessage
+
+    llm = get_llm(temperature=0.2, max_tokens=max_words * 2 + 20)
+    response = llm.invoke([
+        SystemMessage(content=(
+            f"Rewrite the reply below in at most {max_words} words. Keep the key facts, "
+            "prices and next steps, keep the same tone, and reply with the rewritten text only."
+        )),
+        HumanMessage(content=text)
+    ])
+    return response.content.strip()
+
+def enforce_budget(text: str, max_words: int) -> str:
+    """
+    Bring a reply within its word budget.
+
+    Small overruns are tolerated. Larger ones are trimmed at sentence
+    boundaries, unless trimming would drop more than 40% of the reply, in
+    which case the reply is compressed by the LLM first (and still trimmed as
+    a hard guarantee).
+    """
+    words = count_words(text)
+    if words <= max_words * BUDGET_TOLERANCE:
+        return text
+
+    trimmed = trim_to_budget(text, max_words)
+    if count_words(trimmed) >= 0.6 * max_words:
+        return trimmed
+
+    try:
+        return trim_to_budget(compress_reply(text, max_words), max_words)
+    except Exception as e:
+        print(f"Reply compression failed, trimming instead: {e}")
+        return trimmed
+
+def audio_duration_seconds(audio_bytes: bytes) -> float:
+    """Measure the real duration of synthesized MP3 audio"""
+    from pydub import AudioSegment
+
+    AudioSegment.converter = settings.FFMPEG_BINARY
+    return len(AudioSegment.from_file(io.BytesIO(audio_bytes), format="mp3", codec="mp3")) / 1000.0
@@ -0,0 +1,128 @@
+"""Load-adaptive choice between a full video, a voice note or a text-only reply"""
+from dataclasses import dataclass
+from datetime import datetime
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.workers.queues import REPLY_QUEUE, reply_shard_queue
+
+# Response modes recorded on Conversation.response_mode
+MODE_VIDEO = "video"
+MODE_AUDIO = "audio"
+MODE_TEXT = "text"
+MODE_FAQ = "faq"  # pre-rendered FAQ video, chosen before the policy runs
+
+# Fallback latencies (seconds) used until enough live samples exist
+DEFAULT_LATENCY = {
+    "render": 120.0,
+    "tts": 8.0,
+    "preview": 5.0,
+}
+
+LATENCY_KEY = "vidioagent:latency:{stage}"
+LATENCY_SAMPLES = 50
+
+@dataclass
+class ResponseDecision:
+    mode: str
+    reason: str
+
+def record_latency(stage: str, seconds: float) -> None:
+    """Push a latency sample for a pipeline stage (keeps the most recent samples only)"""
+    try:
+        r = get_redis()
+        key = LATENCY_KEY.format(stage=stage)
+        pipe = r.pipeline()
+        pipe.lpush(key, round(seconds, 3))
+        pipe.ltrim(key, 0, LATENCY_SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        print(f"Failed to record {stage} latency: {e}")
+
+def recent_latency(stage: str) -> float:
+    """
+    Return the recent p75 latency for a stage.
+
+    Args:
+        stage: Pipeline stage name ("render", "preview", "tts")
+
+    Returns:
+        Latency in seconds, or the stage default when no samples are available
+    """
+    try:
+        samples = sorted(float(s) for s in get_redis().lrange(LATENCY_KEY.format(stage=stage), 0, -1))
+    except Exception:
+        samples = []
+    if not samples:
+        return DEFAULT_LATENCY.get(stage, 60.0)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.75))]
+
+def get_queue_depth(queue: str = REPLY_QUEUE) -> int:
+    """
+    Number of jobs waiting in a Celery queue on the Redis broker.
+    
+    For the replies queue this includes every reply shard when affinity
+    routing is on, since those jobs compete for the same worker slots.
+    """
+    queues = [queue]
+    if queue == REPLY_QUEUE and settings.AFFINITY_ROUTING_ENABLED:
+        queues += [reply_shard_queue(shard) for shard in range(settings.AFFINITY_SHARDS)]
+    try:
+        pipe = get_redis().pipeline()
+        for name in queues:
+            pipe.llen(name)
+        return sum(int(depth) for depth in pipe.execute())
+    except Exception:
+        return 0
+
+def choose_response_mode(business, conversation, queue_depth: int | None = None) -> ResponseDecision:
+    """
+    Pick the richest reply that can still reach the customer within the business SLA.
+
+    The projected render time is the recent render latency inflated by the
+    backlog competing for the same render slots. Video is chosen when the time
+    already spent in the queue plus that projection fits the video SLA, a voice
+    note when TTS alone fits the voice SLA, and text otherwise.
+
+    Args:
+        business: Business row (opt-in flag and SLA targets)
+        conversation: Conversation row (used for time already waited)
+        queue_depth: Override for the live queue depth (mainly for simulations)
+
+    Returns:
+        ResponseDecision with the chosen mode and a short human-readable reason
+    """
+    if not business.adaptive_response_enabled:
+        return ResponseDecision(MODE_VIDEO, "adaptive responses disabled")
+
+    if queue_depth is None:
+        queue_depth = get_queue_depth()
+
+    waited = 0.0
+    if conversation.created_at:
+        waited = max(0.0, (datetime.utcnow() - conversation.created_at).total_seconds())
+
+    # Preview-only tenants never wait on the lip-sync render
+    render_stage = "preview" if business.video_render_mode == "preview" else "render"
+    render_latency = recent_latency(render_stage)
+    tts_latency = recent_latency("tts")
+    backlog_factor = 1 + queue_depth / max(1, settings.RENDER_CONCURRENCY)
+    projected_video = waited + tts_latency + render_latency * backlog_factor
+    projected_audio = waited + tts_latency
+
+    video_sla = business.video_sla_seconds or 300
+    voice_sla = business.voice_sla_seconds or 60
+
+    if projected_video <= video_sla:
+        return ResponseDecision(
+            MODE_VIDEO,
+            f"projected video {projected_video:.0f}s within SLA {video_sla}s (queue={queue_depth})"
+        )
+    if projected_audio <= voice_sla:
+        return ResponseDecision(
+            MODE_AUDIO,
+            f"projected video {projected_video:.0f}s over SLA {video_sla}s; voice note in {projected_audio:.0f}s (queue={queue_depth})"
+        )
+    return ResponseDecision(
+        MODE_TEXT,
+        f"projected voice note {projected_audio:.0f}s over SLA {voice_sla}s (queue={queue_depth})"
+    )
@@ -1,9 +1,14 @@
 """File storage service for voice samples, avatars, and generated videos"""
+import base64
+import hashlib
+import hmac
 import os
+import time
 import uuid
 from pathlib import Path
 from fastapi import UploadFile
 from app.core.config import settings
+from app.core.tracing import span
 
 # Storage directory
 STORAGE_DIR = Path("./storage")
@@ -11,9 +16,11 @@ VOICE_SAMPLES_DIR = STORAGE_DIR / "voice_samples"
 AVATARS_DIR = STORAGE_DIR / "avatars"
 VIDEOS_DIR = STORAGE_DIR / "videos"
 AUDIO_DIR = STORAGE_DIR / "audio"
+FAQ_DIR = STORAGE_DIR / "faq"  # pre-rendered FAQ media, kept outside the retention GC
+CAMPAIGNS_DIR = STORAGE_DIR / "campaigns"  # per-campaign media, removed with the campaign
 
 # Create directories if they don't exist
-for directory in [VOICE_SAMPLES_DIR, AVATARS_DIR, VIDEOS_DIR, AUDIO_DIR]:
+for directory in [VOICE_SAMPLES_DIR, AVATARS_DIR, VIDEOS_DIR, AUDIO_DIR, FAQ_DIR, CAMPAIGNS_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
 async def save_voice_sample(file: UploadFile) -> str:
@@ -23,7 +30,7 @@ async def save_voice_sample(file: UploadFile) -> str:
     file_path = VOICE_SAMPLES_DIR / unique_filename
     
     content = await file.read()
-    with open(file_path, "wb") as f:
+    with span("storage.write", path=str(file_path), bytes=len(content)), open(file_path, "wb") as f:
         f.write(content)
     
     return str(file_path)
@@ -35,7 +42,7 @@ async def save_avatar(file: UploadFile) -> str:
     file_path = AVATARS_DIR / unique_filename
     
     content = await file.read()
-    with open(file_path, "wb") as f:
+    with span("storage.write", path=str(file_path), bytes=len(content)), open(file_path, "wb") as f:
         f.write(content)
     
     return str(file_path)
@@ -45,7 +52,7 @@ async def save_audio(audio_bytes: bytes, extension: str = ".mp3") -> str:
     unique_filename = f"{uuid.uuid4()}{extension}"
     file_path = AUDIO_DIR / unique_filename
     
-    with open(file_path, "wb") as f:
+    with span("storage.write", path=str(file_path), bytes=len(audio_bytes)), open(file_path, "wb") as f:
         f.write(audio_bytes)
     
     return str(file_path)
@@ -57,15 +64,41 @@ async def save_video(video_url: str) -> str:
     unique_filename = f"{uuid.uuid4()}.mp4"
     file_path = VIDEOS_DIR / unique_filename
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(video_url)
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+    with span("storage.download", path=str(file_path)) as current:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(video_url)
+            with open(file_path, "wb") as f:
+                f.write(response.content)
+        current.set_attribute("bytes", len(response.content))
     
     return str(file_path)
 
-def get_public_url(file_path: str) -> str:
-    """Convert file path to public URL (for now, just return the path)"""
-    # In production, this would return a CDN URL or S3 URL
-    # For now, we'll serve files statically from the storage directory
-    return f"/storage/{Path(file_path).relative_to(STORAGE_DIR)}"
+def sign_media_uri(uri: str, expires: int) -> str:
+    """
+    Signature for a /storage URI valid until the given unix time.
+
+    Same scheme as nginx's secure_link module configured with
+    secure_link_md5 "$secure_link_expires$uri <SECRET_KEY>", so a fronting
+    proxy can validate and serve signed URLs without reaching the app.
+    """
+    digest = hashlib.md5(f"{expires}{uri} {settings.SECRET_KEY}".encode(), usedforsecurity=False).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+def verify_media_signature(uri: str, expires: str | None, signature: str | None) -> bool:
+    """Check a signed /storage URL (signature matches and not yet expired)"""
+    if not expires or not signature or not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign_media_uri(uri, int(expires)), signature)
+
+def get_public_url(file_path: str, ttl_seconds: int | None = None) -> str:
+    """
+    Convert a storage path to its public /storage URL.
+
+    With MEDIA_URL_SIGNING enabled the URL carries an expiry and signature
+    (?expires=...&md5=...) and is only served until it expires.
+    """
+    uri = f"/storage/{Path(file_path).relative_to(STORAGE_DIR).as_posix()}"
+    if not settings.MEDIA_URL_SIGNING:
+        return uri
+    expires = int(time.time()) + (ttl_seconds or settings.MEDIA_URL_TTL_SECONDS)
+    return f"{uri}?expires={expires}&md5={sign_media_uri(uri, expires)}"
@@ -0,0 +1,182 @@
+"""Tenant-affinity routing of customer replies.
+
+Every business hashes to one of AFFINITY_SHARDS reply shard queues
+(replies.shard.N), and that mapping never changes. Live "replies" workers
+split the shards between them on a consistent-hash ring: each worker renews
+its membership in a Redis sorted set every AFFINITY_HEARTBEAT_SECONDS,
+computes the same ring from the live members and consumes the shards it
+owns, alongside the shared replies queue. When a worker joins or leaves,
+only the shards next to its ring points change owner, so every other
+worker's business cache (services/business_assets.py) stays warm.
+
+A reply goes to the shared replies queue instead when its shard has no live
+owner, when AFFINITY_SPILLOVER_DEPTH jobs already wait in the shard (a busy
+business or a slow worker), or when Redis can't be asked. Any worker takes
+those, so affinity never holds a job back.
+"""
+import bisect
+import hashlib
+import threading
+import time
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.workers.queues import REPLY_QUEUE, reply_shard_queue
+
+MEMBERS_KEY = "vidioagent:affinity:workers"
+REPLY_TASK = "app.workers.celery_app.generate_and_send_video"
+
+# Dispatcher's view of the ring, rebuilt at most once per heartbeat
+_ring = None
+_ring_built_at = 0.0
+_ring_lock = threading.Lock()
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+def shard_for(business_id: int) -> int:
+    """The business's reply shard (stable for a given AFFINITY_SHARDS)"""
+    return _hash(f"business:{business_id}") % settings.AFFINITY_SHARDS
+
+class HashRing:
+    """Consistent-hash ring of worker names, with vnodes points per worker"""
+
+    def __init__(self, members, vnodes: int | None = None):
+        vnodes = vnodes or settings.AFFINITY_VNODES
+        self.members = sorted(set(members))
+        points = sorted((_hash(f"{member}#{index}"), member) for member in self.members for index in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key: str) -> str | None:
+        """Member owning a key: the first ring point clockwise from its hash"""
+        if not self._owners:
+            return None
+        return self._owners[bisect.bisect(self._points, _hash(key)) % len(self._points)]
+
+    def shard_owner(self, shard: int) -> str | None:
+        return self.owner(f"shard:{shard}")
+
+    def owned_shards(self, member: str, shards: int | None = None) -> list[int]:
+        """Shards this member consumes"""
+        shards = shards or settings.AFFINITY_SHARDS
+        return [shard for shard in range(shards) if self.shard_owner(shard) == member]
+
+def member_ttl() -> float:
+    """A worker that missed this many seconds of heartbeats is off the ring"""
+    return 3 * settings.AFFINITY_HEARTBEAT_SECONDS
+
+def heartbeat(worker: str) -> None:
+    """Renew a worker's ring membership and prune members that stopped renewing"""
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.zadd(MEMBERS_KEY, {worker: now})
+    pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now - member_ttl())
+    pipe.execute()
+
+def leave(worker: str) -> None:
+    """Take a worker off the ring right away (its shards move at the others' next heartbeat)"""
+    get_redis().zrem(MEMBERS_KEY, worker)
+
+def live_workers() -> list[str]:
+    return list(get_redis().zrangebyscore(MEMBERS_KEY, time.time() - member_ttl(), "+inf"))
+
+def current_ring() -> HashRing:
+    """
+    The ring as the dispatcher sees it, refreshed at most every AFFINITY_HEARTBEAT_SECONDS.
+
+    Empty (everything spills to the shared queue) while Redis is unreachable.
+    """
+    global _ring, _ring_built_at
+    now = time.monotonic()
+    if _ring is not None and now - _ring_built_at < settings.AFFINITY_HEARTBEAT_SECONDS:
+        return _ring
+    with _ring_lock:
+        if _ring is None or now - _ring_built_at >= settings.AFFINITY_HEARTBEAT_SECONDS:
+            try:
+                members = live_workers()
+            except Exception as e:
+                print(f"Affinity ring unavailable, replies use the shared queue: {e}")
+                members = []
+            _ring, _ring_built_at = HashRing(members), now
+    return _ring
+
+def reply_queue_for(business_id: int) -> str:
+    """Queue for a business's next reply job: its shard, or the shared queue on spillover"""
+    shard = shard_for(business_id)
+    if current_ring().shard_owner(shard) is None:
+        return REPLY_QUEUE
+    queue = reply_shard_queue(shard)
+    try:
+        # Celery's Redis transport keeps each queue as a list named after it
+        waiting = get_redis().llen(queue)
+    except Exception:
+        return REPLY_QUEUE
+    return queue if waiting < settings.AFFINITY_SPILLOVER_DEPTH else REPLY_QUEUE
+
+def route_task(name, args, kwargs, options, task=None, **extra):
+    """
+    Celery router: generate_and_send_video goes to its business's shard queue.
+
+    Covers the webhook's dispatch and the re-dispatches after a batched
+    render. Retries are republished to the queue the job came from. Other
+    tasks fall through to the task_routes table.
+    """
+    if name != REPLY_TASK or not settings.AFFINITY_ROUTING_ENABLED:
+        return None
+    business_id = (kwargs or {}).get("business_id")
+    if business_id is None:
+        return None
+    return {"queue": reply_queue_for(business_id)}
+
+class AffinityMember:
+    """
+    Keeps one worker on the ring and its shard consumers in step with it.
+
+    add_consumer / cancel_consumer start and stop consuming a queue by name;
+    the worker passes Celery remote-control calls addressed to itself.
+    """
+
+    def __init__(self, worker: str, add_consumer, cancel_consumer):
+        self.worker = worker
+        self.add_consumer = add_consumer
+        self.cancel_consumer = cancel_consumer
+        self.consuming: set[str] = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync(self) -> tuple[list[str], list[str]]:
+        """Heartbeat, rebuild the ring and rebalance; returns (queues added, queues cancelled)"""
+        heartbeat(self.worker)
+        ring = HashRing(live_workers())
+        owned = {reply_shard_queue(shard) for shard in ring.owned_shards(self.worker)}
+        added, cancelled = sorted(owned - self.consuming), sorted(self.consuming - owned)
+        for queue in added:
+            self.add_consumer(queue)
+        for queue in cancelled:
+            self.cancel_consumer(queue)
+        self.consuming = owned
+        if added or cancelled:
+            print(f"Affinity ring: {len(ring.members)} workers, {self.worker} owns {len(owned)} shards (+{len(added)} -{len(cancelled)})")
+        return added, cancelled
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                # Keep the shards we have; members that stop renewing drop off the ring
+                print(f"Affinity heartbeat failed for {self.worker}: {e}")
+            if self._stop.wait(settings.AFFINITY_HEARTBEAT_SECONDS):
+                return
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="affinity-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            leave(self.worker)
+        except Exception as e:
+            print(f"Failed to leave the affinity ring: {e}")
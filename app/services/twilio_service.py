@@ -1,13 +1,39 @@
 """Twilio WhatsApp messaging service"""
-from twilio.rest import Client
 from app.core.config import settings
+from app.core.tracing import span
+from app.services.circuit_breaker import PROVIDER_TWILIO, provider_call
 
-def get_twilio_client() -> Client:
+def get_twilio_client() -> "Client":
     """Get configured Twilio client"""
+    from twilio.rest import Client
+    
     if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN:
         raise ValueError("Twilio credentials not set in environment")
     
-    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    if settings.TWILIO_API_BASE:
+        client.api.base_url = settings.TWILIO_API_BASE
+    return client
+
+def _status_callback() -> dict:
+    """StatusCallback argument for messages.create, when delivery tracking is on"""
+    from app.services.delivery_status import status_callback_url
+    
+    url = status_callback_url()
+    return {"status_callback": url} if url else {}
+
+def is_valid_twilio_request(url: str, params: dict, signature: str | None) -> bool:
+    """Whether a webhook's X-Twilio-Signature matches the URL and form params it was posted with"""
+    from twilio.request_validator import RequestValidator
+    
+    if not signature or not settings.TWILIO_AUTH_TOKEN:
+        return False
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, params, signature)
+
+def _twilio_failed(error: Exception) -> bool:
+    """Whether an error counts against Twilio's breaker (not a rejected request, e.g. a bad number)"""
+    status = getattr(error, "status", None)
+    return status is None or status == 429 or status >= 500
 
 def send_whatsapp_message(to_number: str, message: str) -> str:
     """
@@ -19,6 +45,9 @@ def send_whatsapp_message(to_number: str, message: str) -> str:
         
     Returns:
         Message SID
+    
+    Raises:
+        CircuitOpenError: Twilio's breaker is open (BulkheadFullError: no slot free)
     """
     client = get_twilio_client()
     
@@ -27,11 +56,14 @@ def send_whatsapp_message(to_number: str, message: str) -> str:
     
     from_number = f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}"
     
-    message = client.messages.create(
-        body=message,
-        from_=from_number,
-        to=to_number
-    )
+    with span("twilio.send_message") as current, provider_call(PROVIDER_TWILIO, _twilio_failed):
+        message = client.messages.create(
+            body=message,
+            from_=from_number,
+            to=to_number,
+            **_status_callback()
+        )
+        current.set_attribute("message_sid", message.sid)
     
     return message.sid
 
@@ -46,6 +78,9 @@ def send_whatsapp_media(to_number: str, media_url: str, caption: str = "") -> st
         
     Returns:
         Message SID
+    
+    Raises:
+        CircuitOpenError: Twilio's breaker is open (BulkheadFullError: no slot free)
     """
     client = get_twilio_client()
     
@@ -54,11 +89,14 @@ def send_whatsapp_media(to_number: str, media_url: str, caption: str = "") -> st
     
     from_number = f"whatsapp:{settings.TWILIO_WHATSAPP_NUMBER}"
     
-    message = client.messages.create(
-        body=caption,
-        from_=from_number,
-        to=to_number,
-        media_url=[media_url]
-    )
+    with span("twilio.send_media") as current, provider_call(PROVIDER_TWILIO, _twilio_failed):
+        message = client.messages.create(
+            body=caption,
+            from_=from_number,
+            to=to_number,
+            media_url=[media_url],
+            **_status_callback()
+        )
+        current.set_attribute("message_sid", message.sid)
     
     return message.sid
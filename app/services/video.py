@@ -1,9 +1,55 @@
 """Replicate video generation service for lip-sync videos"""
-import replicate
 from app.core.config import settings
 import httpx
+import asyncio
 from pathlib import Path
 
+SADTALKER_MODEL = "cjwbw/sadtalker"
+SADTALKER_VERSION = "3aa3dac9353cc4d6bd62a35e0f93b766889e0be6f882ed4adf43f3e"
+
+class PredictionFailedError(Exception):
+    """Raised when a Replicate prediction finishes in a failed or canceled state"""
+
+def sadtalker_input(audio_url: str, image_url: str) -> dict:
+    """Build the SadTalker input payload for one render"""
+    return {
+        "source_image": image_url,
+        "driven_audio": audio_url,
+        "preprocess": "full",
+        "still_mode": False,
+        "use_enhancer": True,
+        "batch_size": 1
+    }
+
+def prepare_render_source(avatar_path: str, max_side: int = 512) -> str:
+    """
+    Downscale an avatar once into the shared source image used for every render.
+    
+    SadTalker's preprocessing cost grows with the source resolution, and every
+    render of the same avatar reuses this file (and its URL) instead of the
+    original upload.
+    
+    Args:
+        avatar_path: Local path to the uploaded avatar
+        max_side: Longest side of the prepared image in pixels
+        
+    Returns:
+        Local path to the prepared PNG (created on first use)
+    """
+    from PIL import Image, ImageOps
+    
+    source = Path(avatar_path)
+    prepared = source.with_name(f"{source.stem}_render.png")
+    if prepared.exists() and prepared.stat().st_mtime >= source.stat().st_mtime:
+        return str(prepared)
+    
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_side, max_side))
+        img.save(prepared, format="PNG")
+    
+    return str(prepared)
+
 async def generate_talking_head_video(
     audio_url: str,
     image_url: str,
@@ -25,19 +71,13 @@ async def generate_talking_head_video(
     
     try:
         # Initialize Replicate client
-        client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+        import replicate
+        client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN, base_url=settings.REPLICATE_API_BASE)
         
         # Run SadTalker model
         output = client.run(
-            "cjwbw/sadtalker:3aa3dac9353cc4d6bd62a35e0f93b766889e0be6f882ed4adf43f3e",
-            input={
-                "source_image": image_url,
-                "driven_audio": audio_url,
-                "preprocess": "full",
-                "still_mode": False,
-                "use_enhancer": True,
-                "batch_size": 1
-            }
+            f"{SADTALKER_MODEL}:{SADTALKER_VERSION}",
+            input=sadtalker_input(audio_url, image_url)
         )
         
         # Output is a URL to the generated video
@@ -55,6 +95,73 @@ async def generate_talking_head_video(
     except Exception as e:
         raise Exception(f"Video generation failed: {str(e)}")
 
+async def start_talking_head_prediction(audio_url: str, image_url: str) -> str:
+    """
+    Submit a SadTalker render without waiting for it to finish.
+    
+    The returned prediction ID can be checkpointed so a retried job polls the
+    existing render instead of paying for a new one.
+    
+    Args:
+        audio_url: URL to the audio file (voice)
+        image_url: URL to the avatar image
+        
+    Returns:
+        Replicate prediction ID
+    """
+    if not settings.REPLICATE_API_TOKEN:
+        raise ValueError("REPLICATE_API_TOKEN not set in environment")
+    
+    try:
+        import replicate
+        client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN, base_url=settings.REPLICATE_API_BASE)
+        prediction = client.predictions.create(
+            version=SADTALKER_VERSION,
+            input=sadtalker_input(audio_url, image_url)
+        )
+        return prediction.id
+    except Exception as e:
+        raise Exception(f"Video generation failed: {str(e)}")
+
+async def wait_for_prediction(
+    prediction_id: str,
+    poll_interval: float = 3.0,
+    timeout: float = 900.0
+) -> str:
+    """
+    Poll a Replicate prediction until it finishes.
+    
+    Args:
+        prediction_id: ID returned by start_talking_head_prediction
+        poll_interval: Seconds between status checks
+        timeout: Give up after this many seconds (the prediction keeps running)
+        
+    Returns:
+        URL to the generated video
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    
+    while True:
+        status = await check_generation_status(prediction_id)
+        state = status.get("status")
+        
+        if state == "succeeded":
+            output = status.get("output")
+            if isinstance(output, list):
+                output = output[-1] if output else None
+            if not output:
+                raise PredictionFailedError(f"Prediction {prediction_id} returned no output")
+            return str(output)
+        
+        if state in ("failed", "canceled"):
+            raise PredictionFailedError(f"Prediction {prediction_id} {state}: {status.get('error')}")
+        
+        if loop.time() >= deadline:
+            raise TimeoutError(f"Prediction {prediction_id} still {state} after {timeout:.0f}s")
+        
+        await asyncio.sleep(poll_interval)
+
 async def generate_wav2lip_video(
     audio_url: str,
     video_url: str
@@ -73,7 +180,8 @@ async def generate_wav2lip_video(
         raise ValueError("REPLICATE_API_TOKEN not set in environment")
     
     try:
-        client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+        import replicate
+        client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN, base_url=settings.REPLICATE_API_BASE)
         
         output = client.run(
             "devxpy/cog-wav2lip:8d65e3f4f4298520e079198b493c25adfc43c058ffec924f2aefc8010ed25eef",
@@ -101,7 +209,7 @@ async def check_generation_status(prediction_id: str) -> dict:
     if not settings.REPLICATE_API_TOKEN:
         raise ValueError("REPLICATE_API_TOKEN not set in environment")
     
-    url = f"https://api.replicate.com/v1/predictions/{prediction_id}"
+    url = f"{settings.REPLICATE_API_BASE}/v1/predictions/{prediction_id}"
     headers = {
         "Authorization": f"Token {settings.REPLICATE_API_TOKEN}"
     }
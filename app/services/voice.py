@@ -1,17 +1,305 @@
 """ElevenLabs voice generation service"""
-from elevenlabs import generate, Voice, VoiceSettings, save
 from app.core.config import settings
+import asyncio
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+import time
 import httpx
+from collections import deque
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+DEFAULT_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+
+# Per-sentence cache on each worker's local disk, bucketed by the day a
+# sentence was last used (TTS_CACHE_DIR/YYYYMMDD/<key>.mp3)
+TTS_CACHE_DIR = Path(settings.TTS_CACHE_DIR)
+# Where the cache used to live; it is under the public /storage mount, so pruning removes it
+LEGACY_TTS_CACHE_DIR = Path("./storage/audio/tts_cache")
+
+# Sentence end followed by whitespace; keeps the punctuation with its sentence
+SENTENCE_BOUNDARY = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+")
+MIN_SENTENCE_CHARS = 20
+
+class _SlotPool:
+    """
+    Concurrency limit shared by every thread and event loop in the process.
+    
+    Under the thread-pool worker profile each job runs its own asyncio.run,
+    so an asyncio.Semaphore would only limit one job. Waiters await a future
+    on their own loop, which a release in any thread resolves.
+    """
+    
+    def __init__(self, limit: int):
+        self.free = limit
+        self.waiters = deque()  # (loop, future) in arrival order
+        self.lock = threading.Lock()
+    
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.free > 0:
+                self.free -= 1
+                return
+            waiter = loop.create_future()
+            self.waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self.lock:
+                queued = (loop, waiter) in self.waiters
+                if queued:
+                    self.waiters.remove((loop, waiter))
+            # Handed a slot while being cancelled: pass it on
+            if not queued and waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+    
+    def release(self) -> None:
+        with self.lock:
+            if not self.waiters:
+                self.free += 1
+                return
+            loop, waiter = self.waiters.popleft()
+        loop.call_soon_threadsafe(self._hand_over, waiter)
+    
+    def _hand_over(self, waiter) -> None:
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+_tts_slots = None
+_tts_slots_lock = threading.Lock()
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Split a reply into sentence chunks for synthesis.
+    
+    Fragments shorter than MIN_SENTENCE_CHARS ("Hi!", "Sure.") are merged into
+    the following sentence so each request carries enough context for natural
+    prosody.
+    """
+    parts = [p.strip() for p in SENTENCE_BOUNDARY.split(text.strip()) if p.strip()]
+    sentences = []
+    carry = ""
+    for part in parts:
+        part = f"{carry} {part}".strip() if carry else part
+        if len(part) < MIN_SENTENCE_CHARS:
+            carry = part
+            continue
+        sentences.append(part)
+        carry = ""
+    if carry:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {carry}"
+        else:
+            sentences.append(carry)
+    return sentences
+
+@asynccontextmanager
+async def _tts_slot():
+    """Hold one of the process's ELEVENLABS_MAX_CONCURRENCY request slots"""
+    global _tts_slots
+    if _tts_slots is None:
+        with _tts_slots_lock:
+            if _tts_slots is None:
+                _tts_slots = _SlotPool(settings.ELEVENLABS_MAX_CONCURRENCY)
+    await _tts_slots.acquire()
+    try:
+        yield
+    finally:
+        _tts_slots.release()
+
+def _cache_name(text: str, voice_id: str, model: str) -> str:
+    key = hashlib.sha256(f"{voice_id}|{model}|{sorted(VOICE_SETTINGS.items())}|{text}".encode()).hexdigest()
+    return f"{key}.mp3"
+
+def _cache_day(timestamp: float | None = None) -> str:
+    return time.strftime("%Y%m%d", time.gmtime(timestamp))
+
+def _today_bucket() -> Path:
+    """Today's cache bucket; the process that creates it prunes the expired ones"""
+    bucket = TTS_CACHE_DIR / _cache_day()
+    try:
+        bucket.mkdir(parents=True)
+    except FileExistsError:
+        return bucket
+    prune_tts_cache()
+    return bucket
+
+def _read_cached(name: str) -> bytes | None:
+    """Cached audio for a sentence, moved into today's bucket to mark its last use"""
+    path = _today_bucket() / name
+    if path.exists():
+        return path.read_bytes()
+    now = time.time()
+    for days in range(1, settings.TTS_CACHE_DAYS + 1):
+        try:
+            os.replace(TTS_CACHE_DIR / _cache_day(now - days * 86400) / name, path)
+        except FileNotFoundError:
+            continue
+        return path.read_bytes()
+    return None
+
+def _write_cached(name: str, audio: bytes) -> None:
+    (_today_bucket() / name).write_bytes(audio)
+
+def prune_tts_cache() -> dict:
+    """
+    Delete this host's cache buckets last used more than TTS_CACHE_DAYS ago.
+    
+    Only bucket names are listed, never the sentences inside live buckets.
+    Runs when a host first uses the cache each day and when a worker starts;
+    also removes files of older cache layouts (including the one under storage/).
+    """
+    oldest_kept = _cache_day(time.time() - settings.TTS_CACHE_DAYS * 86400)
+    stats = {"buckets_removed": 0, "legacy_removed": False}
+    if LEGACY_TTS_CACHE_DIR.is_dir():
+        shutil.rmtree(LEGACY_TTS_CACHE_DIR, ignore_errors=True)
+        stats["legacy_removed"] = True
+    if not TTS_CACHE_DIR.is_dir():
+        return stats
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if entry.is_dir() and entry.name.isdigit():
+            if entry.name < oldest_kept:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                stats["buckets_removed"] += 1
+        elif entry.is_file():
+            # Flat files from before the cache was bucketed
+            os.remove(entry.path)
+    return stats
+
+async def synthesize_speech(
+    text: str,
+    voice_id: str = DEFAULT_VOICE_ID,
+    model: str = "eleven_multilingual_v2",
+    previous_text: str | None = None,
+    next_text: str | None = None,
+    client: httpx.AsyncClient | None = None
+) -> bytes:
+    """
+    Synthesize a single chunk of text with the ElevenLabs text-to-speech API.
+    
+    previous_text/next_text give the model the surrounding sentences so chunks
+    synthesized separately keep a continuous intonation.
+    
+    Returns:
+        Audio bytes (MP3 format)
+    """
+    if not settings.ELEVENLABS_API_KEY:
+        raise ValueError("ELEVENLABS_API_KEY not set in environment")
+    
+    url = f"{settings.ELEVENLABS_API_BASE}/v1/text-to-speech/{voice_id}"
+    headers = {"xi-api-key": settings.ELEVENLABS_API_KEY, "accept": "audio/mpeg"}
+    payload = {"text": text, "model_id": model, "voice_settings": VOICE_SETTINGS}
+    if previous_text:
+        payload["previous_text"] = previous_text
+    if next_text:
+        payload["next_text"] = next_text
+    
+    async with _tts_slot():
+        if client is None:
+            async with httpx.AsyncClient(timeout=60) as own_client:
+                response = await own_client.post(url, headers=headers, json=payload)
+        else:
+            response = await client.post(url, headers=headers, json=payload)
+    
+    if response.status_code != 200:
+        raise Exception(f"ElevenLabs voice generation failed: {response.text}")
+    return response.content
+
+async def synthesize_cached(
+    sentence: str,
+    voice_id: str,
+    model: str,
+    previous_text: str | None = None,
+    next_text: str | None = None,
+    client: httpx.AsyncClient | None = None
+) -> bytes:
+    """synthesize_speech with the per-sentence disk cache in front of it"""
+    name = _cache_name(sentence, voice_id, model)
+    cached = await asyncio.to_thread(_read_cached, name)
+    if cached is not None:
+        return cached
+    audio = await synthesize_speech(sentence, voice_id, model, previous_text, next_text, client)
+    await asyncio.to_thread(_write_cached, name, audio)
+    return audio
+
+async def synthesize_sentences(sentences: list[str], synthesize) -> list[bytes]:
+    """
+    Synthesize sentence chunks concurrently, preserving order.
+    
+    Args:
+        sentences: Chunks from split_sentences
+        synthesize: async (text, previous_text, next_text) -> audio bytes
+    """
+    return await asyncio.gather(*(
+        synthesize(
+            sentence,
+            sentences[i - 1] if i > 0 else None,
+            sentences[i + 1] if i + 1 < len(sentences) else None
+        )
+        for i, sentence in enumerate(sentences)
+    ))
+
+def stitch_audio(chunks: list[bytes], gap_ms: int = 180, target_dbfs: float = -18.0) -> bytes:
+    """
+    Join per-sentence audio into one MP3 with even loudness and natural pauses.
+    
+    Each chunk's leading/trailing silence is trimmed and replaced by a fixed
+    gap, and every chunk is levelled to target_dbfs so sentences synthesized
+    separately don't jump in volume.
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+    
+    AudioSegment.converter = settings.FFMPEG_BINARY
+    
+    gap = AudioSegment.silent(duration=gap_ms)
+    combined = None
+    for chunk in chunks:
+        # Explicit codec skips pydub's ffprobe call; ElevenLabs always returns MP3
+        segment = AudioSegment.from_file(io.BytesIO(chunk), format="mp3", codec="mp3")
+        start = detect_leading_silence(segment, silence_threshold=-45.0)
+        end = detect_leading_silence(segment.reverse(), silence_threshold=-45.0)
+        if start + end < len(segment):
+            segment = segment[start:len(segment) - end]
+        if segment.dBFS != float("-inf"):
+            segment = segment.apply_gain(target_dbfs - segment.dBFS)
+        if combined is None:
+            combined = segment
+        else:
+            combined = combined + gap.set_frame_rate(segment.frame_rate) + segment
+    
+    output = io.BytesIO()
+    combined.export(output, format="mp3", bitrate="128k")
+    return output.getvalue()
+
 async def generate_voice_from_text(
     text: str,
-    voice_id: str = "21m00Tcm4TlvDq8ikWAM",  # Default voice
+    voice_id: str = DEFAULT_VOICE_ID,  # Default voice
     model: str = "eleven_multilingual_v2"
 ) -> bytes:
     """
     Generate audio from text using ElevenLabs.
     
+    The text is split at sentence boundaries and the sentences are synthesized
+    concurrently (bounded by ELEVENLABS_MAX_CONCURRENCY), so TTS time tracks
+    the longest sentence rather than the whole reply. Sentences are cached on
+    disk per voice, so repeated phrases are never billed twice.
+    
     Args:
         text: Text to convert to speech
         voice_id: ElevenLabs voice ID (or custom cloned voice)
@@ -23,29 +311,131 @@ async def generate_voice_from_text(
     if not settings.ELEVENLABS_API_KEY:
         raise ValueError("ELEVENLABS_API_KEY not set in environment")
     
+    sentences = split_sentences(text) or [text]
+    
     try:
-        audio = generate(
-            text=text,
-            voice=Voice(
-                voice_id=voice_id,
-                settings=VoiceSettings(
-                    stability=0.5,
-                    similarity_boost=0.75,
-                    style=0.0,
-                    use_speaker_boost=True
-                )
-            ),
-            model=model,
-            api_key=settings.ELEVENLABS_API_KEY
-        )
+        async with httpx.AsyncClient(timeout=60) as client:
+            async def synthesize(sentence, previous_text, next_text):
+                return await synthesize_cached(sentence, voice_id, model, previous_text, next_text, client)
+            
+            chunks = await synthesize_sentences(sentences, synthesize)
         
-        # Convert generator to bytes
-        audio_bytes = b"".join(audio)
-        return audio_bytes
+        if len(chunks) == 1:
+            return chunks[0]
+        return await asyncio.to_thread(stitch_audio, chunks)
         
     except Exception as e:
         raise Exception(f"ElevenLabs voice generation failed: {str(e)}")
 
+class SentenceStream:
+    """Accumulates streamed LLM tokens and releases complete sentences"""
+    
+    def __init__(self):
+        self.buffer = ""
+        self.text = ""
+    
+    def feed(self, token: str) -> list[str]:
+        """Add a token; return sentences completed by it (same rules as split_sentences)"""
+        self.buffer += token
+        self.text += token
+        sentences = []
+        while True:
+            match = None
+            for candidate in SENTENCE_BOUNDARY.finditer(self.buffer):
+                if len(self.buffer[:candidate.start()].strip()) >= MIN_SENTENCE_CHARS:
+                    match = candidate
+                    break
+            if not match:
+                return sentences
+            sentences.append(self.buffer[:match.start()].strip())
+            self.buffer = self.buffer[match.end():]
+    
+    def flush(self) -> str | None:
+        """Return whatever is left once the stream ends"""
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+async def synthesize_streamed_text(
+    tokens,
+    voice_id: str = DEFAULT_VOICE_ID,
+    model: str = "eleven_multilingual_v2",
+    synthesize=None,
+    max_words: int | None = None
+) -> dict:
+    """
+    Start TTS for each sentence as soon as the LLM finishes writing it.
+    
+    Args:
+        tokens: Async iterator of text tokens (e.g. astream_reply_tokens)
+        voice_id: ElevenLabs voice ID
+        model: ElevenLabs model
+        synthesize: Optional async (text, previous_text, next_text) -> bytes override
+        max_words: Stop generating once the spoken sentences reach this many words
+        
+    Returns:
+        {"text", "audio", "sentences", "text_done", "audio_ready",
+         "overlapped"} where times are seconds since the call started and
+        overlapped counts sentences whose TTS began before the text finished
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stream = SentenceStream()
+    tasks = []
+    sentences = []
+    spoken_words = 0
+    over_budget = False
+    
+    async with httpx.AsyncClient(timeout=60) as client:
+        if synthesize is None:
+            async def synthesize(sentence, previous_text, next_text):
+                return await synthesize_cached(sentence, voice_id, model, previous_text, next_text, client)
+        
+        def submit(sentence):
+            nonlocal spoken_words, over_budget
+            words = len(sentence.split())
+            # Whole sentences only; the first one always goes through
+            if max_words and sentences and spoken_words + words > max_words:
+                over_budget = True
+                return
+            spoken_words += words
+            previous_text = " ".join(sentences[-2:]) or None
+            sentences.append(sentence)
+            tasks.append(asyncio.create_task(synthesize(sentence, previous_text, None)))
+        
+        try:
+            async for token in tokens:
+                for sentence in stream.feed(token):
+                    submit(sentence)
+                if over_budget:
+                    break
+            if hasattr(tokens, "aclose"):
+                await tokens.aclose()
+            text_done = loop.time() - started
+            overlapped = len(tasks)
+            
+            rest = stream.flush()
+            if rest and not over_budget:
+                submit(rest)
+            
+            chunks = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    
+    if not chunks:
+        raise Exception("LLM returned an empty reply")
+    audio = chunks[0] if len(chunks) == 1 else await asyncio.to_thread(stitch_audio, chunks)
+    
+    return {
+        "text": " ".join(sentences),
+        "audio": audio,
+        "sentences": len(sentences),
+        "text_done": text_done,
+        "audio_ready": loop.time() - started,
+        "overlapped": overlapped
+    }
+
 async def clone_voice_from_sample(
     voice_sample_path: str,
     voice_name: str
@@ -63,7 +453,7 @@ async def clone_voice_from_sample(
     if not settings.ELEVENLABS_API_KEY:
         raise ValueError("ELEVENLABS_API_KEY not set in environment")
     
-    url = "https://api.elevenlabs.io/v1/voices/add"
+    url = f"{settings.ELEVENLABS_API_BASE}/v1/voices/add"
     
     headers = {
         "xi-api-key": settings.ELEVENLABS_API_KEY
@@ -88,12 +478,86 @@ async def clone_voice_from_sample(
             result = response.json()
             return result["voice_id"]
 
+def normalize_voice_sample(
+    voice_sample_path: str,
+    target_dbfs: float = -20.0,
+    frame_rate: int = 44100,
+    silence_threshold: float = -45.0
+) -> str:
+    """
+    Prepare a voice sample for cloning: trim silence, resample and level loudness.
+    
+    Args:
+        voice_sample_path: Path to the uploaded voice sample
+        target_dbfs: Average loudness to normalize to
+        frame_rate: Output sample rate
+        silence_threshold: dBFS below which leading/trailing audio counts as silence
+        
+    Returns:
+        Path to the normalized MP3 written next to the original sample
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+    
+    AudioSegment.converter = settings.FFMPEG_BINARY
+    audio = AudioSegment.from_file(voice_sample_path)
+    
+    start = detect_leading_silence(audio, silence_threshold=silence_threshold)
+    end = detect_leading_silence(audio.reverse(), silence_threshold=silence_threshold)
+    trimmed = audio[start:len(audio) - end]
+    if len(trimmed) > 0:
+        audio = trimmed
+    
+    audio = audio.set_channels(1).set_frame_rate(frame_rate)
+    if audio.dBFS != float("-inf"):
+        audio = audio.apply_gain(target_dbfs - audio.dBFS)
+    
+    source = Path(voice_sample_path)
+    output_path = source.with_name(f"{source.stem}_normalized.mp3")
+    audio.export(output_path, format="mp3", bitrate="128k")
+    return str(output_path)
+
+def transcode_to_voice_note(audio_path: str, bitrate: str = "24k") -> str:
+    """
+    Transcode reply audio to a WhatsApp voice note (OGG/Opus, mono, 16kHz).
+    
+    Args:
+        audio_path: Path to the TTS audio (MP3)
+        bitrate: Opus bitrate; 24k keeps speech clear at a fraction of the MP3 size
+        
+    Returns:
+        Path to the .ogg file written next to the source audio
+    """
+    import ffmpeg
+    
+    output_path = str(Path(audio_path).with_suffix(".ogg"))
+    (
+        ffmpeg.input(audio_path)
+        .output(output_path, acodec="libopus", audio_bitrate=bitrate, ac=1, ar=16000, application="voip")
+        .overwrite_output()
+        .run(cmd=settings.FFMPEG_BINARY, capture_stdout=True, capture_stderr=True)
+    )
+    return output_path
+
+async def delete_voice(voice_id: str) -> None:
+    """Delete a cloned voice from ElevenLabs (frees a voice slot)"""
+    if not settings.ELEVENLABS_API_KEY:
+        raise ValueError("ELEVENLABS_API_KEY not set in environment")
+    
+    url = f"{settings.ELEVENLABS_API_BASE}/v1/voices/{voice_id}"
+    headers = {"xi-api-key": settings.ELEVENLABS_API_KEY}
+    
+    async with httpx.AsyncClient() as client:
+        response = await client.delete(url, headers=headers)
+        if response.status_code not in (200, 404):
+            raise Exception(f"Failed to delete voice: {response.text}")
+
 async def get_available_voices() -> list:
     """Get list of available voices from ElevenLabs"""
     if not settings.ELEVENLABS_API_KEY:
         raise ValueError("ELEVENLABS_API_KEY not set in environment")
     
-    url = "https://api.elevenlabs.io/v1/voices"
+    url = f"{settings.ELEVENLABS_API_BASE}/v1/voices"
     headers = {"xi-api-key": settings.ELEVENLABS_API_KEY}
     
     async with httpx.AsyncClient() as client:
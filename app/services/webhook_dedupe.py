@@ -0,0 +1,44 @@
+"""Idempotent webhook ingestion keyed on Twilio's MessageSid"""
+from app.core.redis_client import get_redis
+
+SEEN_KEY = "vidioagent:webhook:sid:{sid}"
+DUPLICATES_KEY = "vidioagent:stats:duplicate_webhooks"
+
+# Twilio gives up retrying a webhook well within this window
+SEEN_TTL_SECONDS = 60 * 60
+
+def claim_message_sid(message_sid: str) -> bool:
+    """
+    Atomically mark a MessageSid as seen.
+    
+    Returns:
+        True if this is the first delivery, False if it was already claimed.
+        Fails open (True) when Redis is unreachable; the unique constraint on
+        conversations.message_sid still catches the duplicate.
+    """
+    try:
+        return bool(get_redis().set(SEEN_KEY.format(sid=message_sid), 1, nx=True, ex=SEEN_TTL_SECONDS))
+    except Exception as e:
+        print(f"Webhook dedupe unavailable, relying on DB constraint: {e}")
+        return True
+
+def release_message_sid(message_sid: str) -> None:
+    """Forget a claim so Twilio's retry is processed (used when ingestion fails)"""
+    try:
+        get_redis().delete(SEEN_KEY.format(sid=message_sid))
+    except Exception:
+        pass
+
+def record_duplicate() -> None:
+    """Count a rejected duplicate delivery (each one would have been a render)"""
+    try:
+        get_redis().incr(DUPLICATES_KEY)
+    except Exception:
+        pass
+
+def duplicate_count() -> int:
+    """Number of duplicate webhook deliveries rejected so far"""
+    try:
+        return int(get_redis().get(DUPLICATES_KEY) or 0)
+    except Exception:
+        return 0
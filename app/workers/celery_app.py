@@ -1,122 +1,663 @@
+import os
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_init, worker_ready, worker_shutdown
+from kombu import Queue
 from app.core.config import settings
+from app.workers.queues import REPLY_QUEUE, RENDER_QUEUE, VOICE_QUEUE, MAINTENANCE_QUEUE, CAMPAIGN_QUEUE, ALL_QUEUES
 
 celery_app = Celery("vidioagent", broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_RESULT_BACKEND)
 
+# Worker execution profiles. Jobs spend nearly all their time waiting on
+# Groq/ElevenLabs/Replicate/Twilio, so "io" runs many of them as threads in one
+# process instead of one forked process per in-flight job. Each job still gets
+# its own asyncio.run loop, so the async service code is unchanged.
+WORKER_PROFILES = {
+    "io": {
+        "worker_pool": "threads",
+        "worker_concurrency": settings.CELERY_IO_CONCURRENCY,
+    },
+    "prefork": {
+        "worker_pool": "prefork",
+        "worker_concurrency": None,  # one process per CPU
+    },
+}
+
 celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Ack after the job finishes and reserve one job per free slot: a crashed
+    # worker's jobs are redelivered, and long renders never sit prefetched
+    # behind a busy slot while another worker is idle
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Unacked jobs are redelivered after this; must exceed the longest job
+    # (render wait plus retry countdowns)
+    broker_transport_options={"visibility_timeout": 2 * 60 * 60},
+    task_default_queue=REPLY_QUEUE,
+    task_queues=[Queue(name) for name in ALL_QUEUES],
+    task_routes=(
+        # Replies go to their business's shard queue when affinity routing is on
+        "app.services.tenant_affinity.route_task",
+        {
+            "app.workers.celery_app.generate_and_send_video": {"queue": REPLY_QUEUE},
+            "app.workers.celery_app.flush_render_batch": {"queue": RENDER_QUEUE},
+            "app.workers.celery_app.clone_business_voice": {"queue": VOICE_QUEUE},
+            "app.workers.celery_app.render_faq_library": {"queue": RENDER_QUEUE},
+            "app.workers.celery_app.collect_media_garbage": {"queue": MAINTENANCE_QUEUE},
+            "app.workers.celery_app.flush_delivery_events": {"queue": MAINTENANCE_QUEUE},
+            "app.workers.celery_app.prepare_campaign": {"queue": CAMPAIGN_QUEUE},
+            "app.workers.celery_app.render_campaign_greetings": {"queue": CAMPAIGN_QUEUE},
+            "app.workers.celery_app.send_campaign_messages": {"queue": CAMPAIGN_QUEUE},
+        },
+    ),
+    beat_schedule={
+        "collect-media-garbage": {
+            "task": "app.workers.celery_app.collect_media_garbage",
+            "schedule": settings.MEDIA_GC_INTERVAL_SECONDS,
+        },
+        # Safety net: picks up buffered status events whose scheduled flush was lost
+        "flush-delivery-events": {
+            "task": "app.workers.celery_app.flush_delivery_events",
+            "schedule": 60,
+        },
+    },
+    # Tasks are fire-and-forget (ignore_result); expire anything else quickly
+    result_expires=60 * 60,
+    **WORKER_PROFILES.get(settings.CELERY_WORKER_PROFILE, WORKER_PROFILES["io"]),
 )
 
-@celery_app.task(bind=True, max_retries=3)
+# SSL support (important if using Upstash / Railway Redis TLS)
+if settings.CELERY_BROKER_URL.startswith("rediss://"):
+    celery_app.conf.broker_use_ssl = {"ssl_cert_reqs": "required"}
+    celery_app.conf.redis_backend_use_ssl = {"ssl_cert_reqs": "required"}
+
+@worker_init.connect
+def preload_worker_modules(**kwargs):
+    # Runs once per worker before the pool starts: prefork children inherit the
+    # imports, and the "io" profile's threads share them
+    if settings.PRELOAD_HEAVY_MODULES:
+        from app.core.warmup import preload_heavy_modules
+        print(f"Preloaded worker modules: {preload_heavy_modules()}")
+    # Before the pool starts; the SDK restarts its export thread in forked children
+    from app.core.tracing import init_tracing
+    init_tracing("vidioagent-worker")
+
+_affinity_member = None
+_presence = None
+
+@worker_ready.connect
+def join_affinity_ring(sender=None, **kwargs):
+    # Report slots and running jobs for /capacity
+    global _affinity_member, _presence
+    from celery.worker import state as worker_state
+    from app.services.capacity import WorkerPresence
+    _presence = WorkerPresence(
+        sender.hostname,
+        queues=sorted(celery_app.amqp.queues.consume_from),
+        slots=getattr(sender.controller, "concurrency", None) or os.cpu_count(),
+        active_jobs=lambda: len(worker_state.active_requests)
+    )
+    _presence.start()
+    
+    # Only workers consuming the shared replies queue take reply shards
+    if not settings.AFFINITY_ROUTING_ENABLED or REPLY_QUEUE not in celery_app.amqp.queues.consume_from:
+        return
+    from app.services.tenant_affinity import AffinityMember
+    hostname = sender.hostname
+    _affinity_member = AffinityMember(
+        hostname,
+        add_consumer=lambda queue: celery_app.control.add_consumer(queue, destination=[hostname]),
+        cancel_consumer=lambda queue: celery_app.control.cancel_consumer(queue, destination=[hostname])
+    )
+    _affinity_member.start()
+
+@worker_ready.connect
+def prune_local_tts_cache(**kwargs):
+    # The TTS cache is on this host's disk, so every worker prunes its own
+    # (again whenever it opens a new day's bucket)
+    import threading
+    
+    def prune():
+        from app.services.voice import prune_tts_cache
+        try:
+            print(f"TTS cache pruned: {prune_tts_cache()}")
+        except Exception as e:
+            print(f"Failed to prune the TTS cache: {e}")
+    threading.Thread(target=prune, name="tts-cache-prune", daemon=True).start()
+
+@worker_shutdown.connect
+def flush_worker_traces(**kwargs):
+    if _affinity_member:
+        _affinity_member.stop()
+    if _presence:
+        _presence.stop()
+    from app.core.tracing import shutdown_tracing
+    shutdown_tracing()
+
+class _RequestGetter:
+    """Reads trace headers off a Celery task request (custom headers become request attributes)"""
+
+    def get(self, request, key):
+        value = getattr(request, key, None)
+        return [value] if isinstance(value, str) else value
+
+    def keys(self, request):
+        return list(vars(request))
+
+_request_getter = _RequestGetter()
+_task_spans = {}  # task id -> (span, context token), between prerun and postrun
+
+@before_task_publish.connect
+def inject_trace_headers(headers=None, **kwargs):
+    # Publishing from the webhook, a task or a retry: the next task continues this trace
+    if headers is not None:
+        from app.core.tracing import inject_headers
+        inject_headers(headers)
+        # Lets /capacity report how long the oldest waiting job has been queued
+        headers["published_at"] = time.time()
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, kwargs=None, **extra):
+    from app.core.tracing import start_remote_span, tag_trace
+    kwargs = kwargs or {}
+    _task_spans[task_id] = start_remote_span(
+        f"celery.task {task.name.rsplit('.', 1)[-1]}",
+        task.request,
+        getter=_request_getter,
+        **{"celery.task_name": task.name, "celery.task_id": task_id, "celery.retries": task.request.retries or 0}
+    )
+    tag_trace(business_id=kwargs.get("business_id"), conversation_id=kwargs.get("conversation_id"))
+
+@task_postrun.connect
+def end_task_span(task_id=None, state=None, retval=None, **extra):
+    from app.core.tracing import end_remote_span
+    if task_id in _task_spans:
+        current, token = _task_spans.pop(task_id)
+        current.set_attribute("celery.state", state or "")
+        end_remote_span(current, token, error=retval if state == "FAILURE" and isinstance(retval, BaseException) else None)
+
+@celery_app.task(bind=True, max_retries=None, ignore_result=True)
 def generate_and_send_video(
     self,
     conversation_id: int,
     business_id: int,
     customer_phone: str,
-    message_text: str
+    message_text: str,
+    stage_attempts: dict | None = None
 ):
-
-# SSL support (important if using Upstash / Railway Redis TLS)
-    if settings.CELERY_BROKER_URL.startswith("rediss://"):
-        celery_app.conf.broker_use_ssl = {"ssl_cert_reqs": "required"}
-        celery_app.conf.redis_backend_use_ssl = {"ssl_cert_reqs": "required"}
-
-    
     """
     Generate AI video response and send to customer via WhatsApp.
     
     This task:
     1. Gets business profile (voice, avatar)
     2. Generates AI text response
-    3. Generates voice audio from text
-    4. Generates lip-sync video
-    5. Sends video to customer
-    6. Updates conversation status
+    3. Picks video, voice note or text based on backlog and SLA
+    4. Generates voice audio from text
+    5. Generates lip-sync video
+    6. Sends the reply to customer
+    7. Updates conversation status
+    
+    Every stage checkpoints its output on the conversation, so a retry resumes
+    from the first incomplete stage. Retries are budgeted per stage (see
+    STAGE_RETRY_POLICIES); stage_attempts carries the counts between retries.
     """
     from app.db.base import SessionLocal
-    from app.db.models import Business, Conversation
-    from app.agent.graph import app_graph
-    from langchain_core.messages import HumanMessage
-    from app.services.voice import generate_voice_from_text
-    from app.services.video import generate_talking_head_video
-    from app.services.storage import save_audio, get_public_url
-    from app.services.twilio_service import send_whatsapp_media, send_whatsapp_message
-    import asyncio
+    from app.db.models import Conversation
+    from app.services.business_assets import load_business_assets
+    from app.workers.pipeline import run_pipeline, StageError, STAGE_RETRY_POLICIES
+    from app.services.circuit_breaker import ProviderUnavailableError
+    import math
     
     db = SessionLocal()
+    conversation = None
+    stage_attempts = dict(stage_attempts or {})
     
     try:
-        # 1. Get business and conversation
-        business = db.query(Business).filter(Business.id == business_id).first()
+        # 1. Get business (cached on this worker) and conversation
+        assets = load_business_assets(db, business_id)
+        business = assets.business if assets else None
         conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
         
         if not business or not conversation:
             raise Exception("Business or conversation not found")
         
+        if conversation.status == "sent":
+            return {"status": "success", "conversation_id": conversation_id, "skipped": True}
+        
         conversation.status = "processing"
         db.commit()
         
-        # 2. Generate AI response text
-        initial_state = {"messages": [HumanMessage(content=message_text)]}
-        result = app_graph.invoke(initial_state)
-        ai_response = result["messages"][-1].content
+        resume_kwargs = {
+            "conversation_id": conversation_id,
+            "business_id": business_id,
+            "customer_phone": customer_phone,
+            "message_text": message_text,
+            "stage_attempts": stage_attempts
+        }
+        return run_pipeline(db, business, conversation, customer_phone, message_text, resume_kwargs)
+        
+    except StageError as e:
+        # Refused by a breaker or bulkhead before calling the provider: park the
+        # job until it may be let through, without spending its retry budget
+        if isinstance(e.error, ProviderUnavailableError):
+            parks = stage_attempts.get("parked", 0) + 1
+            stage_attempts["parked"] = parks
+            if parks <= settings.BREAKER_MAX_PARKS:
+                countdown = max(1, math.ceil(e.error.retry_after))
+                conversation.status = "parked"
+                conversation.error_message = f"{e} (parked {parks}/{settings.BREAKER_MAX_PARKS}, retry in {countdown}s)"
+                db.commit()
+                raise self.retry(
+                    exc=e.error,
+                    countdown=countdown,
+                    kwargs={**self.request.kwargs, "stage_attempts": stage_attempts}
+                )
+        
+        attempt = stage_attempts.get(e.stage, 0) + 1
+        stage_attempts[e.stage] = attempt
+        policy = STAGE_RETRY_POLICIES[e.stage]
         
-        conversation.ai_response_text = ai_response
+        if attempt > policy.max_retries:
+            conversation.status = "failed"
+            conversation.error_message = str(e)
+            db.commit()
+            raise e.error
+        
+        # Keep the checkpoints; the next attempt resumes at this stage
+        countdown = policy.countdown(attempt)
+        conversation.status = "retrying"
+        conversation.error_message = f"{e} (retry {attempt}/{policy.max_retries} in {countdown}s)"
         db.commit()
         
-        # 3. Generate voice audio
-        # Note: For now using default voice, in production would use cloned voice
-        audio_bytes = asyncio.run(generate_voice_from_text(ai_response))
-        audio_path = asyncio.run(save_audio(audio_bytes))
-        audio_url = get_public_url(audio_path)
+        raise self.retry(
+            exc=e.error,
+            countdown=countdown,
+            kwargs={**self.request.kwargs, "stage_attempts": stage_attempts}
+        )
         
-        # Make audio URL absolute
-        # In production, this would be your deployed backend URL
-        base_url = "http://localhost:8000"  # TODO: Use settings.BASE_URL
-        if not audio_url.startswith("http"):
-            audio_url = f"{base_url}{audio_url}"
+    except Exception as e:
+        # Setup failures (missing rows, DB errors) are not retried per stage
+        if conversation:
+            conversation.status = "failed"
+            conversation.error_message = str(e)
+            db.commit()
+        raise
         
-        # 4. Get avatar URL
-        avatar_url = get_public_url(business.avatar_image_url)
-        if not avatar_url.startswith("http"):
-            avatar_url = f"{base_url}{avatar_url}"
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, max_retries=3, ignore_result=True)
+def clone_business_voice(self, business_id: int):
+    """
+    Clone the business owner's voice once and store the ElevenLabs voice ID.
+    
+    Runs after registration and whenever the voice sample is replaced. The
+    sample's sha256 is stored with the voice ID, so re-running the task for an
+    unchanged sample is a no-op and renders never pay a cloning cost.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import Business
+    from app.services.voice import normalize_voice_sample, clone_voice_from_sample, delete_voice
+    from app.services.business_assets import invalidate_business_assets
+    from app.services.circuit_breaker import PROVIDER_ELEVENLABS, provider_call
+    import asyncio
+    import hashlib
+    
+    db = SessionLocal()
+    
+    try:
+        business = db.query(Business).filter(Business.id == business_id).first()
+        if not business or not business.voice_sample_url:
+            return {"status": "skipped", "business_id": business_id}
         
-        # 5. Generate video
-        video_url = asyncio.run(generate_talking_head_video(audio_url, avatar_url))
+        with open(business.voice_sample_url, "rb") as f:
+            sample_hash = hashlib.sha256(f.read()).hexdigest()
         
-        conversation.video_url = video_url
-        db.commit()
+        if business.elevenlabs_voice_id and business.voice_sample_hash == sample_hash:
+            return {"status": "unchanged", "voice_id": business.elevenlabs_voice_id}
         
-        # 6. Send video to customer
-        send_whatsapp_media(
-            customer_phone,
-            video_url,
-            caption=f"Hi! Here's my response from {business.name}"
-        )
+        normalized_path = normalize_voice_sample(business.voice_sample_url)
+        with provider_call(PROVIDER_ELEVENLABS):
+            voice_id = asyncio.run(clone_voice_from_sample(normalized_path, f"{business.name} ({business.id})"))
         
-        conversation.status = "sent"
-        conversation.sent_at = asyncio.run(asyncio.coroutine(lambda: __import__('datetime').datetime.utcnow())())
+        previous_voice_id = business.elevenlabs_voice_id
+        business.elevenlabs_voice_id = voice_id
+        business.voice_sample_hash = sample_hash
+        business.voice_clone_status = "ready"
         db.commit()
+        invalidate_business_assets(business_id)
         
-        return {
-            "status": "success",
-            "conversation_id": conversation_id,
-            "video_url": video_url
-        }
+        if previous_voice_id and previous_voice_id != voice_id:
+            try:
+                asyncio.run(delete_voice(previous_voice_id))
+            except Exception as e:
+                print(f"Failed to delete old voice {previous_voice_id}: {e}")
+        
+        return {"status": "cloned", "voice_id": voice_id}
         
     except Exception as e:
-        # Update conversation status to failed
-        if conversation:
-            conversation.status = "failed"
-            conversation.error_message = str(e)
+        if self.request.retries >= self.max_retries:
+            business = db.query(Business).filter(Business.id == business_id).first()
+            if business:
+                business.voice_clone_status = "failed"
+                db.commit()
+            raise
+        raise self.retry(exc=e, countdown=30 * (2 ** self.request.retries))
+        
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, ignore_result=True)
+def flush_render_batch(self, avatar_key: str, image_url: str):
+    """
+    Render every pending job for one avatar together and fan the results out.
+    
+    Each conversation's prediction_id is checkpointed as soon as Replicate
+    accepts it, then its video_url once rendered, and its
+    generate_and_send_video task is re-dispatched to resume at delivery.
+    Failed renders are re-dispatched under the render stage's retry policy;
+    only a failed prediction is submitted again, a timed-out one is polled
+    again by the retry. Jobs leave the flush's processing list only once written back, so a
+    redelivered flush resumes them, awaiting predictions already submitted.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import Conversation
+    from app.services.circuit_breaker import PROVIDER_REPLICATE, allow_request, record_result
+    from app.services.render_batcher import drain_batch, finish_job, pending_count, render_batch
+    from app.services.video import PredictionFailedError
+    from app.services.response_policy import record_latency
+    from app.workers.pipeline import STAGE_RENDER, STAGE_RETRY_POLICIES
+    from app.core.tracing import span
+    import asyncio
+    
+    flush_id = self.request.id or "local"
+    jobs = drain_batch(avatar_key, flush_id)
+    if not jobs:
+        return {"status": "empty", "avatar_key": avatar_key}
+    
+    # More jobs than one flush takes: keep draining right away
+    if pending_count(avatar_key):
+        flush_render_batch.delay(avatar_key, image_url)
+    
+    db = SessionLocal()
+    try:
+        # Predictions a crashed run of this flush already submitted are awaited, not paid for twice
+        submitted = dict(db.query(Conversation.id, Conversation.prediction_id).filter(
+            Conversation.id.in_([job["conversation_id"] for job in jobs]),
+            Conversation.prediction_id.isnot(None)
+        ).all())
+    finally:
+        db.close()
+    jobs_to_render = [job | {"prediction_id": submitted[job["conversation_id"]]} if job["conversation_id"] in submitted else job for job in jobs]
+    
+    # Replicate's breaker is open: send the jobs back through the pipeline,
+    # which parks or downgrades them, instead of submitting the whole batch
+    allowed, retry_after = allow_request(PROVIDER_REPLICATE)
+    if not allowed:
+        for job in jobs:
+            generate_and_send_video.apply_async(kwargs=job["task_kwargs"], countdown=max(1, int(retry_after)))
+            finish_job(avatar_key, flush_id, job)
+        return {"status": "circuit_open", "avatar_key": avatar_key, "jobs": len(jobs)}
+    
+    def checkpoint_prediction(conversation_id, prediction_id):
+        checkpoint_db = SessionLocal()
+        try:
+            checkpoint_db.query(Conversation).filter(Conversation.id == conversation_id).update(
+                {Conversation.prediction_id: prediction_id}, synchronize_session=False
+            )
+            checkpoint_db.commit()
+        finally:
+            checkpoint_db.close()
+    
+    with span("render.replicate_batch", avatar_key=avatar_key, jobs=len(jobs)):
+        results = asyncio.run(render_batch(jobs_to_render, image_url, on_submitted=checkpoint_prediction))
+    for result in results.values():
+        record_result(PROVIDER_REPLICATE, "error" not in result)
+    
+    db = SessionLocal()
+    rendered = 0
+    try:
+        for job in jobs:
+            result = results[job["conversation_id"]]
+            conversation = db.query(Conversation).filter(Conversation.id == job["conversation_id"]).first()
+            if not conversation:
+                finish_job(avatar_key, flush_id, job)
+                continue
+            
+            task_kwargs = dict(job["task_kwargs"])
+            if "error" not in result:
+                conversation.prediction_id = result["prediction_id"]
+                conversation.video_url = result["video_url"]
+                db.commit()
+                record_latency("render", result["seconds"])
+                rendered += 1
+                generate_and_send_video.apply_async(kwargs=task_kwargs)
+                finish_job(avatar_key, flush_id, job)
+                continue
+            
+            attempts = dict(task_kwargs.get("stage_attempts") or {})
+            attempts[STAGE_RENDER] = attempts.get(STAGE_RENDER, 0) + 1
+            policy = STAGE_RETRY_POLICIES[STAGE_RENDER]
+            if isinstance(result["exception"], PredictionFailedError):
+                # The render itself is dead; the next attempt must submit a new one
+                conversation.prediction_id = None
+            else:
+                # Timeouts and poll errors: the prediction may still finish, so the retry resumes polling it
+                conversation.prediction_id = result["prediction_id"]
+            if attempts[STAGE_RENDER] > policy.max_retries:
+                conversation.status = "failed"
+                conversation.error_message = f"render stage failed: {result['error']}"
+                db.commit()
+                finish_job(avatar_key, flush_id, job)
+                continue
+            
+            countdown = policy.countdown(attempts[STAGE_RENDER])
+            conversation.status = "retrying"
+            conversation.error_message = f"render stage failed: {result['error']} (retry {attempts[STAGE_RENDER]}/{policy.max_retries} in {countdown}s)"
+            db.commit()
+            task_kwargs["stage_attempts"] = attempts
+            generate_and_send_video.apply_async(kwargs=task_kwargs, countdown=countdown)
+            finish_job(avatar_key, flush_id, job)
+    finally:
+        db.close()
+    
+    return {"status": "flushed", "avatar_key": avatar_key, "jobs": len(jobs), "rendered": rendered}
+
+@celery_app.task(ignore_result=True)
+def render_faq_library(business_id: int):
+    """
+    Render and index every pending FAQ entry of a business.
+    
+    Queued whenever FAQs are added or re-rendered. Entries are rendered
+    concurrently off the live reply path and only become matchable once
+    their video is stored.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import Business
+    from app.services.faq_library import build_faq_library
+    
+    db = SessionLocal()
+    try:
+        business = db.query(Business).filter(Business.id == business_id).first()
+        if not business:
+            return {"status": "skipped", "business_id": business_id}
+        stats = build_faq_library(db, business)
+    finally:
+        db.close()
+    
+    print(f"FAQ library for business {business_id}: {stats}")
+    return stats
+
+@celery_app.task(ignore_result=True)
+def collect_media_garbage():
+    """
+    Delete expired and over-quota generated media in one bounded batch.
+    
+    Scheduled by celery beat every MEDIA_GC_INTERVAL_SECONDS. A full batch
+    means more files are due, so the next pass is queued straight away.
+    """
+    from app.db.base import SessionLocal
+    from app.services.media_retention import collect_garbage
+    
+    db = SessionLocal()
+    try:
+        stats = collect_garbage(db)
+    finally:
+        db.close()
+    
+    if stats["expired"] + stats["quota"] + stats["postponed"] >= settings.MEDIA_GC_BATCH_SIZE:
+        collect_media_garbage.delay()
+    print(f"Media GC: {stats}")
+    return stats
+
+@celery_app.task(ignore_result=True)
+def flush_delivery_events():
+    """
+    Write buffered Twilio status callbacks to message_deliveries in one batch.
+    
+    Scheduled by the first callback of each DELIVERY_FLUSH_SECONDS window (and
+    by celery beat every minute as a safety net). A failed write puts the
+    events back for the next flush.
+    """
+    from app.db.base import SessionLocal
+    from app.services.delivery_status import drain_events, requeue_events, pending_event_count, apply_events
+    
+    events = drain_events(settings.DELIVERY_FLUSH_BATCH)
+    if not events:
+        return {"status": "empty"}
+    
+    # More events than one flush takes: keep draining right away
+    if pending_event_count():
+        flush_delivery_events.delay()
+    
+    db = SessionLocal()
+    try:
+        messages = apply_events(db, events)
+    except Exception:
+        db.rollback()
+        requeue_events(events)
+        raise
+    finally:
+        db.close()
+    
+    return {"status": "flushed", "events": len(events), "messages": messages}
+
+@celery_app.task(ignore_result=True)
+def prepare_campaign(campaign_id: int, run_id: int):
+    """
+    Generate a campaign's shared script, audio and video and snapshot its recipients.
+    
+    Then starts the greeting render and delivery loops. A refused Replicate
+    call (open breaker) retries after the cooldown; any other failure marks
+    the campaign failed, and resuming it picks up from its checkpoints.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import Business
+    from app.services import campaigns
+    from app.services.circuit_breaker import ProviderUnavailableError
+    import math
+    
+    db = SessionLocal()
+    try:
+        campaign = campaigns.current_run(db, campaign_id, run_id)
+        if not campaign or campaign.status != campaigns.CAMPAIGN_PREPARING:
+            return {"status": "skipped", "campaign_id": campaign_id}
+        business = db.query(Business).filter(Business.id == campaign.business_id).first()
+        
+        try:
+            campaigns.prepare_campaign_media(db, business, campaign)
+        except ProviderUnavailableError as e:
+            prepare_campaign.apply_async(args=[campaign_id, run_id], countdown=max(1, math.ceil(e.retry_after)))
+            return {"status": "parked", "campaign_id": campaign_id}
+        except Exception as e:
+            db.rollback()
+            campaign.status = campaigns.CAMPAIGN_FAILED
+            campaign.error_message = f"preparing failed: {e}"
             db.commit()
+            raise
         
-        # Retry with exponential backoff
-        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        campaign.status = campaigns.CAMPAIGN_RUNNING
+        db.commit()
+    finally:
+        db.close()
+    
+    render_campaign_greetings.delay(campaign_id, run_id)
+    send_campaign_messages.delay(campaign_id, run_id)
+    return {"status": "running", "campaign_id": campaign_id}
+
+@celery_app.task(ignore_result=True)
+def render_campaign_greetings(campaign_id: int, run_id: int):
+    """
+    Render one batch of a campaign's distinct greetings, then queue the next batch.
+    
+    Stops once nothing is pending, the campaign is paused or cancelled, or a
+    newer run took over.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import Business
+    from app.services import campaigns
+    import math
+    
+    db = SessionLocal()
+    try:
+        campaign = campaigns.current_run(db, campaign_id, run_id)
+        if not campaign or campaign.status != campaigns.CAMPAIGN_RUNNING:
+            return {"status": "stopped", "campaign_id": campaign_id}
+        business = db.query(Business).filter(Business.id == campaign.business_id).first()
+        stats = campaigns.render_next_greetings(db, business, campaign)
+    finally:
+        db.close()
+    
+    if stats["retry_after"]:
+        render_campaign_greetings.apply_async(args=[campaign_id, run_id], countdown=max(1, math.ceil(stats["retry_after"])))
+    elif stats["remaining"]:
+        render_campaign_greetings.delay(campaign_id, run_id)
+    print(f"Campaign {campaign_id} greetings: {stats}")
+    return stats
+
+@celery_app.task(ignore_result=True)
+def send_campaign_messages(campaign_id: int, run_id: int):
+    """
+    Send one batch of a campaign's rendered videos, then queue the next batch.
+    
+    While greetings are still rendering it re-checks every
+    CAMPAIGN_POLL_SECONDS; once every recipient is sent or failed the campaign
+    is completed.
+    """
+    from app.db.base import SessionLocal
+    from app.db.models import CampaignRecipient
+    from app.services import campaigns
+    from datetime import datetime
+    import math
+    
+    db = SessionLocal()
+    try:
+        campaign = campaigns.current_run(db, campaign_id, run_id)
+        if not campaign or campaign.status != campaigns.CAMPAIGN_RUNNING:
+            return {"status": "stopped", "campaign_id": campaign_id}
+        stats = campaigns.send_next_batch(db, campaign)
         
+        if stats["retry_after"]:
+            send_campaign_messages.apply_async(args=[campaign_id, run_id], countdown=max(1, math.ceil(stats["retry_after"])))
+        elif stats["sent"] or stats["failed"]:
+            send_campaign_messages.delay(campaign_id, run_id)
+        elif db.query(CampaignRecipient.id).filter(
+            CampaignRecipient.campaign_id == campaign_id,
+            CampaignRecipient.status.in_([campaigns.RECIPIENT_PENDING, campaigns.RECIPIENT_RENDERED])
+        ).first():
+            send_campaign_messages.apply_async(args=[campaign_id, run_id], countdown=settings.CAMPAIGN_POLL_SECONDS)
+        else:
+            campaign.status = campaigns.CAMPAIGN_COMPLETED
+            campaign.completed_at = datetime.utcnow()
+            db.commit()
+            print(f"Campaign {campaign_id} completed")
     finally:
         db.close()
+    
+    return stats
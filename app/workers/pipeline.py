@@ -0,0 +1,530 @@
+"""Checkpointed stages of the reply pipeline run by generate_and_send_video.
+
+Each stage stores its output on the Conversation row before the next stage
+starts. A retried job skips every stage whose checkpoint is already set, so a
+failed Twilio send does not re-run the LLM, re-bill ElevenLabs or re-render
+on Replicate.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.tracing import span
+from app.services.circuit_breaker import PROVIDER_ELEVENLABS, PROVIDER_REPLICATE, CircuitOpenError, circuit_open, provider_call
+from app.services.media_retention import track_media, KIND_AUDIO, KIND_VOICE_NOTE, KIND_PREVIEW
+from app.services import delivery_status
+from app.services.response_policy import choose_response_mode, record_latency, MODE_AUDIO, MODE_TEXT, MODE_FAQ
+
+STAGE_LLM = "llm"
+STAGE_TTS = "tts"
+STAGE_VOICE_NOTE = "voice_note"
+STAGE_PREVIEW = "preview"
+STAGE_RENDER = "render"
+STAGE_DELIVER = "deliver"
+
+# Business.video_render_mode values
+RENDER_LIPSYNC = "lipsync"
+RENDER_PREVIEW_THEN_LIPSYNC = "preview_then_lipsync"
+RENDER_PREVIEW = "preview"
+RENDER_MODES = (RENDER_LIPSYNC, RENDER_PREVIEW_THEN_LIPSYNC, RENDER_PREVIEW)
+
+@dataclass
+class RetryPolicy:
+    max_retries: int
+    base_delay: int  # seconds before the first retry
+    max_delay: int
+
+    def countdown(self, attempt: int) -> int:
+        """Exponential backoff for the given (1-based) attempt"""
+        return min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+
+# Cheap, fast stages retry quickly; renders are slow and billed so they retry less
+STAGE_RETRY_POLICIES = {
+    STAGE_LLM: RetryPolicy(max_retries=3, base_delay=10, max_delay=120),
+    STAGE_TTS: RetryPolicy(max_retries=3, base_delay=20, max_delay=240),
+    STAGE_VOICE_NOTE: RetryPolicy(max_retries=3, base_delay=5, max_delay=60),
+    STAGE_PREVIEW: RetryPolicy(max_retries=2, base_delay=5, max_delay=30),
+    STAGE_RENDER: RetryPolicy(max_retries=2, base_delay=60, max_delay=480),
+    STAGE_DELIVER: RetryPolicy(max_retries=5, base_delay=15, max_delay=300),
+}
+
+class StageError(Exception):
+    """Wraps a failure with the name of the pipeline stage that raised it"""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+        self.error = error
+
+def absolute_url(url: str) -> str:
+    """Prefix a /storage path with the public backend URL"""
+    if url.startswith("http"):
+        return url
+    base_url = settings.BASE_URL or "http://localhost:8000"
+    return f"{base_url.rstrip('/')}{url}"
+
+def mark_first_reply(conversation) -> None:
+    """Record the first useful delivery (time-to-first-reply tracking)"""
+    if not conversation.first_reply_at:
+        conversation.first_reply_at = datetime.utcnow()
+
+def reply_word_budget(business, conversation) -> int | None:
+    """Word budget for spoken replies (None for text replies, which have no duration)"""
+    from app.services.reply_budget import word_budget
+
+    if conversation.response_mode == MODE_TEXT or not business.target_video_seconds:
+        return None
+    return word_budget(business.target_video_seconds, business.elevenlabs_voice_id)
+
+def record_audio_duration(conversation, voice_id: str, audio_bytes: bytes) -> None:
+    """Store predicted vs actual spoken duration and calibrate the voice's speaking rate"""
+    from app.services.reply_budget import audio_duration_seconds, count_words, estimate_spoken_seconds, record_speech_rate
+
+    conversation.predicted_duration_seconds = estimate_spoken_seconds(conversation.ai_response_text, voice_id)
+    try:
+        conversation.audio_duration_seconds = round(audio_duration_seconds(audio_bytes), 2)
+    except Exception as e:
+        print(f"Conversation {conversation.id}: could not measure audio duration: {e}")
+        return
+    record_speech_rate(voice_id, count_words(conversation.ai_response_text), conversation.audio_duration_seconds)
+
+def degrade_for_open_circuit(db, business, conversation, provider: str, fallback_mode: str) -> bool:
+    """
+    Switch the reply away from a provider whose circuit breaker is open.
+    
+    Businesses with adaptive replies get fallback_mode straight away (for
+    Replicate, an already rendered preview is sent as the video instead).
+    Everyone else's job is parked until the breaker lets calls through again.
+    
+    Returns:
+        True if the reply was downgraded, False if the provider is available
+    
+    Raises:
+        CircuitOpenError: the provider is unavailable and the job should park
+    """
+    refused, retry_after = circuit_open(provider)
+    if not refused:
+        return False
+    if not business.adaptive_response_enabled:
+        raise CircuitOpenError(provider, "circuit open", retry_after)
+
+    if provider == PROVIDER_REPLICATE and conversation.preview_video_path:
+        from app.services.storage import get_public_url
+        conversation.video_url = absolute_url(get_public_url(conversation.preview_video_path))
+        conversation.response_mode_reason = f"{provider} circuit open; sent the preview as the video"
+    else:
+        conversation.response_mode = fallback_mode
+        conversation.response_mode_reason = f"{provider} circuit open; downgraded to {fallback_mode}"
+    db.commit()
+    print(f"Conversation {conversation.id}: {conversation.response_mode_reason}")
+    return True
+
+def run_faq_stage(db, business, conversation, message_text: str) -> bool:
+    """
+    Answer from the business's pre-rendered FAQ library if the message matches an entry.
+    
+    On a match the FAQ video becomes the reply (checkpoints: response_mode,
+    ai_response_text, video_url) and only delivery remains. Lookup failures
+    fall through to the generated reply.
+    
+    Returns:
+        True if the conversation will be answered with an FAQ video
+    """
+    from app.db.models import FaqEntry
+    from app.services.faq_library import FAQ_READY, match_faq
+    from app.services.storage import get_public_url
+
+    has_library = db.query(FaqEntry.id).filter(
+        FaqEntry.business_id == business.id,
+        FaqEntry.status == FAQ_READY
+    ).first()
+    if not has_library:
+        return False
+
+    try:
+        match = match_faq(business.id, message_text)
+    except Exception as e:
+        print(f"Conversation {conversation.id}: FAQ lookup failed, generating a reply: {e}")
+        return False
+
+    conversation.faq_similarity = round(match.similarity, 4)
+    entry = None
+    if match.faq_id:
+        entry = db.query(FaqEntry).filter(FaqEntry.id == match.faq_id, FaqEntry.status == FAQ_READY).first()
+    if not entry:
+        db.commit()
+        return False
+
+    conversation.faq_entry_id = entry.id
+    conversation.response_mode = MODE_FAQ
+    conversation.response_mode_reason = f"FAQ #{entry.id} matched at {match.similarity:.2f} in {match.seconds * 1000:.0f}ms"
+    conversation.ai_response_text = entry.answer
+    conversation.video_url = absolute_url(get_public_url(entry.video_path))
+    db.commit()
+    print(f"Conversation {conversation.id}: {conversation.response_mode_reason}")
+    return True
+
+def run_llm_stage(db, business, conversation, message_text: str) -> str:
+    """Generate the AI reply text within the duration budget (checkpoint: ai_response_text)"""
+    from app.agent.graph import app_graph
+    from app.services.reply_budget import enforce_budget
+    from langchain_core.messages import HumanMessage
+
+    if conversation.ai_response_text:
+        return conversation.ai_response_text
+
+    budget = reply_word_budget(business, conversation)
+    initial_state = {"messages": [HumanMessage(content=message_text)]}
+    if budget:
+        initial_state["reply_word_budget"] = budget
+    with span("llm.graph_invoke", reply_word_budget=budget):
+        result = app_graph.invoke(initial_state)
+    reply = result["messages"][-1].content
+    if budget:
+        reply = enforce_budget(reply, budget)
+
+    conversation.ai_response_text = reply
+    db.commit()
+    return conversation.ai_response_text
+
+def run_streaming_reply_stage(db, business, conversation, message_text: str) -> None:
+    """
+    Stream the LLM reply straight into sentence-level TTS (checkpoints: ai_response_text, audio_path).
+    
+    Each sentence is sent to ElevenLabs as soon as the model finishes writing
+    it, so LLM and TTS latency overlap instead of adding up. Generation stops
+    at the sentence that would exceed the word budget.
+    
+    The synthesis runs under ElevenLabs' breaker and bulkhead. A failure of
+    the LLM stream is kept out of the breaker and raised as an LLM stage error.
+    """
+    from app.agent.graph import astream_reply_tokens
+    from app.services.voice import synthesize_streamed_text, DEFAULT_VOICE_ID
+    from app.services.storage import save_audio
+    from langchain_core.messages import HumanMessage
+
+    voice_id = business.elevenlabs_voice_id or DEFAULT_VOICE_ID
+    budget = reply_word_budget(business, conversation)
+    llm_errors = []
+
+    async def reply_tokens():
+        try:
+            async for token in astream_reply_tokens([HumanMessage(content=message_text)], reply_word_budget=budget):
+                yield token
+        except Exception as e:
+            llm_errors.append(e)
+
+    async def synthesize():
+        try:
+            return await synthesize_streamed_text(reply_tokens(), voice_id=voice_id, max_words=budget)
+        except Exception:
+            if not llm_errors:
+                raise
+            return None
+
+    with span("llm.stream_to_tts", voice_id=voice_id, reply_word_budget=budget) as current:
+        with provider_call(PROVIDER_ELEVENLABS):
+            result = asyncio.run(synthesize())
+        if llm_errors:
+            raise StageError(STAGE_LLM, llm_errors[0]) from llm_errors[0]
+        current.set_attribute("sentences", result["sentences"])
+    record_latency("tts", result["audio_ready"] - result["text_done"])
+    print(
+        f"Conversation {conversation.id}: text done {result['text_done']:.1f}s, audio ready "
+        f"{result['audio_ready']:.1f}s, {result['overlapped']}/{result['sentences']} sentences overlapped"
+    )
+
+    conversation.ai_response_text = result["text"]
+    record_audio_duration(conversation, voice_id, result["audio"])
+    conversation.audio_path = asyncio.run(save_audio(result["audio"]))
+    track_media(db, conversation, conversation.audio_path, KIND_AUDIO)
+    db.commit()
+
+def run_tts_stage(db, business, conversation) -> str:
+    """Synthesize and store the reply audio (checkpoint: audio_path)"""
+    from app.services.voice import generate_voice_from_text, DEFAULT_VOICE_ID
+    from app.services.storage import save_audio
+
+    if conversation.audio_path:
+        return conversation.audio_path
+
+    # Cloned once at registration; falls back to the stock voice until ready
+    voice_id = business.elevenlabs_voice_id or DEFAULT_VOICE_ID
+    tts_started = time.monotonic()
+    with span("tts.elevenlabs", voice_id=voice_id), provider_call(PROVIDER_ELEVENLABS):
+        audio_bytes = asyncio.run(generate_voice_from_text(conversation.ai_response_text, voice_id=voice_id))
+    record_latency("tts", time.monotonic() - tts_started)
+    record_audio_duration(conversation, voice_id, audio_bytes)
+
+    conversation.audio_path = asyncio.run(save_audio(audio_bytes))
+    track_media(db, conversation, conversation.audio_path, KIND_AUDIO)
+    db.commit()
+    return conversation.audio_path
+
+def run_voice_note_stage(db, business, conversation, customer_phone: str) -> None:
+    """Send the reply audio as an Opus voice note (checkpoints: voice_note_path, voice_note_sent_at)"""
+    from app.services.voice import transcode_to_voice_note
+    from app.services.storage import get_public_url
+    from app.services.twilio_service import send_whatsapp_media
+
+    if not conversation.voice_note_path:
+        conversation.voice_note_path = transcode_to_voice_note(conversation.audio_path)
+        track_media(db, conversation, conversation.voice_note_path, KIND_VOICE_NOTE)
+        db.commit()
+
+    if conversation.voice_note_sent_at:
+        return
+
+    caption = "" if conversation.response_mode == MODE_AUDIO else "Here's my answer - your video is on its way 🎥"
+    sid = send_whatsapp_media(
+        customer_phone,
+        absolute_url(get_public_url(conversation.voice_note_path)),
+        caption=caption
+    )
+    if conversation.response_mode == MODE_AUDIO:
+        # The voice note is the reply itself
+        conversation.reply_message_sid = sid
+        delivery_status.record_sent(db, conversation.id, sid, delivery_status.KIND_REPLY)
+    else:
+        delivery_status.record_sent(db, conversation.id, sid, delivery_status.KIND_VOICE_NOTE)
+    conversation.voice_note_sent_at = datetime.utcnow()
+    mark_first_reply(conversation)
+    db.commit()
+
+def run_preview_stage(db, business, conversation, customer_phone: str) -> None:
+    """
+    Render the local preview video (checkpoints: preview_video_path, preview_sent_at).
+    
+    In preview-only mode the preview becomes the reply video; otherwise it is
+    sent straight away and the lip-sync render follows.
+    """
+    from app.services.preview import render_preview_video
+    from app.services.storage import get_public_url
+    from app.services.twilio_service import send_whatsapp_media
+
+    if not conversation.preview_video_path:
+        render_started = time.monotonic()
+        conversation.preview_video_path = render_preview_video(
+            conversation.audio_path,
+            business.avatar_image_url,
+            conversation.ai_response_text or ""
+        )
+        record_latency("preview", time.monotonic() - render_started)
+        track_media(db, conversation, conversation.preview_video_path, KIND_PREVIEW)
+        db.commit()
+
+    preview_url = absolute_url(get_public_url(conversation.preview_video_path))
+
+    if business.video_render_mode == RENDER_PREVIEW:
+        if not conversation.video_url:
+            conversation.video_url = preview_url
+            db.commit()
+        return
+
+    if not conversation.preview_sent_at:
+        sid = send_whatsapp_media(
+            customer_phone,
+            preview_url,
+            caption=f"Hi! Here's a quick reply from {business.name} - the full video is on its way"
+        )
+        delivery_status.record_sent(db, conversation.id, sid, delivery_status.KIND_PREVIEW)
+        conversation.preview_sent_at = datetime.utcnow()
+        mark_first_reply(conversation)
+        db.commit()
+
+def run_render_stage(db, business, conversation, resume_kwargs: dict | None = None) -> str | None:
+    """
+    Render the lip-sync video (checkpoints: prediction_id, video_url).
+    
+    With render batching enabled the job is parked in its avatar's batch and
+    None is returned; flush_render_batch fills in video_url and re-dispatches
+    the task, which then resumes at delivery.
+    """
+    from app.services.business_assets import render_source_for
+    from app.services.video import start_talking_head_prediction, wait_for_prediction, PredictionFailedError
+    from app.services.storage import get_public_url
+
+    if conversation.video_url:
+        return conversation.video_url
+
+    source_path = render_source_for(business)
+    avatar_url = absolute_url(get_public_url(source_path))
+    audio_url = absolute_url(get_public_url(conversation.audio_path))
+
+    if settings.RENDER_BATCH_WINDOW_SECONDS > 0 and resume_kwargs is not None and not conversation.prediction_id:
+        from app.services.render_batcher import avatar_key, enqueue_render
+        from app.workers.celery_app import flush_render_batch
+
+        key = avatar_key(source_path)
+        job = {"conversation_id": conversation.id, "audio_url": audio_url, "task_kwargs": resume_kwargs}
+        if enqueue_render(key, job):
+            flush_render_batch.apply_async(args=[key, avatar_url], countdown=settings.RENDER_BATCH_WINDOW_SECONDS)
+        conversation.status = "rendering"
+        db.commit()
+        return None
+
+    render_started = time.monotonic()
+    try:
+        with span("render.replicate", resumed=bool(conversation.prediction_id)), provider_call(PROVIDER_REPLICATE):
+            if not conversation.prediction_id:
+                conversation.prediction_id = asyncio.run(start_talking_head_prediction(audio_url, avatar_url))
+                db.commit()
+            video_url = asyncio.run(wait_for_prediction(conversation.prediction_id))
+    except PredictionFailedError:
+        # The render itself is dead; the next attempt must submit a new one
+        conversation.prediction_id = None
+        db.commit()
+        raise
+    record_latency("render", time.monotonic() - render_started)
+
+    conversation.video_url = video_url
+    db.commit()
+    return video_url
+
+def run_deliver_stage(db, business, conversation, customer_phone: str) -> None:
+    """Send the reply in the chosen format (checkpoint: sent_at)"""
+    from app.services.twilio_service import send_whatsapp_media, send_whatsapp_message
+    from app.services.storage import get_public_url
+
+    if conversation.sent_at:
+        return
+
+    sid = None
+    if conversation.response_mode == MODE_TEXT:
+        sid = send_whatsapp_message(customer_phone, conversation.ai_response_text)
+    elif conversation.response_mode == MODE_AUDIO:
+        # Normally already delivered as a voice note by the voice_note stage
+        if not conversation.voice_note_sent_at:
+            sid = send_whatsapp_media(
+                customer_phone,
+                absolute_url(get_public_url(conversation.audio_path)),
+                caption=f"Hi! Here's a voice note from {business.name}"
+            )
+    else:
+        sid = send_whatsapp_media(
+            customer_phone,
+            conversation.video_url,
+            caption=f"Hi! Here's my response from {business.name}"
+        )
+
+    if sid:
+        conversation.reply_message_sid = sid
+        delivery_status.record_sent(db, conversation.id, sid, delivery_status.KIND_REPLY)
+    conversation.status = "sent"
+    conversation.sent_at = datetime.utcnow()
+    mark_first_reply(conversation)
+    db.commit()
+
+def run_pipeline(
+    db,
+    business,
+    conversation,
+    customer_phone: str,
+    message_text: str,
+    resume_kwargs: dict | None = None
+) -> dict:
+    """
+    Run every stage that has no checkpoint yet, in order.
+    
+    resume_kwargs are the task kwargs used to re-dispatch the job once a
+    batched render completes; without them the render runs inline.
+
+    Raises:
+        StageError: wrapping the first failure, tagged with its stage name
+    """
+    stage = STAGE_LLM
+    try:
+        # A message matching a pre-rendered FAQ skips straight to delivery
+        if conversation.response_mode == MODE_FAQ or (
+            not conversation.response_mode and run_faq_stage(db, business, conversation, message_text)
+        ):
+            stage = STAGE_DELIVER
+            run_deliver_stage(db, business, conversation, customer_phone)
+            return {
+                "status": "success",
+                "conversation_id": conversation.id,
+                "response_mode": conversation.response_mode,
+                "video_url": conversation.video_url
+            }
+
+        # The reply format is decided once; retries keep the original decision
+        if not conversation.response_mode:
+            decision = choose_response_mode(business, conversation)
+            conversation.response_mode = decision.mode
+            conversation.response_mode_reason = decision.reason[:255]
+            db.commit()
+            print(f"Conversation {conversation.id}: responding with {decision.mode} ({decision.reason})")
+
+        # Don't start on a reply that needs ElevenLabs while its breaker is open
+        if conversation.response_mode != MODE_TEXT and not conversation.audio_path:
+            stage = STAGE_TTS
+            degrade_for_open_circuit(db, business, conversation, PROVIDER_ELEVENLABS, MODE_TEXT)
+            stage = STAGE_LLM
+
+        streaming = (
+            settings.STREAMING_TTS_ENABLED
+            and conversation.response_mode != MODE_TEXT
+            and not conversation.ai_response_text
+        )
+        if streaming:
+            stage = STAGE_TTS
+            run_streaming_reply_stage(db, business, conversation, message_text)
+            stage = STAGE_LLM
+        else:
+            run_llm_stage(db, business, conversation, message_text)
+
+        if conversation.response_mode != MODE_TEXT:
+            stage = STAGE_TTS
+            run_tts_stage(db, business, conversation)
+
+        # Audio replies always go out as a voice note; video replies do too when progressive
+        if conversation.response_mode == MODE_AUDIO:
+            stage = STAGE_VOICE_NOTE
+            run_voice_note_stage(db, business, conversation, customer_phone)
+        elif conversation.response_mode != MODE_TEXT and business.progressive_delivery_enabled:
+            stage = STAGE_VOICE_NOTE
+            try:
+                run_voice_note_stage(db, business, conversation, customer_phone)
+            except Exception as e:
+                # The video still follows; don't hold it back for the early voice note
+                print(f"Conversation {conversation.id}: voice note failed, continuing with video: {e}")
+
+        render_mode = business.video_render_mode or RENDER_LIPSYNC
+        if conversation.response_mode not in (MODE_TEXT, MODE_AUDIO) and render_mode != RENDER_LIPSYNC:
+            stage = STAGE_PREVIEW
+            try:
+                run_preview_stage(db, business, conversation, customer_phone)
+            except Exception as e:
+                # The preview is a bonus when the full render follows anyway
+                if render_mode == RENDER_PREVIEW:
+                    raise
+                print(f"Conversation {conversation.id}: preview failed, continuing with lip-sync: {e}")
+
+        if conversation.response_mode not in (MODE_TEXT, MODE_AUDIO) and not conversation.video_url:
+            stage = STAGE_RENDER
+            if degrade_for_open_circuit(db, business, conversation, PROVIDER_REPLICATE, MODE_AUDIO):
+                if conversation.response_mode == MODE_AUDIO:
+                    stage = STAGE_VOICE_NOTE
+                    run_voice_note_stage(db, business, conversation, customer_phone)
+            elif run_render_stage(db, business, conversation, resume_kwargs) is None:
+                return {
+                    "status": "render_batched",
+                    "conversation_id": conversation.id,
+                    "response_mode": conversation.response_mode
+                }
+
+        stage = STAGE_DELIVER
+        run_deliver_stage(db, business, conversation, customer_phone)
+    except StageError:
+        raise
+    except Exception as e:
+        raise StageError(stage, e) from e
+
+    return {
+        "status": "success",
+        "conversation_id": conversation.id,
+        "response_mode": conversation.response_mode,
+        "video_url": conversation.video_url
+    }
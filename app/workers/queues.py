@@ -0,0 +1,23 @@
+"""Celery queue names, kept free of Celery imports so the API can read queue depths cheaply"""
+
+# Customer replies: LLM, TTS, voice notes and delivery. Almost all time is
+# spent waiting on Groq/ElevenLabs/Twilio, so this queue suits the "io" profile.
+REPLY_QUEUE = "replies"
+# Batched lip-sync renders; each flush mostly waits on Replicate predictions
+RENDER_QUEUE = "renders"
+# Voice cloning after registration / sample upload; rare and not latency sensitive
+VOICE_QUEUE = "voice"
+# Periodic housekeeping (media GC, delivery status flushes)
+MAINTENANCE_QUEUE = "maintenance"
+# Broadcast campaign preparation, greeting renders and sends; kept apart so a
+# large campaign never queues ahead of live customer replies
+CAMPAIGN_QUEUE = "campaigns"
+
+ALL_QUEUES = [REPLY_QUEUE, RENDER_QUEUE, VOICE_QUEUE, MAINTENANCE_QUEUE, CAMPAIGN_QUEUE]
+
+# Tenant-affinity shards of REPLY_QUEUE (see services/tenant_affinity.py). Not in
+# ALL_QUEUES: each "replies" worker consumes only the shards it owns on the ring.
+REPLY_SHARD_QUEUE = "replies.shard.{shard}"
+
+def reply_shard_queue(shard: int) -> str:
+    return REPLY_SHARD_QUEUE.format(shard=shard)
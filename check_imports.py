@@ -1,5 +1,15 @@
+import argparse
+import statistics
+import subprocess
 import sys
 
+# Cold-import budgets (seconds, median of fresh interpreters) for the process
+# entry points. Heavy SDKs must stay off these paths; see app/core/warmup.py.
+STARTUP_BUDGETS = {
+    "app.main": 0.9,
+    "app.workers.celery_app": 0.5,
+}
+
 def check_imports():
     required_modules = [
         "fastapi", "uvicorn", "pydantic", "sqlalchemy", "alembic",
@@ -14,12 +24,73 @@ def check_imports():
         except ImportError:
             missing.append(module)
             print(f"[MISSING] {module} NOT found")
-    
+
     if missing:
         print(f"\nMissing {len(missing)} libraries. Please run: pip install -r requirements.txt")
         sys.exit(1)
     else:
         print("\nAll core libraries installed successfully!")
 
+def profile_import(module: str, top: int = 15) -> list[tuple[int, int, str]]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        [(cumulative_us, self_us, module)] sorted by cumulative time
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def measure_import_seconds(module: str, runs: int = 3) -> float:
+    """Median wall time to import a module in a fresh interpreter"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def report_importtime(modules: list[str], top: int):
+    for module in modules:
+        print(f"\n-X importtime for {module} (top {top} by cumulative time)")
+        print(f"{'cumulative':>12} {'self':>10}  module")
+        for cumulative_us, self_us, name in profile_import(module, top):
+            print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+
+def check_startup_budgets() -> bool:
+    print("\nStartup import budgets")
+    ok = True
+    for module, budget in STARTUP_BUDGETS.items():
+        seconds = measure_import_seconds(module)
+        status = "OK" if seconds <= budget else "OVER"
+        ok = ok and seconds <= budget
+        print(f"[{status}] {module}: {seconds:.3f}s (budget {budget:.1f}s)")
+    return ok
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check dependencies and startup import cost")
+    parser.add_argument("--importtime", action="store_true", help="report -X importtime costs for the entry points")
+    parser.add_argument("--budget", action="store_true", help="fail if an entry point exceeds its startup budget")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
     check_imports()
+    if args.importtime:
+        report_importtime(list(STARTUP_BUDGETS), args.top)
+    if args.budget and not check_startup_budgets():
+        sys.exit(1)
@@ -0,0 +1,35 @@
+"""Register media written before retention tracking so the GC can manage it.
+
+Walks storage/audio and storage/videos once. Files still referenced by a
+conversation are indexed under it with their normal retention tier; anything
+else is indexed as an orphan and removed by the next GC pass after a short
+grace period. Safe to re-run: already tracked files are skipped.
+
+    python scripts/backfill_media_index.py --limit 50000
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db.base import SessionLocal
+from app.services.media_retention import index_untracked_media
+from app.services.storage import AUDIO_DIR, VIDEOS_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None, help="stop after indexing this many files")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = index_untracked_media(db, [AUDIO_DIR, VIDEOS_DIR], limit=args.limit)
+    finally:
+        db.close()
+    print(f"Indexed {stats['referenced']} referenced files and {stats['orphans']} orphans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Wall-clock TTS time: one whole-reply request vs sentence-chunked synthesis.
+
+ElevenLabs is replaced by a local fake whose latency grows with text length
+(--ttfb + --per-char seconds); everything else - sentence splitting, the
+concurrency limit, the per-sentence cache and pydub stitching - is the real
+generate_voice_from_text path.
+
+    FFMPEG_BINARY=/path/to/ffmpeg python scripts/bench_chunked_tts.py
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from app.core.config import settings
+from app.services import voice
+
+SENTENCES = [
+    "Thanks so much for reaching out to us today.",
+    "Our fresh bread comes out of the oven every morning at seven.",
+    "A family loaf costs fifteen hundred naira and the small one is eight hundred.",
+    "We also bake meat pies, doughnuts and birthday cakes to order.",
+    "Cake orders need at least two days' notice so we can get everything right.",
+    "You can pay by transfer, card or cash when you pick up.",
+    "Delivery is available within five kilometres for a small fee.",
+    "We're open from nine until six, Monday to Saturday.",
+    "On Sundays we open after church, from one until five.",
+    "If you'd like to place an order, just send the items and the pickup time.",
+    "We'll confirm the total and send our account details.",
+    "Regular customers get a free doughnut with every fifth loaf.",
+    "Our shop is beside the pharmacy on the main road.",
+    "Parking is available right in front of the shop.",
+    "Thank you again, and we look forward to seeing you soon!",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ttfb", type=float, default=0.35, help="fixed request latency (s)")
+    parser.add_argument("--per-char", type=float, default=0.02, help="generation time per character (s)")
+    parser.add_argument("--concurrency", type=int, default=settings.ELEVENLABS_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    settings.ELEVENLABS_MAX_CONCURRENCY = args.concurrency
+    AudioSegment.converter = settings.FFMPEG_BINARY
+
+    async def fake_synthesize_speech(text, voice_id=None, model=None, previous_text=None, next_text=None, client=None):
+        async with voice._tts_slot():
+            await asyncio.sleep(args.ttfb + args.per_char * len(text))
+        tone = Sine(180).to_audio_segment(duration=len(text) * 65).apply_gain(-12)
+        padded = AudioSegment.silent(120) + tone + AudioSegment.silent(200)
+        output = io.BytesIO()
+        padded.export(output, format="mp3")
+        return output.getvalue()
+
+    voice.synthesize_speech = fake_synthesize_speech
+
+    with tempfile.TemporaryDirectory() as tmp:
+        voice.TTS_CACHE_DIR = Path(tmp)
+        print(f"concurrency {args.concurrency}, latency {args.ttfb}s + {args.per_char}s/char")
+        print(f"{'sentences':>9}  {'chars':>5}  {'whole reply':>11}  {'chunked':>8}  {'cached':>7}")
+        for count in (1, 5, 15):
+            text = " ".join(SENTENCES[:count])
+            whole = args.ttfb + args.per_char * len(text)
+
+            started = time.perf_counter()
+            asyncio.run(voice.generate_voice_from_text(text, voice_id=f"bench{count}"))
+            chunked = time.perf_counter() - started
+
+            started = time.perf_counter()
+            asyncio.run(voice.generate_voice_from_text(text, voice_id=f"bench{count}"))
+            cached = time.perf_counter() - started
+
+            print(f"{count:9d}  {len(text):5d}  {whole:10.2f}s  {chunked:7.2f}s  {cached:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Worker time wasted on a failing provider, with and without the circuit breaker.
+
+Simulates a pool of worker threads taking render jobs while the provider
+goes through healthy -> outage (every call hangs until a timeout, then fails)
+-> recovered. Without the breaker every job pays the full timeout during the
+outage; with it, jobs are refused up front once the breaker opens (they would
+be parked or downgraded), and a single half-open probe per cooldown finds the
+recovery. Reports provider calls, slot-seconds spent waiting on failures,
+refused jobs and how long after recovery the breaker closed.
+
+Times are simulated seconds, scaled down by --scale. Needs a reachable Redis
+(defaults to CELERY_BROKER_URL); the breaker key is namespaced per run.
+
+    python scripts/bench_circuit_breaker.py --workers 16 --jobs 600
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.services import circuit_breaker
+from app.services.circuit_breaker import ProviderUnavailableError, provider_call
+
+
+class FlakyProvider:
+    """Answers in `latency` while healthy; hangs for `timeout` then fails during the outage"""
+
+    def __init__(self, started, outage_start, outage_end, latency, timeout, scale):
+        self.started = started
+        self.outage = (outage_start, outage_end)
+        self.latency = latency
+        self.timeout = timeout
+        self.scale = scale
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def now(self):
+        return (time.monotonic() - self.started) / self.scale
+
+    def call(self):
+        with self.lock:
+            self.calls += 1
+        if self.outage[0] <= self.now() < self.outage[1]:
+            time.sleep(self.timeout * self.scale)
+            raise TimeoutError("render timed out")
+        time.sleep(self.latency * self.scale)
+
+
+def run(args, use_breaker: bool, provider_name: str):
+    provider = FlakyProvider(time.monotonic(), args.outage_start, args.outage_end, args.latency, args.timeout, args.scale)
+    stats = {"ok": 0, "failed": 0, "refused": 0, "wasted": 0.0, "closed_at": None}
+    lock = threading.Lock()
+    interval = args.duration / args.jobs
+
+    def job(index):
+        # Jobs arrive at a steady rate over the run
+        delay = index * interval * args.scale - (time.monotonic() - provider.started)
+        if delay > 0:
+            time.sleep(delay)
+        started = time.monotonic()
+        try:
+            if use_breaker:
+                with provider_call(provider_name):
+                    provider.call()
+            else:
+                provider.call()
+            outcome = "ok"
+        except ProviderUnavailableError:
+            outcome = "refused"
+        except TimeoutError:
+            outcome = "failed"
+        elapsed = (time.monotonic() - started) / args.scale
+        with lock:
+            stats[outcome] += 1
+            if outcome == "failed":
+                stats["wasted"] += elapsed
+            if outcome == "ok" and stats["closed_at"] is None and provider.now() > args.outage_end:
+                stats["closed_at"] = provider.now() - args.outage_end
+
+    with ThreadPoolExecutor(args.workers) as pool:
+        list(pool.map(job, range(args.jobs)))
+    stats["calls"] = provider.calls
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=600)
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds over which jobs arrive")
+    parser.add_argument("--outage-start", type=float, default=120)
+    parser.add_argument("--outage-end", type=float, default=360)
+    parser.add_argument("--latency", type=float, default=5, help="healthy call time")
+    parser.add_argument("--timeout", type=float, default=60, help="time a failing call hangs")
+    parser.add_argument("--scale", type=float, default=0.01, help="real seconds per simulated second")
+    args = parser.parse_args()
+
+    try:
+        get_redis().ping()
+    except Exception as e:
+        sys.exit(f"Redis unreachable at {settings.CELERY_BROKER_URL}: {e}")
+
+    # Breaker timings are in real seconds; scale them like the simulation
+    settings.BREAKER_WINDOW_SECONDS = max(1, int(settings.BREAKER_WINDOW_SECONDS * args.scale))
+    settings.BREAKER_COOLDOWN_SECONDS = settings.BREAKER_COOLDOWN_SECONDS * args.scale
+    settings.BREAKER_PROBE_TIMEOUT_SECONDS = max(1, int(args.timeout * 2 * args.scale))
+    settings.BULKHEAD_REPLICATE = args.workers
+    provider_name = f"bench-{uuid.uuid4().hex[:8]}"
+    circuit_breaker._bulkheads[provider_name] = threading.BoundedSemaphore(args.workers)
+
+    print(f"{'':<16} {'calls':>6} {'ok':>5} {'failed':>7} {'refused':>8} {'wasted slot-s':>14} {'recovered after':>16}")
+    for label, use_breaker in (("no breaker", False), ("circuit breaker", True)):
+        stats = run(args, use_breaker, provider_name)
+        recovered = f"{stats['closed_at']:.0f}s" if stats["closed_at"] is not None else "-"
+        print(f"{label:<16} {stats['calls']:>6} {stats['ok']:>5} {stats['failed']:>7} {stats['refused']:>8} "
+              f"{stats['wasted']:>14.0f} {recovered:>16}")
+
+    get_redis().delete(circuit_breaker.BREAKER_KEY.format(provider=provider_name))
+
+
+if __name__ == "__main__":
+    main()
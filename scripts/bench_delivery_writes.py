@@ -0,0 +1,98 @@
+"""Write throughput of Twilio status callbacks: one transaction per callback vs batched upserts.
+
+Generates the callbacks of --messages replies (queued, sent, delivered and,
+for most, read; a few fail), shuffled within each flush window to mimic
+out-of-order arrival. The callbacks are written
+two ways: one apply_events transaction per callback, as a naive endpoint
+would, and one collapsed multi-row upsert per window of --batch events, as
+flush_delivery_events does. Reports callbacks/s and transactions, and checks
+that both end in the same delivery state.
+
+Defaults to a throwaway SQLite file; pass --database-url to measure Postgres.
+
+    python scripts/bench_delivery_writes.py --messages 5000 --batch 500
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import MessageDelivery
+from app.services.delivery_status import apply_events
+
+def make_events(messages: int, batch: int) -> list[dict]:
+    started = datetime(2026, 1, 1)
+    events = []
+    for index in range(messages):
+        sid = f"MM{index:032d}"
+        at = started + timedelta(seconds=index * 0.01)
+        events.append({"message_sid": sid, "status": "queued", "at": at.isoformat()})
+        events.append({"message_sid": sid, "status": "sent", "at": (at + timedelta(seconds=1)).isoformat()})
+        if random.random() < 0.03:
+            events.append({"message_sid": sid, "status": "undelivered", "error_code": "63016", "at": (at + timedelta(seconds=3)).isoformat()})
+            continue
+        events.append({"message_sid": sid, "status": "delivered", "at": (at + timedelta(seconds=2)).isoformat()})
+        if random.random() < 0.7:
+            events.append({"message_sid": sid, "status": "read", "at": (at + timedelta(seconds=30)).isoformat()})
+    # Callbacks race each other: shuffle within each flush window
+    for start in range(0, len(events), batch):
+        window = events[start:start + batch]
+        random.shuffle(window)
+        events[start:start + batch] = window
+    return events
+
+def write(session_factory, events: list[dict], batch: int) -> tuple[float, int]:
+    db = session_factory()
+    transactions = 0
+    started = time.perf_counter()
+    try:
+        for start in range(0, len(events), batch):
+            apply_events(db, events[start:start + batch])
+            transactions += 1
+    finally:
+        db.close()
+    return time.perf_counter() - started, transactions
+
+def final_state(session_factory) -> dict:
+    db = session_factory()
+    try:
+        return {row.message_sid: (row.status, row.delivered_at, row.read_at) for row in db.query(MessageDelivery)}
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=500, help="callbacks per flush")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    events = make_events(args.messages, args.batch)
+    print(f"{len(events)} callbacks for {args.messages} messages")
+    print(f"{'mode':<22} {'seconds':>8} {'callbacks/s':>12} {'transactions':>13}")
+    states = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, batch in (("per-callback", 1), (f"batched ({args.batch})", args.batch)):
+            url = args.database_url or f"sqlite:///{tmp}/{batch}.db"
+            engine = create_engine(url)
+            Base.metadata.drop_all(engine, tables=[MessageDelivery.__table__])
+            Base.metadata.create_all(engine, tables=[MessageDelivery.__table__])
+            session_factory = sessionmaker(bind=engine)
+            seconds, transactions = write(session_factory, events, batch)
+            states.append(final_state(session_factory))
+            print(f"{label:<22} {seconds:>8.2f} {len(events) / seconds:>12.0f} {transactions:>13}")
+            engine.dispose()
+
+    print(f"same final state: {states[0] == states[1]}")
+
+if __name__ == "__main__":
+    main()
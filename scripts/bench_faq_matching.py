@@ -0,0 +1,118 @@
+"""FAQ library match rate and lookup latency.
+
+Indexes a small bakery FAQ into a throwaway chroma directory, then sends it
+labelled customer messages: paraphrases of an FAQ question (should be answered
+from the library) and questions the library can't answer (should fall through
+to a generated reply). For each threshold it reports the match rate,
+correct/wrong matches and false matches on unrelated questions, plus the
+lookup latency distribution: the whole cost of an FAQ reply before the
+Twilio send, versus LLM + TTS + render for a generated one.
+
+Live match rate and reply latency per path are in /whatsapp/stats
+("faq_library").
+
+    python scripts/bench_faq_matching.py --repeat 20 --thresholds 0.75 0.8 0.85 0.9
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+
+FAQS = [
+    "What time do you open?",
+    "Do you deliver?",
+    "How much is a birthday cake?",
+    "Do you have gluten-free bread?",
+    "Where is your shop located?",
+    "Can I order a custom wedding cake?",
+    "Do you accept card payments?",
+    "How far in advance should I order?",
+]
+
+# (message, index of the FAQ it should match, or None if it should not match)
+MESSAGES = [
+    ("what are your opening hours", 0),
+    ("when do you open in the morning?", 0),
+    ("do you do home delivery", 1),
+    ("can you deliver to my house?", 1),
+    ("how much does a birthday cake cost", 2),
+    ("price of a cake for my son's birthday?", 2),
+    ("is there any gluten free bread", 3),
+    ("where are you located", 4),
+    ("what's your address?", 4),
+    ("can you make a wedding cake for us", 5),
+    ("can I pay with my card", 6),
+    ("how early do I need to place an order?", 7),
+    ("my order arrived damaged, I want a refund", None),
+    ("are you hiring bakers?", None),
+    ("do you sell coffee", None),
+    ("can I book the shop for a private event", None),
+]
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="times each message is looked up for latency")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.75, 0.8, 0.85, 0.9])
+    args = parser.parse_args()
+
+    settings.CHROMA_HOST = None
+    settings.CHROMA_PERSIST_DIR = tempfile.mkdtemp(prefix="faq-bench-")
+    from app.services.faq_library import index_faqs, match_faq
+
+    business_id = 1
+    index_faqs(business_id, [SimpleNamespace(id=i + 1, question=q) for i, q in enumerate(FAQS)])
+    match_faq(business_id, "warm up")  # loads the embedding model
+
+    latencies = []
+    similarities = {}
+    for message, _ in MESSAGES:
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            match = match_faq(business_id, message, threshold=1.1)
+            latencies.append((time.perf_counter() - started) * 1000)
+        similarities[message] = match.similarity
+
+    print(f"lookup latency over {len(latencies)} queries ({settings.FAQ_EMBEDDING_PROVIDER} embeddings): "
+          f"p50 {percentile(latencies, 0.5):.1f} ms  p95 {percentile(latencies, 0.95):.1f} ms  "
+          f"p99 {percentile(latencies, 0.99):.1f} ms  mean {statistics.mean(latencies):.1f} ms")
+
+    answerable = [m for m in MESSAGES if m[1] is not None]
+    unanswerable = [m for m in MESSAGES if m[1] is None]
+    print(f"\n{'threshold':>9}  {'match rate':>10}  {'correct':>7}  {'wrong FAQ':>9}  {'false match':>11}")
+    for threshold in args.thresholds:
+        matched = correct = wrong = false_matches = 0
+        for message, expected in MESSAGES:
+            result = match_faq(business_id, message, threshold=threshold)
+            if result.faq_id is None:
+                continue
+            matched += 1
+            if expected is None:
+                false_matches += 1
+            elif result.faq_id == expected + 1:
+                correct += 1
+            else:
+                wrong += 1
+        print(f"{threshold:>9.2f}  {matched / len(MESSAGES):>10.0%}  {correct:>4}/{len(answerable):<2}  "
+              f"{wrong:>9}  {false_matches:>8}/{len(unanswerable):<2}")
+
+    print("\nbest similarity per message:")
+    for message, expected in MESSAGES:
+        label = f"FAQ {expected + 1}" if expected is not None else "none"
+        print(f"  {similarities[message]:.3f}  [{label:>6}]  {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Tail latency and error rate of the LLM router against local fake providers.
+
+Each fake provider is a LangChain chat model that streams a canned reply after
+a sampled time to first token, with an injectable slow tail and error rate
+(raised like a 429). The same request mix is sent through Groq alone and
+through the router (Groq preferred, Anthropic and OpenAI behind it) for a few
+failure scenarios, and end-to-end latency percentiles, failed requests,
+hedges and failovers are compared.
+
+Times are simulated seconds, scaled down by --scale so the run is quick.
+
+    python scripts/bench_llm_router.py --requests 400 --threads 16
+"""
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+from app.core.config import settings
+from app.services.llm import LLMProvider, get_llm
+from app.services.llm_router import reset_router_stats, router_stats
+
+REPLY = "Thanks for reaching out! Our bakery opens at eight and delivers across Lagos every day."
+
+class FakeChatModel(BaseChatModel):
+    """Streams REPLY after a sampled time to first token; fails at error_rate"""
+
+    ttft: float  # typical seconds to first token
+    slow_rate: float = 0.0  # share of requests stuck in the slow tail
+    slow_ttft: float = 0.0
+    error_rate: float = 0.0
+    scale: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if random.random() < self.error_rate:
+            time.sleep(0.05 * self.scale)
+            raise RuntimeError("429 Too Many Requests")
+        slow = random.random() < self.slow_rate
+        time.sleep(random.uniform(0.7, 1.3) * (self.slow_ttft if slow else self.ttft) * self.scale)
+        for word in REPLY.split(" "):
+            time.sleep(0.01 * self.scale)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+SCENARIOS = {
+    "healthy": {"groq": {}},
+    "groq slow tail (4% at 8s)": {"groq": {"slow_rate": 0.04, "slow_ttft": 8.0}},
+    "groq 429s (40%)": {"groq": {"error_rate": 0.4}},
+    "groq down": {"groq": {"error_rate": 1.0}},
+}
+
+BASE = {
+    "groq": {"ttft": 0.3},
+    "anthropic": {"ttft": 0.8},
+    "openai": {"ttft": 0.7},
+}
+
+def fake_providers(scenario: dict, scale: float) -> list[LLMProvider]:
+    providers = []
+    for name in ("groq", "anthropic", "openai"):
+        params = {**BASE[name], **scenario.get(name, {}), "scale": scale}
+        providers.append(LLMProvider(name, f"fake-{name}", "fake-key", lambda t, m, p=params: FakeChatModel(**p)))
+    return providers
+
+def run(llm, requests: int, threads: int, scale: float) -> tuple[list[float], int]:
+    def one(_):
+        started = time.perf_counter()
+        try:
+            llm.invoke([HumanMessage(content="When do you open?")])
+            return (time.perf_counter() - started) / scale, True
+        except Exception:
+            return (time.perf_counter() - started) / scale, False
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(one, range(requests)))
+    return sorted(seconds for seconds, ok in results if ok), sum(1 for _, ok in results if not ok)
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--scale", type=float, default=0.2, help="real seconds per simulated second")
+    args = parser.parse_args()
+    settings.LLM_HEDGE_DEFAULT_SECONDS = 3.0 * args.scale
+    settings.LLM_HEDGE_MIN_SECONDS = 0.5 * args.scale
+
+    print(f"{'scenario':<28} {'path':<7} {'p50':>6} {'p95':>6} {'p99':>6} {'failed':>7} {'hedged':>7} {'failover':>8}")
+    for scenario_name, scenario in SCENARIOS.items():
+        providers = fake_providers(scenario, args.scale)
+        for path, chosen in (("groq", providers[:1]), ("router", providers)):
+            reset_router_stats()
+            latencies, failed = run(get_llm(providers=chosen), args.requests, args.threads, args.scale)
+            stats = router_stats()
+            print(f"{scenario_name:<28} {path:<7} {pct(latencies, 0.5):>6.2f} {pct(latencies, 0.95):>6.2f} "
+                  f"{pct(latencies, 0.99):>6.2f} {failed:>7} {stats['hedged']:>7} {stats['failed_over']:>8}")
+
+if __name__ == "__main__":
+    main()
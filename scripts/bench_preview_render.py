@@ -0,0 +1,69 @@
+"""Render time per second of audio for the local preview engine.
+
+Synthesizes speech-like audio clips and an avatar, renders each with
+render_preview_video and prints wall-clock cost per second of audio.
+
+    FFMPEG_BINARY=/path/to/ffmpeg python scripts/bench_preview_render.py --durations 5 15 30 60
+"""
+import argparse
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.preview import render_preview_video
+
+
+def synth_audio(path: Path, seconds: float, rate: int = 22050):
+    """Syllable-modulated tone, loud enough to drive the waveform meter"""
+    t = np.arange(int(seconds * rate)) / rate
+    syllables = (np.sin(2 * np.pi * 4 * t) > -0.2).astype(np.float32)
+    signal = 0.4 * np.sin(2 * np.pi * 180 * t) * syllables * (0.6 + 0.4 * np.sin(2 * np.pi * 0.3 * t))
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((signal * 32767).astype(np.int16).tobytes())
+
+
+def synth_avatar(path: Path):
+    img = Image.new("RGB", (1024, 1024), (200, 170, 140))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((312, 200, 712, 700), fill=(120, 80, 60))
+    img.save(path, quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[5, 15, 30, 60])
+    args = parser.parse_args()
+
+    caption = ("Thanks for reaching out! Our fresh bread is baked every morning and "
+               "you can pick up your order from nine until six, Monday to Saturday. ") * 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        avatar = tmp / "avatar.jpg"
+        synth_avatar(avatar)
+
+        print(f"{'audio':>7}  {'render':>7}  {'per audio s':>11}  {'size':>8}")
+        for seconds in args.durations:
+            audio = tmp / f"reply_{seconds:g}.wav"
+            synth_audio(audio, seconds)
+            output = tmp / f"preview_{seconds:g}.mp4"
+
+            started = time.perf_counter()
+            render_preview_video(str(audio), str(avatar), caption, str(output))
+            elapsed = time.perf_counter() - started
+
+            print(f"{seconds:6.0f}s  {elapsed:6.2f}s  {elapsed / seconds:10.3f}s  {output.stat().st_size / 1024:6.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
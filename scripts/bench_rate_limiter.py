@@ -0,0 +1,81 @@
+"""Per-request overhead of the Redis token-bucket rate limiter.
+
+Times check_rate_limits with the webhook's two buckets (sender + business)
+against a plain Redis PING on the same connection, so the limiter's cost is
+shown next to the bare network round trip it can't avoid. Also checks that a
+burst from one sender is cut off at RATE_LIMIT_CUSTOMER_BURST while parallel
+threads hammer the same buckets.
+
+Needs a reachable Redis (defaults to CELERY_BROKER_URL).
+
+    python scripts/bench_rate_limiter.py --requests 5000 --threads 8
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.services.rate_limiter import check_rate_limits, webhook_limits
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--senders", type=int, default=1000, help="distinct customers spread over the requests")
+    args = parser.parse_args()
+
+    redis = get_redis()
+    try:
+        redis.ping()
+    except Exception as e:
+        sys.exit(f"Redis unreachable at {settings.CELERY_BROKER_URL}: {e}")
+
+    run = uuid.uuid4().hex[:8]
+    business_id = f"bench-{run}"
+    settings.RATE_LIMIT_BUSINESS_BURST = args.requests * 10
+    counter = iter(range(10 ** 9))
+
+    def limiter_call():
+        check_rate_limits(webhook_limits(business_id, f"sender{next(counter) % args.senders}"))
+
+    limiter_call()  # loads the Lua script
+    ping_p50, ping_p99 = timed(redis.ping, args.requests)
+    limit_p50, limit_p99 = timed(limiter_call, args.requests)
+    print(f"PING          p50 {ping_p50:6.3f} ms  p99 {ping_p99:6.3f} ms")
+    print(f"rate limiter  p50 {limit_p50:6.3f} ms  p99 {limit_p99:6.3f} ms")
+    print(f"overhead over one round trip: p50 {limit_p50 - ping_p50:+.3f} ms")
+
+    # Atomicity: one sender bursting from many threads at once
+    burst_business = f"bench-burst-{run}"
+    with ThreadPoolExecutor(args.threads) as pool:
+        decisions = list(pool.map(
+            lambda _: check_rate_limits(webhook_limits(burst_business, "spammer")).allowed,
+            range(settings.RATE_LIMIT_CUSTOMER_BURST * 4)
+        ))
+    print(f"burst of {len(decisions)} from one sender on {args.threads} threads: "
+          f"{sum(decisions)} allowed (burst {settings.RATE_LIMIT_CUSTOMER_BURST})")
+
+    for key in redis.scan_iter(f"vidioagent:ratelimit:business:bench*{run}*"):
+        redis.delete(key)
+
+
+if __name__ == "__main__":
+    main()
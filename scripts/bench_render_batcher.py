@@ -0,0 +1,133 @@
+"""Throughput of per-avatar render batching against a simulated render backend.
+
+Compares the old path (each job holds a worker slot for its whole render) with
+render_batch (one worker slot flushes a whole avatar group). Both paths render
+from the same prepared avatar, so the difference is the batching alone. The
+simulated backend charges a per-prediction source setup cost plus render time,
+and has its own concurrency limit like a Replicate deployment.
+
+Times are simulated seconds, scaled down by --scale so the run is quick.
+
+    python scripts/bench_render_batcher.py --jobs 200 --avatars 5 --workers 4
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.render_batcher import render_batch
+
+
+class SimulatedBackend:
+    """Replicate-like backend: limited concurrency, setup + render per prediction"""
+
+    def __init__(self, concurrency, setup, render, scale):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.setup = setup
+        self.render = render
+        self.scale = scale
+        self.predictions = {}
+
+    async def submit(self, audio_url, image_url):
+        prediction_id = f"p{len(self.predictions)}"
+        self.predictions[prediction_id] = image_url
+        return prediction_id
+
+    async def wait(self, prediction_id):
+        async with self.slots:
+            await asyncio.sleep((self.setup + self.render * random.uniform(0.8, 1.2)) * self.scale)
+        return f"https://replicate.example/{prediction_id}.mp4"
+
+
+def arrivals(jobs, avatars, burst_seconds, seed):
+    rng = random.Random(seed)
+    return sorted(
+        (rng.uniform(0, burst_seconds), i, f"avatar{rng.randrange(avatars)}")
+        for i in range(jobs)
+    )
+
+
+async def run_isolated(args, backend):
+    """One worker slot per in-flight render"""
+    workers = asyncio.Semaphore(args.workers)
+    start = time.monotonic()
+    latencies = []
+
+    async def job(at, i, avatar):
+        await asyncio.sleep(at * args.scale)
+        arrived = time.monotonic()
+        async with workers:
+            prediction_id = await backend.submit(f"audio{i}", f"{avatar}_render.png")
+            await backend.wait(prediction_id)
+        latencies.append((time.monotonic() - arrived) / args.scale)
+
+    await asyncio.gather(*(job(*a) for a in arrivals(args.jobs, args.avatars, args.burst, args.seed)))
+    return (time.monotonic() - start) / args.scale, latencies
+
+
+async def run_batched(args, backend):
+    """Jobs grouped per avatar for --window seconds, one worker slot per flush"""
+    workers = asyncio.Semaphore(args.workers)
+    pending = {}
+    flushes = []
+    arrived_at = {}
+    latencies = []
+    start = time.monotonic()
+
+    async def flush(avatar):
+        await asyncio.sleep(args.window * args.scale)
+        jobs = pending.pop(avatar)
+        async with workers:
+            await render_batch(jobs, f"{avatar}_render.png", submit=backend.submit, wait=backend.wait)
+        now = time.monotonic()
+        latencies.extend((now - arrived_at[j["conversation_id"]]) / args.scale for j in jobs)
+
+    async def job(at, i, avatar):
+        await asyncio.sleep(at * args.scale)
+        arrived_at[i] = time.monotonic()
+        if avatar not in pending:
+            pending[avatar] = []
+            flushes.append(asyncio.create_task(flush(avatar)))
+        pending[avatar].append({"conversation_id": i, "audio_url": f"audio{i}"})
+
+    await asyncio.gather(*(job(*a) for a in arrivals(args.jobs, args.avatars, args.burst, args.seed)))
+    while flushes:
+        await flushes.pop()
+    return (time.monotonic() - start) / args.scale, latencies
+
+
+def report(name, elapsed, latencies, jobs):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<10} {elapsed:8.0f}s  {jobs / elapsed * 3600:8.0f} renders/h  p50 {p50:6.0f}s  p95 {p95:6.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--avatars", type=int, default=5)
+    parser.add_argument("--burst", type=float, default=120.0, help="arrival window in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Celery worker slots")
+    parser.add_argument("--backend-concurrency", type=int, default=20)
+    parser.add_argument("--setup", type=float, default=5.0, help="source preprocessing per prediction, prepared 512px image")
+    parser.add_argument("--render", type=float, default=45.0)
+    parser.add_argument("--window", type=float, default=2.0)
+    parser.add_argument("--scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.jobs} renders, {args.avatars} avatars over {args.burst:.0f}s, "
+          f"{args.workers} worker slots, backend concurrency {args.backend_concurrency}")
+    for name, runner in (("isolated", run_isolated), ("batched", run_batched)):
+        backend = SimulatedBackend(args.backend_concurrency, args.setup, args.render, args.scale)
+        elapsed, latencies = asyncio.run(runner(args, backend))
+        report(name, elapsed, latencies, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""End-to-end "audio ready" time: sequential LLM -> TTS vs pipelined streaming.
+
+The LLM is a fake token stream (--ttft, --tokens-per-second) and ElevenLabs
+is a fake whose latency grows with text length. The sequential path waits
+for the full reply and then runs generate_voice_from_text; the pipelined path
+feeds the token stream to synthesize_streamed_text.
+
+    FFMPEG_BINARY=/path/to/ffmpeg python scripts/bench_streaming_tts.py
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("ELEVENLABS_API_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from app.core.config import settings
+from app.services import voice
+
+REPLY = (
+    "Thanks so much for reaching out to us today. Our fresh bread comes out of the oven "
+    "every morning at seven. A family loaf costs fifteen hundred naira and the small one "
+    "is eight hundred. We also bake meat pies, doughnuts and birthday cakes to order. "
+    "Cake orders need at least two days' notice so we can get everything right. "
+    "You can pay by transfer, card or cash when you pick up. "
+    "Thank you again, and we look forward to seeing you soon!"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ttft", type=float, default=0.3, help="LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, nargs="+", default=[40, 120, 275])
+    parser.add_argument("--tts-ttfb", type=float, default=0.35)
+    parser.add_argument("--tts-per-char", type=float, default=0.02)
+    args = parser.parse_args()
+
+    AudioSegment.converter = settings.FFMPEG_BINARY
+    tokens = [w + " " for w in REPLY.split(" ")]
+
+    async def fake_synthesize_speech(text, voice_id=None, model=None, previous_text=None, next_text=None, client=None):
+        async with voice._tts_slot():
+            await asyncio.sleep(args.tts_ttfb + args.tts_per_char * len(text))
+        output = io.BytesIO()
+        Sine(180).to_audio_segment(duration=len(text) * 65).apply_gain(-12).export(output, format="mp3")
+        return output.getvalue()
+
+    voice.synthesize_speech = fake_synthesize_speech
+
+    async def token_stream(rate):
+        await asyncio.sleep(args.ttft)
+        for token in tokens:
+            await asyncio.sleep(1 / rate)
+            yield token
+
+    async def sequential(rate, voice_id):
+        started = time.perf_counter()
+        text = "".join([t async for t in token_stream(rate)])
+        text_done = time.perf_counter() - started
+        await voice.generate_voice_from_text(text, voice_id=voice_id)
+        return text_done, time.perf_counter() - started
+
+    print(f"{len(tokens)} tokens, {len(voice.split_sentences(REPLY))} sentences, TTS concurrency {settings.ELEVENLABS_MAX_CONCURRENCY}")
+    print(f"{'tok/s':>6}  {'LLM done':>8}  {'sequential':>10}  {'pipelined':>9}  {'overlap':>8}  {'saved':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        voice.TTS_CACHE_DIR = Path(tmp)
+        for rate in args.tokens_per_second:
+            # Distinct voice ids keep the per-sentence cache cold for both runs
+            text_done, seq = asyncio.run(sequential(rate, f"seq{rate}"))
+            result = asyncio.run(voice.synthesize_streamed_text(token_stream(rate), voice_id=f"pipe{rate}"))
+            overlap = f"{result['overlapped']}/{result['sentences']}"
+            print(f"{rate:6.0f}  {text_done:7.2f}s  {seq:9.2f}s  {result['audio_ready']:8.2f}s  {overlap:>8}  {seq - result['audio_ready']:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
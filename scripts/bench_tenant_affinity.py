@@ -0,0 +1,199 @@
+"""Business cache hit rate: shared reply queue vs tenant-affinity routing.
+
+Replays --jobs reply jobs from --businesses businesses with Zipf-distributed
+traffic through a simulated pool of --workers workers, each with an LRU
+business cache of --cache-size entries (as services/business_assets.py keeps).
+Workers serve --capacity jobs per tick; arrivals keep them --load busy.
+
+    shared    every job goes to the one replies queue; any free worker takes it
+    affinity  jobs go to their business's shard (the real shard_for and
+              HashRing), spilling to the shared queue at --spillover waiting
+              jobs; workers drain their own shards before the shared queue
+
+A worker joins a third of the way in and one leaves at two thirds, so the
+affinity numbers include two rebalances. Reports cache hit rate, jobs
+spilled, queue wait and the shards each rebalance moved.
+
+It then times a real cache hit and miss (load_business_assets against
+SQLite, with a prepared avatar) to put the hit rate into time per job. The
+Redis version check is skipped there, as no Redis is assumed.
+
+    python scripts/bench_tenant_affinity.py --workers 8 --businesses 2000 --cache-size 128
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.tenant_affinity import HashRing, shard_for
+
+class Worker:
+    def __init__(self, name: str, cache_size: int):
+        self.name = name
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    def run(self, business_id: int) -> None:
+        if business_id in self.cache:
+            self.cache.move_to_end(business_id)
+            self.hits += 1
+            return
+        self.misses += 1
+        self.cache[business_id] = True
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+def zipf_weights(businesses: int, s: float) -> list[float]:
+    return [1 / (rank ** s) for rank in range(1, businesses + 1)]
+
+def simulate(mode: str, args, arrivals: list[list[int]]) -> dict:
+    workers = {f"w{index}": Worker(f"w{index}", args.cache_size) for index in range(args.workers)}
+    ring = HashRing(workers, args.vnodes)
+    shards = [deque() for _ in range(args.shards)]
+    shared = deque()
+    waits, spilled, moved, retired = [], 0, [], []
+    owned = {name: ring.owned_shards(name, args.shards) for name in workers}
+
+    def rebalance():
+        nonlocal ring, owned
+        new_ring = HashRing(workers, args.vnodes)
+        moved.append(sum(ring.shard_owner(shard) != new_ring.shard_owner(shard) for shard in range(args.shards)))
+        ring, owned = new_ring, {name: new_ring.owned_shards(name, args.shards) for name in workers}
+
+    ticks = len(arrivals)
+    for tick, jobs in enumerate(arrivals):
+        if mode == "affinity" and tick == ticks // 3:
+            workers["joined"] = Worker("joined", args.cache_size)
+            rebalance()
+        elif mode == "affinity" and tick == 2 * ticks // 3:
+            retired.append(workers.pop("w0"))
+            rebalance()
+        elif mode == "shared" and tick == ticks // 3:
+            workers["joined"] = Worker("joined", args.cache_size)
+        elif mode == "shared" and tick == 2 * ticks // 3:
+            retired.append(workers.pop("w0"))
+
+        for business_id in jobs:
+            if mode == "shared":
+                shared.append((business_id, tick))
+                continue
+            queue = shards[shard_for(business_id)]
+            if len(queue) >= args.spillover:
+                shared.append((business_id, tick))
+                spilled += 1
+            else:
+                queue.append((business_id, tick))
+
+        names = list(workers)
+        random.shuffle(names)
+        for name in names:
+            worker = workers[name]
+            for _ in range(args.capacity):
+                job = None
+                for shard in owned.get(name, ()) if mode == "affinity" else ():
+                    if shards[shard]:
+                        job = shards[shard].popleft()
+                        break
+                if job is None and shared:
+                    job = shared.popleft()
+                if job is None:
+                    break
+                worker.run(job[0])
+                waits.append(tick - job[1])
+
+    # The worker that left still counts
+    hits = sum(worker.hits for worker in [*workers.values(), *retired])
+    misses = sum(worker.misses for worker in [*workers.values(), *retired])
+    waits.sort()
+    return {
+        "hit_rate": hits / max(1, hits + misses),
+        "spilled": spilled,
+        "wait_p50": waits[len(waits) // 2] if waits else 0,
+        "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0,
+        "moved": moved,
+    }
+
+def time_cache(samples: int) -> tuple[float, float]:
+    """Microseconds per load_business_assets hit and miss"""
+    from PIL import Image
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.db.base import Base
+    from app.db.models import Business
+    from app.services import business_assets
+
+    business_assets._version = lambda business_id: None
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine, tables=[Business.__table__])
+        avatar = Path(tmp) / "avatar.png"
+        Image.new("RGB", (1024, 1024), "white").save(avatar)
+        db = sessionmaker(bind=engine)()
+        business = Business(name="Bench", whatsapp_number="+10000000000", avatar_image_url=str(avatar))
+        db.add(business)
+        db.commit()
+        business_id = business.id
+        business_assets.load_business_assets(db, business_id)  # prepares the avatar once
+
+        started = time.perf_counter()
+        for _ in range(samples):
+            business_assets.load_business_assets(db, business_id)
+        hit = (time.perf_counter() - started) / samples * 1e6
+
+        started = time.perf_counter()
+        for _ in range(samples):
+            business_assets._entries.clear()
+            business_assets.load_business_assets(db, business_id)
+        miss = (time.perf_counter() - started) / samples * 1e6
+        db.close()
+        engine.dispose()
+    return hit, miss
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--businesses", type=int, default=2000)
+    parser.add_argument("--jobs", type=int, default=200_000)
+    parser.add_argument("--cache-size", type=int, default=128)
+    parser.add_argument("--zipf", type=float, default=1.1, help="traffic skew across businesses")
+    parser.add_argument("--capacity", type=int, default=4, help="jobs per worker per tick")
+    parser.add_argument("--load", type=float, default=0.8, help="arrivals as a share of total capacity")
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--vnodes", type=int, default=64)
+    parser.add_argument("--spillover", type=int, default=4, help="waiting jobs per shard before spilling (about one round of a worker's slots)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--samples", type=int, default=2000, help="timed cache hits and misses")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    weights = zipf_weights(args.businesses, args.zipf)
+    per_tick = args.workers * args.capacity * args.load
+    jobs = random.choices(range(1, args.businesses + 1), weights=weights, k=args.jobs)
+    arrivals, index = [], 0
+    while index < len(jobs):
+        count = int(per_tick) + (random.random() < per_tick % 1)
+        arrivals.append(jobs[index:index + count])
+        index += count
+
+    print(f"{args.jobs} jobs, {args.businesses} businesses (zipf {args.zipf}), {args.workers} workers, cache {args.cache_size}")
+    print(f"{'mode':<10} {'hit rate':>9} {'spilled':>8} {'wait p50':>9} {'wait p95':>9}  shards moved (join, leave)")
+    rates = {}
+    for mode in ("shared", "affinity"):
+        result = simulate(mode, args, arrivals)
+        rates[mode] = result["hit_rate"]
+        moved = ", ".join(str(count) for count in result["moved"]) or "-"
+        print(f"{mode:<10} {rates[mode]:>9.1%} {result['spilled']:>8} {result['wait_p50']:>9} {result['wait_p95']:>9}  {moved}")
+
+    hit_us, miss_us = time_cache(args.samples)
+    print(f"\nload_business_assets: hit {hit_us:.0f}us, miss {miss_us:.0f}us")
+    for mode, rate in rates.items():
+        print(f"{mode:<10} {rate * hit_us + (1 - rate) * miss_us:>8.0f}us per job on business loads")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Per-message CPU overhead of tracing at different sample ratios.
+
+Replays the span shape of one message end to end: the webhook span, trace
+context injected into task headers and extracted by the worker, the task span
+and its children (LLM, TTS, storage write, render, Twilio sends), each tagged
+with business_id and conversation_id. The provider calls themselves are
+skipped, so the time per message is the tracing cost alone.
+
+Each configuration runs in its own process (a tracer provider is installed
+once per process) with the file exporter writing to a temporary file, and
+reports microseconds per message and spans exported.
+
+    python scripts/bench_tracing_overhead.py --messages 20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CONFIGS = (
+    ("disabled", {"OTEL_ENABLED": "false"}),
+    ("ratio 0", {"OTEL_ENABLED": "true", "OTEL_SAMPLE_RATIO": "0"}),
+    ("ratio 0.01", {"OTEL_ENABLED": "true", "OTEL_SAMPLE_RATIO": "0.01"}),
+    ("ratio 0.1", {"OTEL_ENABLED": "true", "OTEL_SAMPLE_RATIO": "0.1"}),
+    ("ratio 1.0", {"OTEL_ENABLED": "true", "OTEL_SAMPLE_RATIO": "1.0"}),
+)
+
+class Request:
+    """Stands in for a Celery task request: propagated headers become attributes"""
+
+    def __init__(self, headers: dict):
+        self.__dict__.update(headers)
+
+def run_worker(messages: int) -> dict:
+    from app.core.tracing import init_tracing, shutdown_tracing, span, tag_trace, inject_headers, start_remote_span, end_remote_span
+    from app.workers.celery_app import _request_getter
+
+    init_tracing("bench")
+    started = time.perf_counter()
+    for index in range(messages):
+        headers = {}
+        with span("whatsapp.webhook", message_sid=f"SM{index}"):
+            tag_trace(business_id=index % 50)
+            tag_trace(conversation_id=index)
+            with span("twilio.send_message"):
+                pass
+            inject_headers(headers)
+
+        current, token = start_remote_span("celery.task generate_and_send_video", Request(headers), getter=_request_getter)
+        tag_trace(business_id=index % 50, conversation_id=index)
+        with span("llm.graph_invoke"):
+            pass
+        with span("tts.elevenlabs"):
+            pass
+        with span("storage.write", bytes=48_000):
+            pass
+        with span("render.replicate"):
+            pass
+        with span("twilio.send_media") as send:
+            send.set_attribute("message_sid", f"MM{index}")
+        end_remote_span(current, token)
+    elapsed = time.perf_counter() - started
+    shutdown_tracing()
+    return {"us_per_message": elapsed / messages * 1e6}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.messages)))
+        return
+
+    print(f"{'config':<12} {'us/message':>11} {'overhead':>9} {'spans exported':>15}")
+    baseline = None
+    for label, env in CONFIGS:
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_file = Path(tmp) / "traces.jsonl"
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", "--messages", str(args.messages)],
+                env={**os.environ, **env, "OTEL_EXPORTER": "file", "OTEL_FILE_PATH": str(trace_file)},
+                cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            spans = sum(1 for _ in open(trace_file)) if trace_file.exists() else 0
+        baseline = baseline or result["us_per_message"]
+        print(f"{label:<12} {result['us_per_message']:>11.1f} {result['us_per_message'] - baseline:>+9.1f} {spans:>15}")
+
+if __name__ == "__main__":
+    main()
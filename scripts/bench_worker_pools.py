@@ -0,0 +1,169 @@
+"""Concurrent in-flight jobs per GB of RAM for the prefork and "io" (threads) worker profiles.
+
+Starts a real Celery worker from app.workers.celery_app (with the heavy SDKs
+preloaded by worker_init, as in production) on a local filesystem broker, fills
+every slot with a job that holds a small working set while it waits on a
+simulated provider call, and measures the proportional set size (PSS) of the
+worker and all of its pool processes while the jobs are in flight. PSS splits
+copy-on-write pages between the forked children, so the comparison is fair to
+prefork.
+
+Linux only (reads /proc).
+
+    python scripts/bench_worker_pools.py --configs prefork:4 prefork:8 threads:32 threads:64
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from celery.signals import worker_ready
+
+from app.workers.celery_app import celery_app
+from app.workers.queues import REPLY_QUEUE
+
+PROFILES = {"prefork": "prefork", "threads": "io"}
+DATA_DIR = Path(os.environ.get("BENCH_WORKER_DIR", tempfile.gettempdir())) / "vidioagent_bench_worker_pools"
+
+
+def configure(data_dir: Path):
+    broker = data_dir / "broker"
+    broker.mkdir(parents=True, exist_ok=True)
+    (data_dir / "running").mkdir(exist_ok=True)
+    celery_app.conf.update(
+        broker_url="filesystem://",
+        broker_transport_options={
+            "data_folder_in": str(broker),
+            "data_folder_out": str(broker),
+            # Exchange bindings (remote control, queue declarations); kombu defaults to ./control
+            "control_folder": str(broker / "control"),
+            "polling_interval": 0.1,
+        },
+        result_backend=None,
+    )
+
+
+@celery_app.task(name="bench.simulated_reply", ignore_result=True)
+def simulated_reply(job_id: int, hold_seconds: float, working_set_kb: int):
+    """Hold a reply-sized working set while waiting on a provider, like an LLM/TTS/render wait"""
+    marker = DATA_DIR / "running" / str(job_id)
+    buffer = bytearray(os.urandom(working_set_kb * 1024))
+    marker.touch()
+    try:
+        asyncio.run(asyncio.sleep(hold_seconds))
+    finally:
+        marker.unlink()
+    return len(buffer)
+
+
+@worker_ready.connect
+def mark_ready(**kwargs):
+    (DATA_DIR / "ready").touch()
+
+
+def pss_kb(pid: int) -> int:
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(root: int) -> list[int]:
+    parents = {}
+    for entry in Path("/proc").iterdir():
+        if entry.name.isdigit():
+            try:
+                stat = (entry / "stat").read_text()
+                parents[int(entry.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree = [root]
+    for pid in tree:
+        tree.extend(child for child, parent in parents.items() if parent == pid)
+    return tree
+
+
+def run_worker(concurrency: int):
+    # The pool itself comes from CELERY_WORKER_PROFILE, exactly as in production
+    configure(DATA_DIR)
+    celery_app.worker_main([
+        "worker", "-c", str(concurrency), "-Q", REPLY_QUEUE,
+        "--loglevel=WARNING", "--without-heartbeat", "--without-mingle", "--without-gossip",
+    ])
+
+
+def measure(pool: str, concurrency: int, args) -> dict:
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+    configure(DATA_DIR)
+
+    worker = subprocess.Popen(
+        [sys.executable, __file__, "--worker", str(concurrency)],
+        env={**os.environ, "BENCH_WORKER_DIR": str(DATA_DIR.parent), "CELERY_WORKER_PROFILE": PROFILES[pool]},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 120
+        while not (DATA_DIR / "ready").exists():
+            if worker.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"{pool} worker failed to start")
+            time.sleep(0.2)
+
+        for job_id in range(concurrency):
+            simulated_reply.apply_async(args=[job_id, args.hold, args.working_set_kb], queue=REPLY_QUEUE)
+
+        deadline = time.monotonic() + args.hold * 0.8
+        in_flight = 0
+        while time.monotonic() < deadline:
+            in_flight = max(in_flight, len(list((DATA_DIR / "running").iterdir())))
+            if in_flight >= concurrency:
+                break
+            time.sleep(0.1)
+        time.sleep(0.5)
+        pids = process_tree(worker.pid)
+        total_kb = sum(pss_kb(pid) for pid in pids)
+    finally:
+        worker.send_signal(signal.SIGTERM)
+        try:
+            worker.wait(timeout=args.hold + 30)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    return {"processes": len(pids), "in_flight": in_flight, "pss_mb": total_kb / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", nargs="+", default=["prefork:4", "prefork:8", "threads:32", "threads:64"],
+                        help="pool:concurrency pairs")
+    parser.add_argument("--hold", type=float, default=15.0, help="seconds each job waits on its simulated provider")
+    parser.add_argument("--working-set-kb", type=int, default=512, help="per-job buffers (reply text, audio chunks)")
+    parser.add_argument("--worker", type=int, metavar="CONCURRENCY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    print(f"{'pool':<9} {'slots':>5} {'in-flight':>9} {'procs':>5} {'PSS MB':>8} {'MB/job':>7} {'jobs/GB':>8}")
+    for config in args.configs:
+        pool, concurrency = config.split(":")
+        result = measure(pool, int(concurrency), args)
+        per_job = result["pss_mb"] / max(1, result["in_flight"])
+        print(f"{pool:<9} {concurrency:>5} {result['in_flight']:>9} {result['processes']:>5} "
+              f"{result['pss_mb']:8.0f} {per_job:7.1f} {1024 / per_job:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
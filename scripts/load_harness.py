@@ -0,0 +1,628 @@
+"""End-to-end capacity-planning load harness with simulated provider latency.
+
+Runs the real stack:
+- the FastAPI app under uvicorn
+- N real Celery workers
+- the actual pipeline code
+
+Groq, ElevenLabs, Replicate and Twilio are replaced by one local fake server.
+Each fake provider answers with a configurable log-normal latency (median and
+p95) and error rate. The harness then:
+1. registers --businesses synthetic businesses through /api/business/register
+2. replays an arrival process (poisson, uniform or burst) against /whatsapp/webhook
+3. waits for the replies to drain
+4. reports throughput, queue wait, time to first reply and end-to-end
+   percentiles, worker slot-seconds per message, and the workers needed for
+   --target-per-hour
+
+Everything runs in a scratch directory with its own SQLite database (or
+--database-url). With --broker-url redis://... the workers use a real Redis
+broker, so the Redis-backed features (dedupe, latency samples, render batching)
+are exercised as well. The default filesystem broker needs no Redis, and those
+features fail open as they would in a Redis outage.
+
+    FFMPEG_BINARY=/path/to/ffmpeg python scripts/load_harness.py --businesses 10 --rate 3600 --duration 120 --workers 2 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+QUESTIONS = [
+    "What are your opening hours this weekend?",
+    "How much does a custom birthday cake cost?",
+    "Do you deliver to Lekki and how long does it take?",
+    "Can I book an appointment for tomorrow afternoon?",
+    "What payment methods do you accept?",
+    "Do you have anything gluten free?",
+]
+
+REPLY_SENTENCE = (
+    "Thanks so much for reaching out to us today, we really appreciate it. "
+    "We are open from nine in the morning until seven in the evening. "
+    "Delivery usually takes between one and two hours depending on traffic. "
+    "You can pay by card, bank transfer or cash on delivery. "
+)
+
+
+def lognormal(rng: random.Random, median: float, p95: float) -> float:
+    """Sample a latency with the given median and 95th percentile"""
+    if p95 <= median:
+        return median
+    sigma = math.log(p95 / median) / 1.645
+    return median * math.exp(rng.gauss(0, sigma))
+
+
+def distribution(value: str) -> tuple[float, float]:
+    median, p95 = (float(v) for v in value.split(","))
+    return median, p95
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---------------------------------------------------------------------------
+# Fake providers
+# ---------------------------------------------------------------------------
+
+class FakeProviders:
+    """Groq, ElevenLabs, Replicate and Twilio look-alikes with injected latency and errors"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.stats = {}
+        self.predictions = {}
+        self.mp3_cache = {}
+        self.mp3_lock = threading.Lock()
+
+    def _record(self, provider: str, seconds: float, error: bool):
+        stat = self.stats.setdefault(provider, {"calls": 0, "errors": 0, "seconds": 0.0})
+        stat["calls"] += 1
+        stat["errors"] += int(error)
+        stat["seconds"] += seconds
+
+    async def _delay(self, provider: str, dist: tuple[float, float], error_rate: float) -> bool:
+        """Sleep for a sampled latency; returns True if this call should fail"""
+        seconds = lognormal(self.rng, *dist) * self.args.latency_scale
+        error = self.rng.random() < error_rate
+        self._record(provider, seconds, error)
+        await asyncio.sleep(seconds)
+        return error
+
+    def _mp3(self, seconds: int) -> bytes:
+        from app.core.config import settings
+
+        with self.mp3_lock:
+            if seconds not in self.mp3_cache:
+                self.mp3_cache[seconds] = subprocess.run(
+                    [settings.FFMPEG_BINARY, "-v", "error", "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+                     "-ac", "1", "-b:a", "32k", "-f", "mp3", "pipe:1"],
+                    capture_output=True, check=True
+                ).stdout
+            return self.mp3_cache[seconds]
+
+    def _reply_words(self, max_tokens) -> list[str]:
+        words = (REPLY_SENTENCE * 10).split()
+        limit = self.args.reply_words
+        if max_tokens:
+            limit = min(limit, int(max_tokens * 0.75))
+        return words[:max(5, limit)]
+
+    def build_app(self):
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+        app = FastAPI()
+        args = self.args
+
+        @app.post("/groq/openai/v1/chat/completions")
+        async def groq_chat(request: Request):
+            body = await request.json()
+            words = self._reply_words(body.get("max_tokens"))
+            if await self._delay("groq", args.groq_ttft, args.groq_errors):
+                return JSONResponse({"error": {"message": "simulated failure", "type": "server_error"}}, status_code=500)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            token_delay = args.latency_scale / args.groq_tokens_per_second
+
+            if not body.get("stream"):
+                await asyncio.sleep(token_delay * len(words))
+                return {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                                 "message": {"role": "assistant", "content": " ".join(words)}}],
+                    "usage": {"prompt_tokens": 50, "completion_tokens": len(words), "total_tokens": 50 + len(words)},
+                }
+
+            async def stream():
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                        "choices": [{"index": 0, "finish_reason": None, "logprobs": None,
+                                     "delta": {"role": "assistant", "content": word if i == 0 else f" {word}"}}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(token_delay)
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None, "delta": {}}],
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        @app.post("/elevenlabs/v1/text-to-speech/{voice_id}")
+        async def elevenlabs_tts(voice_id: str, request: Request):
+            body = await request.json()
+            if await self._delay("elevenlabs", args.tts, args.tts_errors):
+                return JSONResponse({"detail": {"status": "simulated_failure"}}, status_code=500)
+            seconds = max(1, round(len(body["text"].split()) / 2.5))
+            audio = await asyncio.to_thread(self._mp3, seconds)
+            return Response(audio, media_type="audio/mpeg")
+
+        @app.post("/elevenlabs/v1/voices/add")
+        async def elevenlabs_clone():
+            if await self._delay("elevenlabs_clone", args.clone, 0.0):
+                return JSONResponse({"detail": "simulated failure"}, status_code=500)
+            return {"voice_id": f"fake-{uuid.uuid4().hex[:12]}"}
+
+        @app.delete("/elevenlabs/v1/voices/{voice_id}")
+        async def elevenlabs_delete(voice_id: str):
+            return {"status": "ok"}
+
+        @app.post("/replicate/v1/predictions")
+        async def replicate_create(request: Request):
+            body = await request.json()
+            if await self._delay("replicate", args.replicate_api, args.render_errors):
+                return JSONResponse({"detail": "simulated failure"}, status_code=500)
+            prediction_id = uuid.uuid4().hex[:20]
+            render_seconds = lognormal(self.rng, *args.render) * args.latency_scale
+            self.predictions[prediction_id] = (time.monotonic(), render_seconds, self.rng.random() < args.render_errors)
+            self._record("replicate_render", render_seconds, self.predictions[prediction_id][2])
+            return JSONResponse(self._prediction(prediction_id, body.get("version"), body.get("input")), status_code=201)
+
+        @app.get("/replicate/v1/predictions/{prediction_id}")
+        async def replicate_get(prediction_id: str):
+            if prediction_id not in self.predictions:
+                return JSONResponse({"detail": "Not found."}, status_code=404)
+            return self._prediction(prediction_id)
+
+        @app.post("/twilio/2010-04-01/Accounts/{account_sid}/Messages.json")
+        async def twilio_send(account_sid: str, request: Request):
+            form = await request.form()
+            if await self._delay("twilio", args.twilio, args.twilio_errors):
+                return JSONResponse({"code": 20500, "message": "simulated failure", "status": 500}, status_code=500)
+            sid = f"SM{uuid.uuid4().hex}"
+            return JSONResponse({
+                "sid": sid, "account_sid": account_sid, "status": "queued", "direction": "outbound-api",
+                "from": form.get("From"), "to": form.get("To"), "body": form.get("Body"),
+                "num_media": "1" if form.get("MediaUrl") else "0", "num_segments": "1",
+                "date_created": datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S +0000"),
+                "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+            }, status_code=201)
+
+        return app
+
+    def _prediction(self, prediction_id: str, version: str | None = None, prediction_input: dict | None = None) -> dict:
+        started, render_seconds, fails = self.predictions[prediction_id]
+        elapsed = time.monotonic() - started
+        status, output, error = "processing", None, None
+        if elapsed < min(1.0, render_seconds):
+            status = "starting"
+        elif elapsed >= render_seconds:
+            status = "failed" if fails else "succeeded"
+            error = "simulated failure" if fails else None
+            output = None if fails else f"{self.base_url}/replicate/output/{prediction_id}.mp4"
+        return {
+            "id": prediction_id, "model": "cjwbw/sadtalker", "version": version or "fake", "status": status,
+            "input": prediction_input or {}, "output": output, "error": error, "logs": "", "metrics": {},
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "urls": {"get": f"{self.base_url}/replicate/v1/predictions/{prediction_id}",
+                     "cancel": f"{self.base_url}/replicate/v1/predictions/{prediction_id}/cancel"},
+        }
+
+    def start(self, port: int):
+        import uvicorn
+
+        self.base_url = f"http://127.0.0.1:{port}"
+        server = uvicorn.Server(uvicorn.Config(self.build_app(), host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        return server
+
+
+# ---------------------------------------------------------------------------
+# API and worker processes
+# ---------------------------------------------------------------------------
+
+def configure_broker(celery_app, workdir: Path, broker_url: str | None):
+    if broker_url:
+        return
+    broker = workdir / "broker"
+    broker.mkdir(parents=True, exist_ok=True)
+    celery_app.conf.update(
+        broker_url="filesystem://",
+        broker_transport_options={
+            "data_folder_in": str(broker),
+            "data_folder_out": str(broker),
+            # Exchange bindings (remote control, queue declarations); kombu defaults to ./control
+            "control_folder": str(broker / "control"),
+            "polling_interval": 0.05,
+        },
+        result_backend=None,
+    )
+
+
+def run_api_role(args):
+    import uvicorn
+    from app.main import app
+    from app.workers.celery_app import celery_app
+
+    configure_broker(celery_app, Path(args.workdir), args.broker_url)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def run_worker_role(args):
+    from celery.signals import task_prerun, task_postrun
+    from app.workers.celery_app import celery_app
+    from app.workers.queues import ALL_QUEUES
+
+    workdir = Path(args.workdir)
+    configure_broker(celery_app, workdir, args.broker_url)
+    logs = {}
+    lock = threading.Lock()
+
+    def write(event: str, task_id: str, task, kwargs: dict):
+        pid = os.getpid()
+        with lock:
+            if pid not in logs:
+                logs[pid] = open(workdir / f"tasks-{pid}.jsonl", "a", buffering=1)
+            logs[pid].write(json.dumps({
+                "event": event, "task": task.name.rsplit(".", 1)[-1], "task_id": task_id,
+                "conversation_id": (kwargs or {}).get("conversation_id"), "t": time.time(),
+            }) + "\n")
+
+    @task_prerun.connect(weak=False)
+    def on_start(task_id=None, task=None, kwargs=None, **extra):
+        write("start", task_id, task, kwargs)
+
+    @task_postrun.connect(weak=False)
+    def on_end(task_id=None, task=None, kwargs=None, **extra):
+        write("end", task_id, task, kwargs)
+
+    celery_app.worker_main([
+        "worker", "-c", str(args.concurrency), "-Q", ",".join(ALL_QUEUES), "-n", f"harness{args.index}@%h",
+        "--loglevel=WARNING", "--without-heartbeat", "--without-mingle", "--without-gossip",
+    ])
+
+
+def spawn(role: str, args, env: dict, workdir: Path, **extra) -> subprocess.Popen:
+    command = [sys.executable, __file__, "--role", role, "--workdir", str(workdir)]
+    if args.broker_url:
+        command += ["--broker-url", args.broker_url]
+    for key, value in extra.items():
+        command += [f"--{key}", str(value)]
+    log = open(workdir / f"{role}{extra.get('index', '')}.log", "w")
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def arrival_times(args) -> list[float]:
+    rng = random.Random(args.seed)
+    total = max(1, round(args.rate * args.duration / 3600))
+    if args.process == "uniform":
+        return [i * args.duration / total for i in range(total)]
+    if args.process == "burst":
+        return sorted(rng.uniform(0, args.duration * 0.1) for _ in range(total))
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(args.rate / 3600)
+        if t >= args.duration:
+            return times
+        times.append(t)
+
+
+def make_media() -> tuple[bytes, bytes]:
+    from io import BytesIO
+    from PIL import Image, ImageDraw
+    from app.core.config import settings
+
+    voice = subprocess.run(
+        [settings.FFMPEG_BINARY, "-v", "error", "-f", "lavfi", "-i", "sine=frequency=180:duration=20", "-f", "wav", "pipe:1"],
+        capture_output=True, check=True
+    ).stdout
+    image = Image.new("RGB", (640, 640), (200, 170, 140))
+    ImageDraw.Draw(image).ellipse((170, 120, 470, 480), fill=(120, 90, 70))
+    avatar = BytesIO()
+    image.save(avatar, format="PNG")
+    return voice, avatar.getvalue()
+
+
+async def register_businesses(client, args, voice: bytes, avatar: bytes) -> list[str]:
+    numbers = []
+    for i in range(args.businesses):
+        number = f"+1555{i:07d}"
+        response = await client.post("/api/business/register", data={
+            "name": f"Load Test Business {i}", "whatsapp_number": number, "owner_name": f"Owner {i}",
+            "business_type": "Bakery", "password": "load-test-password",
+            "video_render_mode": args.render_mode, "target_video_seconds": str(args.target_video_seconds),
+        }, files={
+            "voice_sample": ("voice.wav", voice, "audio/wav"),
+            "avatar_image": ("avatar.png", avatar, "image/png"),
+        })
+        response.raise_for_status()
+        numbers.append(number)
+    return numbers
+
+
+async def replay(client, args, numbers: list[str]) -> list[dict]:
+    rng = random.Random(args.seed + 1)
+    results = []
+    started = time.monotonic()
+
+    async def send(at: float):
+        await asyncio.sleep(max(0.0, at - (time.monotonic() - started)))
+        business = rng.choice(numbers)
+        sent = time.monotonic()
+        try:
+            response = await client.post("/whatsapp/webhook", data={
+                "From": f"whatsapp:+1444{rng.randrange(args.customers):07d}",
+                "To": f"whatsapp:{business}",
+                "Body": rng.choice(QUESTIONS),
+                "MessageSid": f"SM{uuid.uuid4().hex}",
+            })
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        results.append({"ok": ok, "seconds": time.monotonic() - sent})
+
+    await asyncio.gather(*(send(at) for at in arrival_times(args)))
+    return results
+
+
+def wait_for_drain(args, started_at: datetime) -> None:
+    from app.db.base import SessionLocal
+    from app.db.models import Conversation
+
+    deadline = time.monotonic() + args.drain_timeout
+    while time.monotonic() < deadline:
+        db = SessionLocal()
+        try:
+            open_count = db.query(Conversation).filter(
+                Conversation.created_at >= started_at,
+                Conversation.status.notin_(("sent", "failed"))
+            ).count()
+        finally:
+            db.close()
+        if not open_count:
+            return
+        print(f"  waiting for {open_count} replies to finish...")
+        time.sleep(5)
+
+
+def task_log(workdir: Path) -> list[dict]:
+    events = []
+    for path in workdir.glob("tasks-*.jsonl"):
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    return events
+
+
+def report(args, workdir: Path, webhook: list[dict], providers: FakeProviders, started_at: datetime) -> None:
+    from app.db.base import SessionLocal
+    from app.db.models import Conversation
+
+    db = SessionLocal()
+    try:
+        conversations = db.query(Conversation).filter(Conversation.created_at >= started_at).all()
+    finally:
+        db.close()
+
+    events = task_log(workdir)
+    first_start = {}
+    slot_seconds = 0.0
+    starts = {}
+    for event in sorted(events, key=lambda e: e["t"]):
+        if event["event"] == "start":
+            starts[event["task_id"]] = event["t"]
+            if event["task"] == "generate_and_send_video" and event["conversation_id"] is not None:
+                first_start.setdefault(event["conversation_id"], event["t"])
+        elif event["task_id"] in starts and event["task"] != "clone_business_voice":
+            slot_seconds += event["t"] - starts.pop(event["task_id"])
+
+    def since_created(conversation, moment) -> float:
+        return (moment - conversation.created_at).total_seconds()
+
+    sent = [c for c in conversations if c.status == "sent"]
+    failed = [c for c in conversations if c.status == "failed"]
+    queue_wait = [
+        first_start[c.id] - (c.created_at - datetime(1970, 1, 1)).total_seconds()
+        for c in conversations if c.id in first_start
+    ]
+    first_reply = [since_created(c, c.first_reply_at) for c in sent if c.first_reply_at]
+    end_to_end = [since_created(c, c.sent_at) for c in sent if c.sent_at]
+
+    def line(name, values, unit="s", scale=1.0):
+        print(f"  {name:<18} p50 {percentile(values, 0.5) * scale:8.2f}{unit}  p95 {percentile(values, 0.95) * scale:8.2f}{unit}"
+              f"  p99 {percentile(values, 0.99) * scale:8.2f}{unit}  (n={len(values)})")
+
+    print(f"\nOffered load: {len(webhook)} messages over {args.duration:.0f}s ({args.rate:.0f}/h, {args.process})")
+    print(f"Workers: {args.workers} x {args.concurrency} slots ({args.profile} profile), render mode {args.render_mode}")
+    line("webhook response", [r["seconds"] for r in webhook], "ms", 1000)
+    print(f"  webhook errors     {sum(not r['ok'] for r in webhook)}")
+    print(f"Completed: {len(sent)} sent, {len(failed)} failed, {len(conversations) - len(sent) - len(failed)} unfinished")
+    if sent:
+        window = max(since_created(min(conversations, key=lambda c: c.created_at), c.sent_at) for c in sent)
+        print(f"  throughput         {len(sent) / max(window, 1e-9) * 3600:8.0f} replies/h")
+    line("queue wait", queue_wait)
+    line("first reply", first_reply)
+    line("end-to-end", end_to_end)
+
+    if conversations:
+        per_message = slot_seconds / len(conversations)
+        slots = args.target_per_hour * per_message / 3600
+        print(f"Worker time: {per_message:.1f} slot-seconds per message")
+        print(f"  for {args.target_per_hour:.0f} messages/h: {slots:.0f} busy slots at full utilisation -> "
+              f"{math.ceil(slots / args.concurrency / args.utilisation)} workers of {args.concurrency} slots "
+              f"at {args.utilisation:.0%} target utilisation")
+
+    print("Providers:")
+    for name, stat in sorted(providers.stats.items()):
+        print(f"  {name:<18} {stat['calls']:6d} calls  {stat['errors']:4d} errors  "
+              f"mean {stat['seconds'] / max(1, stat['calls']):6.2f}s")
+
+
+def run_harness(args):
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="vidioagent_load_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    provider_port, api_port = free_port(), free_port()
+    fake = f"http://127.0.0.1:{provider_port}"
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(REPO_ROOT),
+        "DATABASE_URL": args.database_url or f"sqlite:///{workdir / 'harness.db'}",
+        "CELERY_BROKER_URL": args.broker_url or "filesystem://",
+        "CELERY_RESULT_BACKEND": args.broker_url or "cache+memory://",
+        "CELERY_WORKER_PROFILE": args.profile,
+        "CELERY_IO_CONCURRENCY": str(args.concurrency),
+        "GROQ_API_KEY": "fake", "ELEVENLABS_API_KEY": "fake", "REPLICATE_API_TOKEN": "fake",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32, "TWILIO_AUTH_TOKEN": "fake", "TWILIO_WHATSAPP_NUMBER": "+15550000000",
+        "GROQ_API_BASE": f"{fake}/groq", "ELEVENLABS_API_BASE": f"{fake}/elevenlabs",
+        "REPLICATE_API_BASE": f"{fake}/replicate", "TWILIO_API_BASE": f"{fake}/twilio",
+        "BASE_URL": f"http://127.0.0.1:{api_port}",
+        "RATE_LIMIT_ENABLED": "false",
+        "MEDIA_URL_SIGNING": "false",
+    }
+    if not args.broker_url:
+        # Batching parks renders in Redis lists
+        env["RENDER_BATCH_WINDOW_SECONDS"] = "0"
+    os.environ.update(env)
+
+    import httpx
+    from app.db import models  # noqa: F401  (registers the tables)
+    from app.db.base import Base, engine
+
+    Base.metadata.create_all(engine)
+    providers = FakeProviders(args)
+    providers.start(provider_port)
+
+    processes = [spawn("api", args, env, workdir, port=api_port)]
+    processes += [spawn("worker", args, env, workdir, index=i, concurrency=args.concurrency) for i in range(args.workers)]
+    try:
+        async def drive():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{api_port}", timeout=60) as client:
+                for _ in range(300):
+                    try:
+                        await client.get("/health")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.2)
+                voice, avatar = make_media()
+                numbers = await register_businesses(client, args, voice, avatar)
+                print(f"Registered {len(numbers)} businesses; letting voice cloning finish...")
+                await asyncio.sleep(args.warmup)
+                print(f"Replaying {args.process} arrivals at {args.rate:.0f}/h for {args.duration:.0f}s...")
+                started_at = datetime.utcnow()
+                return started_at, await replay(client, args, numbers)
+
+        started_at, webhook = asyncio.run(drive())
+        wait_for_drain(args, started_at)
+        report(args, workdir, webhook, providers, started_at)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep:
+            print(f"\nScratch directory kept at {workdir}")
+        elif not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--businesses", type=int, default=10)
+    parser.add_argument("--customers", type=int, default=500, help="distinct senders")
+    parser.add_argument("--rate", type=float, default=3600, help="offered messages per hour")
+    parser.add_argument("--duration", type=float, default=120, help="seconds of arrivals")
+    parser.add_argument("--process", choices=["poisson", "uniform", "burst"], default="poisson")
+    parser.add_argument("--workers", type=int, default=2, help="Celery worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="slots per worker")
+    parser.add_argument("--profile", choices=["io", "prefork"], default="io")
+    parser.add_argument("--render-mode", default="lipsync", help="video_render_mode for the synthetic businesses")
+    parser.add_argument("--target-video-seconds", type=int, default=30)
+    parser.add_argument("--broker-url", help="real Redis broker (default: local filesystem broker)")
+    parser.add_argument("--database-url", help="database to use (default: scratch SQLite)")
+    # Provider latency distributions "median,p95" in seconds, and error rates
+    parser.add_argument("--groq-ttft", type=distribution, default="0.35,1.2")
+    parser.add_argument("--groq-tokens-per-second", type=float, default=250)
+    parser.add_argument("--groq-errors", type=float, default=0.01)
+    parser.add_argument("--tts", type=distribution, default="0.7,2.0", help="per sentence request")
+    parser.add_argument("--tts-errors", type=float, default=0.01)
+    parser.add_argument("--clone", type=distribution, default="3,8")
+    parser.add_argument("--replicate-api", type=distribution, default="0.3,1.0")
+    parser.add_argument("--render", type=distribution, default="45,110", help="SadTalker render time")
+    parser.add_argument("--render-errors", type=float, default=0.02)
+    parser.add_argument("--twilio", type=distribution, default="0.2,0.6")
+    parser.add_argument("--twilio-errors", type=float, default=0.005)
+    parser.add_argument("--reply-words", type=int, default=70)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every simulated latency")
+    # Run control and capacity report
+    parser.add_argument("--warmup", type=float, default=10, help="seconds to let voice cloning finish")
+    parser.add_argument("--drain-timeout", type=float, default=900)
+    parser.add_argument("--target-per-hour", type=float, default=10000)
+    parser.add_argument("--utilisation", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory and logs")
+    # Internal: subprocess roles
+    parser.add_argument("--role", choices=["api", "worker"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "api":
+        run_api_role(args)
+    elif args.role == "worker":
+        run_worker_role(args)
+    else:
+        run_harness(args)
+
+
+if __name__ == "__main__":
+    main()